@@ -0,0 +1,160 @@
+import asyncio
+import collections
+
+# Just enough HTTP/1.1 for JSON-RPC over localhost: keep-alive, Content-Length
+# and chunked bodies, no TLS, no pipelining. Shared by the RPC proxy and the
+# bench tools.
+MAX_HEADER_LINES = 100
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 431: "Request Header Fields Too Large", 502: "Bad Gateway",
+           504: "Gateway Timeout"}
+
+
+class HttpError(Exception):
+    pass
+
+
+class LineTooLong(HttpError):
+    pass
+
+
+async def read_line(reader):
+    # StreamReader.readline turns a line over its limit (64 KiB by default)
+    # into a ValueError; report it as an HTTP error instead
+    try:
+        return await reader.readline()
+    except (asyncio.LimitOverrunError, ValueError) as e:
+        raise LineTooLong(f"line too long: {str(e)}")
+
+
+async def read_headers(reader):
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await read_line(reader)
+        if not line:
+            raise HttpError("connection closed in headers")
+        line = line.rstrip(b"\r\n")
+        if not line:
+            return headers
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    raise HttpError("too many header lines")
+
+
+async def read_body(reader, headers, max_body):
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        size = 0
+        while True:
+            line = await read_line(reader)
+            chunk_size = int(line.split(b";")[0].strip() or b"0", 16)
+            if chunk_size == 0:
+                # Trailers, then the blank line
+                while (await read_line(reader)).strip():
+                    pass
+                return b"".join(chunks)
+            size += chunk_size
+            if size > max_body:
+                raise HttpError("body too large")
+            chunks.append(await reader.readexactly(chunk_size))
+            await reader.readexactly(2)
+    length = int(headers.get("content-length", "0"))
+    if length > max_body:
+        raise HttpError("body too large")
+    return await reader.readexactly(length) if length else b""
+
+
+async def read_request(reader, max_body=16 * 1024 * 1024):
+    # Returns (method, path, headers, body), or None once the client hung up
+    line = await read_line(reader)
+    if not line:
+        return None
+    parts = line.decode("latin-1").split()
+    if len(parts) != 3:
+        raise HttpError(f"bad request line {line[:100]!r}")
+    method, path, version = parts
+    headers = await read_headers(reader)
+    if version == "HTTP/1.0" and headers.get("connection", "").lower() != "keep-alive":
+        headers["connection"] = "close"
+    body = await read_body(reader, headers, max_body)
+    return method, path, headers, body
+
+
+def format_response(status, body, content_type="application/json", keep_alive=True):
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+
+async def read_response(reader, max_body=256 * 1024 * 1024):
+    line = await read_line(reader)
+    if not line:
+        raise HttpError("connection closed before response")
+    parts = line.decode("latin-1").split(None, 2)
+    if len(parts) < 2:
+        raise HttpError(f"bad status line {line[:100]!r}")
+    status = int(parts[1])
+    headers = await read_headers(reader)
+    body = await read_body(reader, headers, max_body)
+    return status, headers, body
+
+
+class ConnectionPool:
+    # Keep-alive connections to one host:port, reused LIFO. A request that
+    # fails on a reused connection is retried once on a fresh one, since the
+    # server may have closed it while it sat idle. Timeouts are not retried:
+    # the server was slow, not gone.
+    def __init__(self, port, host="127.0.0.1", max_idle=16, timeout=30.0):
+        self.host = host
+        self.port = port
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.idle = collections.deque()  # (reader, writer)
+        self.opened = 0
+
+    async def connect(self):
+        self.opened += 1
+        return await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+
+    async def post(self, path, body, content_type="application/json"):
+        request = (f"POST {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                   f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                   f"Connection: keep-alive\r\n\r\n").encode("latin-1") + body
+        reused = bool(self.idle)
+        connection = self.idle.pop() if reused else await self.connect()
+        try:
+            status, headers, response = await self.exchange(connection, request)
+        except (asyncio.TimeoutError, TimeoutError):
+            # A subclass of OSError since 3.10 (3.11 for asyncio's)
+            connection[1].close()
+            raise
+        except (OSError, HttpError, asyncio.IncompleteReadError):
+            connection[1].close()
+            if not reused:
+                raise
+            connection = await self.connect()
+            try:
+                status, headers, response = await self.exchange(connection, request)
+            except BaseException:
+                connection[1].close()
+                raise
+        except BaseException:
+            connection[1].close()
+            raise
+        if headers.get("connection", "").lower() == "close" or len(self.idle) >= self.max_idle:
+            connection[1].close()
+        else:
+            self.idle.append(connection)
+        return status, response
+
+    async def exchange(self, connection, request):
+        reader, writer = connection
+        writer.write(request)
+        await writer.drain()
+        return await asyncio.wait_for(read_response(reader), self.timeout)
+
+    def close(self):
+        while self.idle:
+            self.idle.pop()[1].close()
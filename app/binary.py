@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import threading
+
+RELEASE = "release"
+DEBUG = "debug"
+PROFILES = (RELEASE, DEBUG)
+
+# trin checkouts to look for builds in; the old hard-coded paths were relative
+# to the working directory, so those stay as a fallback after the app's own tree
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SOURCE_DIRS = [
+    os.path.join(APP_DIR, "..", "..", "trin"),
+    os.path.join("..", "..", "trin"),
+    os.path.join("..", "trin"),
+]
+
+
+class BinaryError(Exception):
+    pass
+
+
+class TrinBinary:
+    def __init__(self, path, version, profile, source):
+        self.path = path
+        self.version = version  # None until a background check fills it in
+        self.version_error = None  # why that check failed, if it did
+        self.profile = profile  # RELEASE, DEBUG or None if unknown
+        self.source = source  # where it was found: "target", "configured" or "PATH"
+
+    def __str__(self):
+        version = self.version or self.version_error or "unknown version"
+        return f"{self.path} ({version}, {self.profile or 'unknown'} build)"
+
+
+def build_profile(path):
+    # Cargo puts builds under target/<profile>/
+    parts = os.path.normpath(os.path.realpath(path)).split(os.sep)
+    for parent, child in zip(parts, parts[1:]):
+        if parent == "target" and child in PROFILES:
+            return child
+    return None
+
+
+def valid_entry(entry):
+    # Hand-edited or older cache files may lack fields or have the wrong types
+    return isinstance(entry, dict) and isinstance(entry.get("mtime_ns"), int) \
+        and isinstance(entry.get("size"), int) and isinstance(entry.get("sha256"), str) \
+        and isinstance(entry.get("version"), (str, type(None)))
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BinaryResolver:
+    # Finds the trin binary to launch and remembers each binary's --version.
+    # resolve() only looks for the file; when the cache doesn't cover it, the
+    # hash and --version run on a worker thread and fill in the version later,
+    # so a launch never waits on them.
+    def __init__(self, cache_file=None, source_dirs=None, version_timeout=10):
+        self.cache_file = cache_file
+        self.source_dirs = DEFAULT_SOURCE_DIRS if source_dirs is None else source_dirs
+        self.version_timeout = version_timeout
+        self.cache = {}  # realpath -> {"mtime_ns", "size", "sha256", "version"}
+        self.lock = threading.Lock()
+        self.checking = {}  # realpath -> TrinBinary instances waiting for its version check
+        self.load()
+
+    def load(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        if not isinstance(data, dict):
+            data = {}
+        self.cache = {path: entry for path, entry in data.items() if valid_entry(entry)}
+
+    def save(self):
+        if not self.cache_file:
+            return
+        tmp_file = self.cache_file + ".tmp"
+        with self.lock:
+            cache = dict(self.cache)
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            with open(tmp_file, "w") as f:
+                json.dump(cache, f)
+            os.replace(tmp_file, self.cache_file)
+        except OSError:
+            pass
+
+    def candidates(self, config):
+        # Build of the chosen profile, then the configured path, then $PATH
+        profile = config.build_profile if config.build_profile in PROFILES else RELEASE
+        found = []
+        for source_dir in self.source_dirs:
+            found.append((os.path.join(source_dir, "target", profile, "trin"), "target"))
+        if config.trin_path:
+            found.append((os.path.expanduser(config.trin_path), "configured"))
+        on_path = shutil.which("trin")
+        if on_path:
+            found.append((on_path, "PATH"))
+        return found
+
+    def resolve(self, config):
+        for path, source in self.candidates(config):
+            if not (os.path.isfile(path) and os.access(path, os.X_OK)):
+                continue
+            profile = build_profile(path)
+            if profile == DEBUG and config.build_profile != DEBUG:
+                raise BinaryError(f"{path} is a debug build; select the debug build profile to run it anyway")
+            binary = TrinBinary(os.path.abspath(path), None, profile, source)
+            self.fill_version(binary)
+            return binary
+        if config.build_profile != DEBUG:
+            for source_dir in self.source_dirs:
+                debug_path = os.path.join(source_dir, "target", DEBUG, "trin")
+                if os.path.isfile(debug_path):
+                    raise BinaryError(f"Only a debug build was found at {os.path.abspath(debug_path)}; build trin "
+                                      "with `cargo build --release` or select the debug build profile")
+        raise BinaryError("No trin binary found; build trin with `cargo build --release`, "
+                          "set a binary path or put trin on $PATH")
+
+    def fill_version(self, binary):
+        # Sets binary.version from the cache, or starts a background check that will
+        realpath = os.path.realpath(binary.path)
+        try:
+            stat = os.stat(realpath)
+        except OSError:
+            return
+        with self.lock:
+            entry = self.cache.get(realpath)
+            if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                binary.version = entry["version"]
+                return
+            waiting = self.checking.get(realpath)
+            if waiting is not None:
+                waiting.append(binary)
+                return
+            self.checking[realpath] = [binary]
+        threading.Thread(target=self.check_version, args=(realpath,), name="trin-version", daemon=True).start()
+
+    def check_version(self, realpath):
+        version = error = None
+        try:
+            version = self.version(realpath)
+        except (OSError, BinaryError) as e:
+            error = f"version check failed: {str(e)}"
+        with self.lock:
+            waiting = self.checking.pop(realpath, [])
+        for binary in waiting:
+            binary.version, binary.version_error = version, error
+
+    def version(self, path):
+        # Blocking: hashes the file and runs --version unless the cache covers it
+        realpath = os.path.realpath(path)
+        stat = os.stat(realpath)
+        with self.lock:
+            entry = self.cache.get(realpath)
+        if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return entry["version"]
+        # Touched or rebuilt: an identical file keeps its cached version
+        sha256 = file_hash(realpath)
+        if not (entry and entry["sha256"] == sha256):
+            entry = {"sha256": sha256, "version": self.run_version(realpath)}
+        entry = dict(entry, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        with self.lock:
+            self.cache[realpath] = entry
+        self.save()
+        return entry["version"]
+
+    def run_version(self, path):
+        try:
+            result = subprocess.run([path, "--version"], capture_output=True, text=True,
+                                    timeout=self.version_timeout)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            raise BinaryError(f"{path} --version failed: {str(e)}")
+        if result.returncode != 0:
+            raise BinaryError(f"{path} --version exited with code {result.returncode}")
+        return result.stdout.strip() or None
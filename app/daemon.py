@@ -1,71 +1,393 @@
+import functools
+import logging
 import subprocess
+import time
 import psutil
-from PyQt5.QtCore import QProcess, QStandardPaths
+from PyQt5.QtCore import QObject, QProcess, QStandardPaths, QTimer, pyqtSignal
+from binary import BinaryError, BinaryResolver
+from log_pipeline import LogPipeline
+from metrics import LatencyHistogram
+from output_buffer import OutputBuffer, save_crash_report
+from process_tree import LEFTOVER_GRACE, descendants, kill_all, terminate_leftovers
+from restart_policy import RestartPolicy
+from sampler import ResourceSampler
+from readiness import ReadinessPoller, ReadinessTracker, STARTING, LISTENING, apply_phase
+from resource_limits import ResourceLimits
 
-class DaemonManager:
-    def __init__(self, app_logger, daemon_logger):
+class DaemonManager(QObject):
+    # exit code, signal number (0 if it exited normally), uptime in seconds
+    daemon_exited = pyqtSignal(int, int, float)
+    daemon_started = pyqtSignal(int)  # PID
+    restart_scheduled = pyqtSignal(float)  # delay in seconds
+    restarts_suspended = pyqtSignal(int)  # restarts in the breaker window
+    start_failed = pyqtSignal(str)  # error message
+    readiness_changed = pyqtSignal(str, float)  # phase, seconds since start
+    daemon_stopped = pyqtSignal(float, bool)  # seconds the stop took, whether it needed SIGKILL
+    rss_limit_exceeded = pyqtSignal(float, float)  # RSS and soft limit in bytes; emitted from the sampler thread
+    # Internal: generation, phase, detail; emitted from the log writer and poller threads
+    phase_detected = pyqtSignal(int, str, str)
+
+    def __init__(self, app_logger, daemon_logger, restart_history_file=None, startup_history_file=None,
+                 sample_interval=5, name="Daemon", binary_resolver=None, crash_report_dir=None):
+        super().__init__()
+        self.name = name  # used in log messages, e.g. "Daemon 2"
+        self.config = None
+        self.binary_resolver = binary_resolver or BinaryResolver()
+        self.binary = None  # TrinBinary of the last launch
         self.daemon_process = None
+        self.daemon_pid = None
+        self.ps_process = None  # psutil handle, reused by the liveness fallback
+        self.started_at = None
+        self.stopping = False
+        self.restarting = False  # the current launch is an automatic restart
+        self.restarts_paused = False  # the breaker tripped and restarts_suspended was emitted
+        self.restart_count = 0
+        self.exit_count = 0
         self.app_logger = app_logger
         self.daemon_logger = daemon_logger
+        # Decoding, line splitting and file writes happen off the GUI thread
+        self.log_pipeline = LogPipeline(daemon_logger, error_logger=app_logger)
+        # Recent output in memory for the live log view and crash reports
+        self.output_buffer = OutputBuffer()
+        self.crash_report_dir = crash_report_dir  # None = no crash reports
+        self.last_crash_report = None
+        self.restart_policy = RestartPolicy(restart_history_file)
+        self.restart_timer = QTimer(self)
+        self.restart_timer.setSingleShot(True)
+        self.restart_timer.timeout.connect(self.restart_daemon)
+        self.generation = 0  # bumped on every start so stale readiness reports are ignored
+        self.readiness = ReadinessTracker(startup_history_file)
+        self.readiness_poller = None
+        self.phase_detected.connect(self.handle_phase_detected)
+        self.log_pipeline.line_watchers.append(self.watch_line)
+        self.sampler = ResourceSampler(sample_interval)
+        self.sampler.on_rss_limit = self.rss_limit_exceeded.emit
+        self.rss_limit_exceeded.connect(self.handle_rss_limit_exceeded)
         self.start_timeout = 10000  # 10 seconds timeout for starting
+        # Stopping: SIGTERM, then SIGKILL once the grace period runs out
+        self.kill_timer = QTimer(self)
+        self.kill_timer.setSingleShot(True)
+        self.kill_timer.timeout.connect(self.kill_process)
+        self.stop_started_at = None
+        self.stop_killed = False
+        self.stop_children = []  # psutil handles of trin's descendants, reaped after it exits
+        self.closing = False
+        self.closed = False
+        self.forced_kills = 0
+        self.last_shutdown = None  # (seconds, killed)
+        self.shutdown_histogram = LatencyHistogram(buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
 
-    def start_daemon(self, config):
+    def start_daemon(self, config, wait=True):
+        # With wait=False this returns right after spawning; success is reported
+        # through daemon_started and failure through start_failed
         if self.is_daemon_running():
-            self.app_logger.info("Daemon is already running")
+            self.app_logger.info(f"{self.name} is already running")
             return
 
+        self.config = config
+        limits = ResourceLimits.from_config(config)
+        if limits.config_error:
+            self.app_logger.warning(f"{self.name}: {limits.config_error}")
+        self.sampler.set_limits(limits)
+        try:
+            self.binary = self.binary_resolver.resolve(config)
+        except BinaryError as e:
+            self.app_logger.error(f"Cannot start {self.name.lower()}: {str(e)}")
+            self.handle_start_failure(str(e))
+            return
         try:
             self.daemon_process = QProcess()
             self.daemon_process.readyReadStandardOutput.connect(self.handle_stdout)
             self.daemon_process.readyReadStandardError.connect(self.handle_stderr)
-            command = "../../trin/target/debug/trin"
+            self.daemon_process.started.connect(self.handle_started)
+            self.daemon_process.finished.connect(self.handle_finished)
+            self.daemon_process.errorOccurred.connect(self.handle_error)
             args = config.get_trin_config()
-            self.daemon_process.start(command, args)
-            
+            self.daemon_process.start(self.binary.path, args)
+
             # Wait for the process to start
-            if self.daemon_process.waitForStarted(self.start_timeout):
-                self.daemon_pid = self.daemon_process.processId()
-                self.app_logger.info(f"Daemon started with PID: {self.daemon_pid}")
-            else:
+            if wait and not self.daemon_process.waitForStarted(self.start_timeout):
                 raise Exception("Failed to start daemon process")
         except Exception as e:
-            self.app_logger.error(f"Failed to start daemon: {str(e)}")
+            self.app_logger.error(f"Failed to start {self.name.lower()}: {str(e)}")
             raise
 
+    def handle_started(self):
+        if self.sender() is not self.daemon_process:
+            return
+        self.daemon_pid = self.daemon_process.processId()
+        self.started_at = time.monotonic()
+        try:
+            self.ps_process = psutil.Process(self.daemon_pid)
+        except psutil.NoSuchProcess:
+            self.ps_process = None
+        self.app_logger.info(f"{self.name} started with PID: {self.daemon_pid} from {self.binary}")
+        self.start_readiness(self.config.rpc_port)
+        self.sampler.attach(self.daemon_pid)
+        self.daemon_started.emit(self.daemon_pid)
+
+    def start_readiness(self, port):
+        self.generation += 1
+        self.readiness.start()
+        self.readiness_poller = ReadinessPoller(port, functools.partial(self.phase_detected.emit, self.generation))
+        self.readiness_poller.start()
+        self.readiness_changed.emit(STARTING, 0.0)
+
+    def watch_line(self, level, line):
+        # Runs on the log writer thread; only looks at lines until RPC is up
+        if self.readiness.phase not in (STARTING, LISTENING):
+            return
+        phase = self.readiness.match_line(line)
+        if phase:
+            self.phase_detected.emit(self.generation, phase, line)
+
+    def handle_phase_detected(self, generation, phase, detail):
+        if generation != self.generation:
+            return
+        elapsed = apply_phase(self.readiness, phase, detail, self.app_logger, self.name)
+        if elapsed is not None:
+            self.readiness_changed.emit(phase, elapsed)
+
+    def handle_rss_limit_exceeded(self, rss, limit):
+        self.app_logger.warning(f"{self.name} resident memory {rss / 1024 / 1024:.0f} MiB is above "
+                                f"its soft limit of {limit / 1024 / 1024:.0f} MiB")
+
     def handle_stdout(self):
-        data = self.daemon_process.readAllStandardOutput()
-        stdout = bytes(data).decode('utf8')
-        for line in stdout.strip().split('\n'):
-            self.daemon_logger.info(line)
+        data = bytes(self.daemon_process.readAllStandardOutput())
+        self.output_buffer.append(logging.INFO, data)
+        self.log_pipeline.submit(logging.INFO, data)
 
     def handle_stderr(self):
-        data = self.daemon_process.readAllStandardError()
-        stderr = bytes(data).decode('utf8')
-        for line in stderr.strip().split('\n'):
-            self.daemon_logger.error(line)
+        data = bytes(self.daemon_process.readAllStandardError())
+        self.output_buffer.append(logging.ERROR, data)
+        self.log_pipeline.submit(logging.ERROR, data)
+
+    def handle_finished(self, exit_code, exit_status):
+        process = self.sender()
+        if process is not self.daemon_process:
+            return
+        # Flush whatever output arrived together with the exit
+        self.handle_stdout()
+        self.handle_stderr()
+        self.log_pipeline.end_of_stream()
+        self.output_buffer.flush()
+        uptime = self.uptime()
+        pid = self.daemon_pid
+        phase = self.readiness.phase  # cleared with the process
+        # On a crash QProcess reports the terminating signal as the exit code
+        signal_number = exit_code if exit_status == QProcess.CrashExit else 0
+        if signal_number:
+            exit_code = -1
+        self.clear_process()
+        if self.stopping:
+            self.handle_stopped()
+            return
+        self.app_logger.warning(f"{self.name} exited unexpectedly (exit code {exit_code}, "
+                                f"signal {signal_number}, uptime {uptime:.1f}s)")
+        self.exit_count += 1
+        self.restart_policy.record_exit(exit_code, signal_number, uptime)
+        self.last_crash_report = save_crash_report(self, pid, exit_code, signal_number, uptime, phase)
+        self.daemon_exited.emit(exit_code, signal_number, uptime)
+        self.schedule_restart()
+
+    def schedule_restart(self, config=None):
+        # Returns the restart delay, or None if the crash-loop breaker is open
+        if config is not None:
+            self.config = config
+        if self.config is None:
+            return None
+        if self.restart_timer.isActive():
+            return self.restart_timer.remainingTime() / 1000
+        delay = self.restart_policy.next_delay()
+        if delay is None:
+            # Reported once when the breaker trips, not on every later request
+            if not self.restarts_paused:
+                self.restarts_paused = True
+                recent = self.restart_policy.recent_restarts()
+                self.app_logger.error(f"{self.name} restarted {recent} times in "
+                                      f"{self.restart_policy.window}s, automatic restarts suspended")
+                self.restarts_suspended.emit(recent)
+            return None
+        self.restarts_paused = False
+        self.app_logger.info(f"Restarting {self.name.lower()} in {delay:.1f}s")
+        self.restart_timer.start(int(delay * 1000))
+        self.restart_scheduled.emit(delay)
+        return delay
+
+    def restart_pending(self):
+        # A restart is already scheduled, or the crash-loop breaker is holding it off
+        return self.restart_timer.isActive() or self.restart_policy.circuit_open()
+
+    def restart_daemon(self):
+        if self.is_daemon_running():
+            return
+        self.restart_count += 1
+        self.restart_policy.record_restart()
+        self.restarting = True
+        try:
+            self.start_daemon(self.config, wait=False)
+        except Exception:
+            self.handle_start_failure("Failed to start daemon process")
 
-    def stop_daemon(self):
+    def handle_error(self, error):
+        process = self.sender()
+        if process is not self.daemon_process:
+            return
+        # Only FailedToStart never reaches finished(); other errors are reported there
+        if error == QProcess.FailedToStart:
+            self.app_logger.error(f"{self.name} failed to start: {process.errorString()}")
+            self.handle_start_failure(process.errorString())
+
+    def handle_start_failure(self, message):
+        restarting = self.restarting
+        self.clear_process()
+        # A launch failure counts as a crash on startup
+        self.restart_policy.record_exit(-1, 0, 0.0)
+        self.start_failed.emit(message)
+        if restarting:
+            self.schedule_restart()
+
+    def clear_process(self):
+        if self.readiness_poller:
+            self.readiness_poller.stop()
+            self.readiness_poller = None
+        self.readiness.stop()
+        self.sampler.detach()
         if self.daemon_process:
-            self.daemon_process.terminate()
-            if not self.daemon_process.waitForFinished(5000):  # 5 seconds timeout
-                self.daemon_process.kill()
-            self.app_logger.info("Daemon stopped")
-            self.daemon_process = None
+            self.daemon_process.deleteLater()
+        self.daemon_process = None
+        self.ps_process = None
+        self.started_at = None
+        self.restarting = False
+
+    def stop_daemon(self, grace=None):
+        # Asynchronous: sends SIGTERM and returns; daemon_stopped fires once the
+        # process is gone. Returns False if there was nothing to stop.
+        self.restart_timer.stop()
+        if self.daemon_process is None:
+            return False
+        if self.stopping:
+            return True
+        if grace is None:
+            grace = self.config.shutdown_grace if self.config else 10
+        self.stopping = True
+        self.stop_started_at = time.monotonic()
+        self.stop_killed = False
+        # Captured up front: once trin is gone its children are reparented
+        self.stop_children = self.process_tree()
+        self.daemon_process.terminate()
+        self.kill_timer.start(int(grace * 1000))
+        return True
+
+    def process_tree(self):
+        return descendants(self.ps_process)
+
+    def kill_process(self):
+        if self.daemon_process is None:
+            return
+        self.app_logger.warning(f"{self.name} did not exit within its grace period, killing it")
+        self.stop_killed = True
+        children = self.process_tree()
+        self.stop_children.extend(child for child in children if child not in self.stop_children)
+        kill_all(children)
+        self.daemon_process.kill()
+
+    def handle_stopped(self):
+        self.kill_timer.stop()
+        self.reap_children(self.stop_children)
+        self.stop_children = []
+        duration = time.monotonic() - self.stop_started_at
+        self.shutdown_histogram.observe(duration)
+        if self.stop_killed:
+            self.forced_kills += 1
+        self.last_shutdown = (duration, self.stop_killed)
+        self.app_logger.info(f"{self.name} stopped in {duration:.2f}s{' (killed)' if self.stop_killed else ''}")
+        self.stopping = False
+        self.daemon_stopped.emit(duration, self.stop_killed)
+        if self.closing:
+            self.release()
+
+    def reap_children(self, children):
+        # Descendants that outlived trin get SIGTERM now and SIGKILL a bit later
+        survivors = terminate_leftovers(children)
+        if survivors:
+            self.app_logger.warning(f"{self.name}: terminating {len(survivors)} leftover child processes")
+            QTimer.singleShot(LEFTOVER_GRACE * 1000, functools.partial(kill_all, survivors))
+
+    def terminate_now(self, timeout=5):
+        # Blocking last resort for when the event loop is no longer running
+        # (atexit, fatal errors); normal shutdown goes through stop_daemon
+        if self.daemon_process is None:
+            return
+        self.stop_daemon(timeout)
+        processes = ([self.ps_process] if self.ps_process else []) + self.stop_children
+        try:
+            gone, alive = psutil.wait_procs(processes, timeout=timeout)
+        except psutil.Error:
+            alive = []
+        if alive:
+            self.stop_killed = True
+            kill_all(alive)
+        if self.daemon_process and self.ps_process is None \
+                and not self.daemon_process.waitForFinished(int(timeout * 1000)):
+            # No psutil handle on trin itself, so QProcess waits and kills
+            self.stop_killed = True
+            self.daemon_process.kill()
+        if self.daemon_process and not self.daemon_process.waitForFinished(1000):
+            self.clear_process()
+            self.handle_stopped()
+
+    def take_over(self, other):
+        # Warm-swap promotion: this standby continues other's daemon log,
+        # restart history and startup history, and other keeps the standby's
+        # for as long as it takes to drain and stop
+        self.daemon_logger, other.daemon_logger = other.daemon_logger, self.daemon_logger
+        self.log_pipeline.logger, other.log_pipeline.logger = self.daemon_logger, other.daemon_logger
+        self.restart_policy, other.restart_policy = other.restart_policy, self.restart_policy
+        mine, theirs = self.readiness, other.readiness
+        mine.history_file, theirs.history_file = theirs.history_file, mine.history_file
+        mine.history, theirs.history = theirs.history, mine.history
+
+    def close(self):
+        # Stops trin if needed, then releases the log and sampler threads and
+        # deletes the manager; callers must not use it afterwards
+        if self.closing:
+            return
+        self.closing = True
+        if not self.stop_daemon():
+            self.release()
+
+    def release(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.log_pipeline.close()
+        self.sampler.close()
+        self.deleteLater()
 
     def is_daemon_running(self):
+        # Exits are normally caught by handle_finished; this is the fallback liveness check
         if self.daemon_process is None:
             return False
-        if self.daemon_process.state() != QProcess.Running:
+        # A process that is still starting counts, so a second start can't replace it
+        if self.daemon_process.state() == QProcess.NotRunning:
             return False
-        
-        daemon_pid = self.daemon_process.processId()
+        if self.ps_process is None:
+            return True
         try:
-            process = psutil.Process(daemon_pid)
-            return process.is_running() and process.status() != psutil.STATUS_ZOMBIE
+            return self.ps_process.is_running() and self.ps_process.status() != psutil.STATUS_ZOMBIE
         except psutil.NoSuchProcess:
             return False
     
+    def uptime(self):
+        started_at = self.started_at
+        if started_at is None:
+            return 0.0
+        return time.monotonic() - started_at
+
     def status(self):
+        if self.stopping:
+            return "Stopping"
         if self.daemon_process:
             return "Running"
         else:
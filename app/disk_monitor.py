@@ -0,0 +1,301 @@
+import os
+import shutil
+import sys
+import threading
+import time
+from metrics import RingBuffer
+
+# Disk usage of the trin data directories and free space on the filesystems
+# they live on, refreshed on a background thread. From both it derives the
+# --mb value that still leaves the configured headroom free once trin has
+# filled its storage, and raises alerts before the disk runs out.
+MB = 1000 * 1000  # trin's --mb unit
+STORAGE_OVERHEAD = 1.25  # trin's data dir ends up larger than --mb (indexes, WAL, peer tables)
+MIN_STORAGE_MB = 100
+STORAGE_STEP_MB = 100  # recommendations are rounded down to this so they don't move with every write
+GROW_MARGIN = 1.25  # a larger --mb is only recommended once it is this much above the current one
+HOT_AGE = 3600  # files modified this recently are re-stat'd on every refresh
+FULL_SCAN_INTERVAL = 3600
+RATE_WINDOW = 1800  # seconds of free-space history the fill rate is measured over
+CRITICAL_FRACTION = 0.25  # free space below this share of the headroom is critical
+CRITICAL_ETA = 3600  # and so is a disk projected to fill within this many seconds
+OK, WARNING, CRITICAL = "ok", "warning", "critical"
+LEVELS = (OK, WARNING, CRITICAL)
+
+
+def default_trin_data_dir():
+    # Where trin keeps its data when run without --data-dir
+    if sys.platform == "darwin":
+        return os.path.expanduser("~/Library/Application Support/trin")
+    if sys.platform == "win32":
+        return os.path.join(os.environ.get("LOCALAPPDATA", os.path.expanduser("~")), "trin", "data")
+    return os.path.join(os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share"), "trin")
+
+
+def existing_ancestor(path):
+    # A data dir trin hasn't created yet is on its parent's filesystem
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def allocated_size(stat):
+    # Blocks in use rather than the apparent size, so sparse files count as what they cost
+    blocks = getattr(stat, "st_blocks", None)
+    return blocks * 512 if blocks is not None else stat.st_size
+
+
+def format_bytes(value):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(value) < 1000:
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1000
+    return f"{value:.1f} TB"
+
+
+class DirectoryUsage:
+    # Size of a directory tree, kept current without walking all of it: a
+    # directory is listed again only when its mtime changes (an entry was
+    # added, removed or renamed). That misses files growing in place, so
+    # files seen changing are re-stat'd on every refresh, and the whole tree
+    # is re-walked every FULL_SCAN_INTERVAL seconds.
+    def __init__(self, root, full_scan_interval=FULL_SCAN_INTERVAL):
+        self.root = root
+        self.full_scan_interval = full_scan_interval
+        self.dirs = {}  # path -> (mtime_ns, {file name: (size, mtime_ns)}, [subdir paths])
+        self.hot = {}  # dir path -> names of files re-stat'd on every refresh
+        self.size = 0
+        self.last_full_scan = None
+        self.listed = 0  # directories listed by the last refresh
+        self.stat_calls = 0
+
+    def refresh(self):
+        now = time.monotonic()
+        full = self.last_full_scan is None or now - self.last_full_scan >= self.full_scan_interval
+        if full:
+            self.last_full_scan = now
+            self.hot = {}
+        self.listed = 0
+        self.stat_calls = 0
+        dirs = {}
+        self.size = self.walk(self.root, full, dirs)
+        self.dirs = dirs
+        self.hot = {path: names for path, names in self.hot.items() if path in dirs and names}
+        return self.size
+
+    def walk(self, path, full, dirs):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return 0
+        self.stat_calls += 1
+        cached = self.dirs.get(path)
+        if full or cached is None or cached[0] != mtime:
+            files, subdirs = self.list(path, cached)
+        else:
+            files, subdirs = self.restat_hot(path, cached[1]), cached[2]
+        dirs[path] = (mtime, files, subdirs)
+        return sum(size for size, _ in files.values()) + sum(self.walk(subdir, full, dirs) for subdir in subdirs)
+
+    def list(self, path, cached):
+        files, subdirs = {}, []
+        known = cached[1] if cached else {}
+        hot = self.hot.setdefault(path, set())
+        recent = (time.time() - HOT_AGE) * 1e9
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            stat = entry.stat(follow_symlinks=False)
+                            files[entry.name] = (allocated_size(stat), stat.st_mtime_ns)
+                            if known.get(entry.name, files[entry.name]) != files[entry.name] \
+                                    or stat.st_mtime_ns > recent:
+                                hot.add(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            return {}, []
+        self.listed += 1
+        hot.intersection_update(files)
+        return files, subdirs
+
+    def restat_hot(self, path, files):
+        names = self.hot.get(path)
+        if not names:
+            return files
+        files = dict(files)
+        for name in list(names):
+            try:
+                stat = os.stat(os.path.join(path, name), follow_symlinks=False)
+            except OSError:
+                # Removing a file changes the directory's mtime; the next refresh lists it again
+                names.discard(name)
+                continue
+            self.stat_calls += 1
+            files[name] = (allocated_size(stat), stat.st_mtime_ns)
+        return files
+
+
+class DiskMonitor:
+    def __init__(self, interval=60.0, history=256):
+        self.interval = interval
+        self.history_size = history
+        self.lock = threading.Lock()
+        self.usages = {}  # data dir -> DirectoryUsage
+        self.storage_mb = None  # --mb currently configured for each instance
+        self.headroom = 0  # bytes to keep free on each filesystem
+        self.history = {}  # st_dev -> (RingBuffer of times, RingBuffer of free bytes)
+        self.status = None
+        self.alerted = OK  # level of the last alert, so each escalation is reported once
+        self.last_recommended = None
+        self.on_alert = None  # callable(level, message), run on the monitor thread
+        self.on_recommendation = None  # callable(storage_mb), run on the monitor thread
+        self.wakeup = threading.Event()
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name="disk-monitor", daemon=True)
+        self.thread.start()
+
+    def configure(self, data_dirs, storage_mb, headroom_mb):
+        # Every data dir can grow to the same --mb: one per instance, plus the
+        # spare dir of each instance that warm-swaps between two
+        with self.lock:
+            self.usages = {path: self.usages.get(path) or DirectoryUsage(path) for path in data_dirs}
+            if storage_mb != self.storage_mb:
+                self.last_recommended = None
+            self.storage_mb = storage_mb
+            self.headroom = headroom_mb * MB
+        self.wakeup.set()
+
+    def close(self):
+        self.closed = True
+        self.wakeup.set()
+
+    def run(self):
+        while not self.closed:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            if not self.closed and self.usages:
+                self.refresh()
+
+    def refresh(self):
+        with self.lock:
+            usages = dict(self.usages)
+            storage_mb, headroom = self.storage_mb, self.headroom
+        started = time.monotonic()
+        dirs = {}
+        filesystems = {}  # st_dev -> totals for the data dirs on it
+        for path, usage in usages.items():
+            size = usage.refresh()
+            anchor = existing_ancestor(path)
+            try:
+                device = os.stat(anchor).st_dev
+                disk = shutil.disk_usage(anchor)
+            except OSError:
+                continue
+            dirs[path] = {"bytes": size, "free": disk.free, "total": disk.total}
+            filesystem = filesystems.setdefault(device, {"path": anchor, "total": disk.total, "free": disk.free,
+                                                         "data_bytes": 0, "data_dirs": 0})
+            filesystem["data_bytes"] += size
+            filesystem["data_dirs"] += 1
+        now = time.time()
+        for device, filesystem in filesystems.items():
+            if device not in self.history:
+                self.history[device] = (RingBuffer(self.history_size), RingBuffer(self.history_size))
+            times, free = self.history[device]
+            times.append(now)
+            free.append(filesystem["free"])
+            filesystem["time_to_full"] = self.time_to_full(times.values(), free.values())
+        recommended = self.recommend(filesystems.values(), headroom)
+        level, message = self.assess(filesystems.values(), storage_mb, headroom, recommended)
+        status = {
+            "checked_at": now,
+            "level": level,
+            "message": message,
+            "storage_mb": storage_mb,
+            "recommended_mb": recommended,
+            "headroom_mb": headroom / MB,
+            "dirs": dirs,
+            "filesystems": list(filesystems.values()),
+            "scan": {
+                "seconds": time.monotonic() - started,
+                "dirs_listed": sum(usage.listed for usage in usages.values()),
+                "stat_calls": sum(usage.stat_calls for usage in usages.values()),
+            },
+        }
+        with self.lock:
+            self.status = status
+        self.notify(level, message, storage_mb, recommended)
+        return status
+
+    def time_to_full(self, times, free):
+        # Seconds until the filesystem fills at the rate it has been filling, or None if it isn't
+        if len(times) < 2:
+            return None
+        now = times[-1]
+        first = next(index for index, when in enumerate(times) if when >= now - RATE_WINDOW)
+        if first == len(times) - 1 or now - times[first] < 60:
+            return None
+        rate = (free[first] - free[-1]) / (now - times[first])
+        return free[-1] / rate if rate > 0 else None
+
+    def recommend(self, filesystems, headroom):
+        # The largest --mb that leaves headroom free on every filesystem once
+        # each instance has filled it, rounded down to STORAGE_STEP_MB
+        budgets = [(filesystem["data_bytes"] + filesystem["free"] - headroom) / filesystem["data_dirs"]
+                   for filesystem in filesystems]
+        if not budgets:
+            return None
+        storage = min(budgets) / STORAGE_OVERHEAD / MB
+        return max(MIN_STORAGE_MB, int(storage // STORAGE_STEP_MB * STORAGE_STEP_MB))
+
+    def assess(self, filesystems, storage_mb, headroom, recommended):
+        level, message = OK, ""
+        for filesystem in filesystems:
+            free = filesystem["free"]
+            eta = filesystem["time_to_full"]
+            if free < headroom * CRITICAL_FRACTION or (eta is not None and eta < CRITICAL_ETA):
+                fill = f", full in about {eta / 60:.0f} min at the current rate" if eta is not None else ""
+                return CRITICAL, f"Only {format_bytes(free)} free on the disk holding {filesystem['path']}{fill}"
+            if free < headroom:
+                level = WARNING
+                message = f"{format_bytes(free)} free on the disk holding {filesystem['path']}, " \
+                          f"below the {format_bytes(headroom)} headroom"
+        if level == OK and storage_mb and recommended is not None and recommended < storage_mb:
+            level = WARNING
+            message = f"Storage of {storage_mb} MB per instance won't fit on disk with " \
+                      f"{format_bytes(headroom)} to spare; {recommended} MB would"
+        return level, message
+
+    def notify(self, level, message, storage_mb, recommended):
+        if LEVELS.index(level) > LEVELS.index(self.alerted) and self.on_alert:
+            self.on_alert(level, message)
+        self.alerted = level
+        if storage_mb and recommended is not None and recommended != self.last_recommended:
+            if recommended < storage_mb or recommended >= storage_mb * GROW_MARGIN:
+                self.last_recommended = recommended
+                if self.on_recommendation:
+                    self.on_recommendation(recommended)
+
+    def latest(self):
+        with self.lock:
+            return self.status
+
+    def describe(self):
+        status = self.latest()
+        if status is None:
+            return "not checked yet"
+        used = sum(entry["bytes"] for entry in status["dirs"].values())
+        free = ", ".join(f"{format_bytes(filesystem['free'])} free on {filesystem['path']}"
+                         for filesystem in status["filesystems"])
+        text = f"{format_bytes(used)} in data dirs, {free or 'free space unknown'}; " \
+               f"recommended storage {status['recommended_mb']} MB"
+        if status["level"] != OK:
+            text += f"\n{status['level'].upper()}: {status['message']}"
+        return text
@@ -0,0 +1,236 @@
+import functools
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from readiness import RPC_READY, SYNCED
+from telemetry import NETWORKS, PEERS, STORAGE_FILL
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+def format_number(value):
+    if value is None:
+        return "NaN"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class MetricsRegistry:
+    # Families and series are declared once; rendering only reads current
+    # values, so a scrape costs the same no matter how long the app has run
+    def __init__(self):
+        self.families = {}  # name -> (header, [(line prefix, value_fn)])
+
+    def family(self, name, kind, help_text):
+        if name not in self.families:
+            header = f"# HELP {name} {help_text}\n# TYPE {name} {kind}\n"
+            self.families[name] = (header, [])
+        return self.families[name][1]
+
+    def gauge(self, name, help_text, value_fn, labels=None):
+        self.family(name, "gauge", help_text).append((f"{name}{format_labels(labels)} ", value_fn))
+
+    def counter(self, name, help_text, value_fn, labels=None):
+        self.family(name, "counter", help_text).append((f"{name}{format_labels(labels)} ", value_fn))
+
+    def histogram(self, name, help_text, histogram, labels=None):
+        labels = dict(labels or {})
+        bounds = [format_number(float(b)) for b in histogram.buckets] + ["+Inf"]
+        prefixes = [f"{name}_bucket{format_labels({**labels, 'le': bound})} " for bound in bounds]
+        count_prefix = f"{name}_count{format_labels(labels)} "
+        sum_prefix = f"{name}_sum{format_labels(labels)} "
+        series = self.family(name, "histogram", help_text)
+
+        def render():
+            cumulative, count, total = histogram.snapshot()
+            lines = [prefix + str(c) for prefix, c in zip(prefixes, cumulative)]
+            lines.append(count_prefix + str(count))
+            lines.append(sum_prefix + format_number(total))
+            return "\n".join(lines)
+        series.append((None, render))
+
+    def render(self):
+        parts = []
+        for header, series in self.families.values():
+            parts.append(header)
+            for prefix, value_fn in series:
+                try:
+                    value = value_fn()
+                except Exception:
+                    continue
+                if prefix is None:
+                    parts.append(value + "\n")
+                else:
+                    parts.append(prefix + format_number(value) + "\n")
+        return "".join(parts).encode('utf8')
+
+
+def register_daemon_metrics(registry, daemon_manager, health_probe, labels=None):
+    sampler = daemon_manager.sampler
+    log_pipeline = daemon_manager.log_pipeline
+
+    def latest(name, scale=1):
+        sample = sampler.latest() if daemon_manager.started_at is not None else None
+        return sample[name] * scale if sample else None
+
+    registry.gauge("trin_daemon_up", "Whether the trin process is running",
+                   lambda: daemon_manager.started_at is not None, labels)
+    registry.gauge("trin_daemon_ready", "Whether the trin JSON-RPC endpoint has answered since start",
+                   lambda: daemon_manager.readiness.phase in (RPC_READY, SYNCED), labels)
+    registry.gauge("trin_daemon_uptime_seconds", "Seconds since the trin process started",
+                   lambda: daemon_manager.uptime(), labels)
+    registry.counter("trin_daemon_restarts_total", "Automatic restarts of trin",
+                     lambda: daemon_manager.restart_count, labels)
+    registry.counter("trin_daemon_unexpected_exits_total", "Unexpected exits of trin",
+                     lambda: daemon_manager.exit_count, labels)
+    port = daemon_manager.config.rpc_port
+    registry.histogram("trin_health_probe_latency_seconds", "Round-trip time of successful RPC health probes",
+                       health_probe.histogram_for(port), labels)
+    registry.counter("trin_health_probe_failures_total", "Failed TCP and RPC health probes",
+                     lambda: health_probe.failures_by_port.get(port, 0), labels)
+    registry.histogram("trin_daemon_shutdown_seconds", "Time from SIGTERM until trin exited",
+                       daemon_manager.shutdown_histogram, labels)
+    registry.counter("trin_daemon_forced_kills_total", "Stops that needed SIGKILL after the grace period",
+                     lambda: daemon_manager.forced_kills, labels)
+    registry.counter("trin_daemon_log_lines_total", "Lines of trin output written to the log",
+                     lambda: log_pipeline.lines_total, labels)
+    registry.counter("trin_daemon_log_dropped_lines_total", "Lines of trin output dropped under backpressure",
+                     lambda: log_pipeline.dropped_lines, labels)
+    registry.counter("trin_daemon_log_errors_total", "Failures while processing or writing trin output",
+                     lambda: log_pipeline.errors, labels)
+    registry.gauge("trin_daemon_log_lines_per_second", "Rate of trin output lines",
+                   lambda: log_pipeline.stats()["lines_per_sec"], labels)
+    registry.gauge("trin_daemon_log_bytes_per_second", "Rate of trin output bytes",
+                   lambda: log_pipeline.stats()["bytes_per_sec"], labels)
+    registry.gauge("trin_process_cpu_percent", "CPU usage of trin and its children",
+                   lambda: latest("cpu_percent", 0.1), labels)
+    registry.gauge("trin_process_resident_memory_bytes", "RSS of trin and its children",
+                   lambda: latest("rss", 1024), labels)
+    registry.gauge("trin_process_unique_memory_bytes", "USS of trin and its children",
+                   lambda: latest("uss", 1024), labels)
+    registry.gauge("trin_process_read_bytes_per_second", "Disk read rate of trin and its children",
+                   lambda: latest("read_bytes", 1024 / sampler.interval), labels)
+    registry.gauge("trin_process_write_bytes_per_second", "Disk write rate of trin and its children",
+                   lambda: latest("write_bytes", 1024 / sampler.interval), labels)
+    registry.gauge("trin_process_open_fds", "Open file descriptors of trin and its children",
+                   lambda: latest("num_fds"), labels)
+    registry.gauge("trin_process_threads", "Threads of trin and its children",
+                   lambda: latest("num_threads"), labels)
+    registry.gauge("trin_process_connections", "Inet connections of trin and its children",
+                   lambda: latest("connections"), labels)
+
+    def limits(key):
+        status = sampler.limit_status() if daemon_manager.started_at is not None else None
+        return status[key] if status else None
+
+    registry.gauge("trin_process_limits_in_effect", "Whether the configured resource limits were verified",
+                   lambda: limits("in_effect"), labels)
+    registry.gauge("trin_process_rss_over_limit", "Whether trin's RSS is above its soft limit",
+                   lambda: limits("rss_over_limit"), labels)
+
+
+def register_proxy_metrics(registry, proxy, labels=None):
+    cache = proxy.cache
+    registry.counter("trin_rpc_cache_requests_total", "JSON-RPC calls received by the caching proxy",
+                     lambda: proxy.requests, labels)
+    registry.counter("trin_rpc_cache_upstream_requests_total", "HTTP requests the caching proxy sent to trin",
+                     lambda: proxy.upstream_requests, labels)
+    registry.counter("trin_rpc_cache_hits_total", "Calls answered from the cache, memory or disk",
+                     lambda: cache.hits, labels)
+    registry.counter("trin_rpc_cache_misses_total", "Cacheable calls not found in the cache",
+                     lambda: cache.misses, labels)
+    registry.counter("trin_rpc_cache_coalesced_total", "Calls that shared an identical call already in flight",
+                     lambda: proxy.coalesced, labels)
+    registry.counter("trin_rpc_cache_evictions_total", "Entries pushed out of the memory cache",
+                     lambda: cache.evictions, labels)
+    registry.counter("trin_rpc_cache_upstream_errors_total", "Requests that could not reach trin",
+                     lambda: proxy.errors, labels)
+    registry.gauge("trin_rpc_cache_bytes", "Size of the cached responses held in memory",
+                   lambda: cache.bytes, labels)
+    registry.gauge("trin_rpc_cache_entries", "Responses held in memory",
+                   lambda: len(cache.entries), labels)
+    registry.gauge("trin_rpc_cache_spill_bytes", "Size of the on-disk cache",
+                   lambda: cache.spill_bytes, labels)
+
+
+def register_disk_metrics(registry, disk_monitor, data_dirs):
+    # data_dirs: instance index -> data dir
+    def value(path, key):
+        status = disk_monitor.latest()
+        entry = status["dirs"].get(path) if status else None
+        return entry[key] if entry else None
+
+    def recommended():
+        status = disk_monitor.latest()
+        return status["recommended_mb"] if status else None
+
+    for index, path in data_dirs.items():
+        labels = {"instance": str(index)}
+        registry.gauge("trin_data_dir_bytes", "Disk space used by trin's data dir",
+                       functools.partial(value, path, "bytes"), labels)
+        registry.gauge("trin_data_dir_free_bytes", "Free space on the filesystem holding trin's data dir",
+                       functools.partial(value, path, "free"), labels)
+    registry.gauge("trin_storage_recommended_megabytes", "--mb that leaves the configured disk headroom free",
+                   recommended)
+
+
+def register_telemetry_metrics(registry, collector, index, labels=None):
+    def latest(kind, network=None):
+        telemetry = collector.instance(index)
+        return telemetry.latest(kind, network) if telemetry else None
+
+    for network in NETWORKS + ("discv5",):
+        registry.gauge("trin_portal_peers", "Nodes in trin's routing table per subnetwork",
+                       functools.partial(latest, PEERS, network), {**(labels or {}), "network": network})
+    registry.gauge("trin_storage_fill_ratio", "Data dir size over the configured --mb",
+                   functools.partial(latest, STORAGE_FILL), labels)
+
+
+def register_loop_metrics(registry, profiler):
+    # Only registered when the app runs with TRIN_APP_PROFILE
+    registry.histogram("trin_app_event_loop_drift_seconds",
+                       "How late the profiling timer fired, i.e. time the Qt event loop was blocked",
+                       profiler.drift)
+    registry.counter("trin_app_event_loop_stalls_total", "Event-loop stalls past the profiling threshold",
+                     lambda: profiler.stalls)
+    for label, histogram in profiler.slots.items():
+        registry.histogram("trin_app_slot_duration_seconds", "Wall time of Qt slots on the main thread",
+                           histogram, {"slot": label})
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.registry.render()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsExporter:
+    def __init__(self, registry, port, host="127.0.0.1"):
+        self.port = port
+        self.server = HTTPServer((host, port), MetricsHandler)
+        self.server.registry = registry
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-exporter", daemon=True)
+        self.thread.start()
+
+    def set_registry(self, registry):
+        self.server.registry = registry
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
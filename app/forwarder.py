@@ -0,0 +1,74 @@
+import asyncio
+import collections
+import threading
+
+
+class PortForwarder:
+    # Local TCP shim: accepts connections on listen_port and pipes each one to
+    # whatever target_port is current when it was accepted. Switching the
+    # target only affects new connections, so a warm standby can take over
+    # while the old node drains.
+    def __init__(self, listen_port, target_port, host="127.0.0.1"):
+        self.host = host
+        self.listen_port = listen_port
+        self.target_port = target_port
+        self.active = collections.Counter()  # target port -> open connections
+        self.server = None
+        self.tasks = set()  # strong refs: asyncio only keeps weak ones to running tasks
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name=f"forwarder-{listen_port}", daemon=True)
+        self.thread.start()
+        try:
+            asyncio.run_coroutine_threadsafe(self.start_server(), self.loop).result(5)
+        except Exception:
+            self.stop_loop()
+            raise
+
+    async def start_server(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.listen_port)
+
+    async def handle(self, reader, writer):
+        task = asyncio.current_task()
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        port = self.target_port
+        try:
+            upstream_reader, upstream_writer = await asyncio.open_connection(self.host, port)
+        except OSError:
+            writer.close()
+            return
+        self.active[port] += 1
+        try:
+            await asyncio.gather(self.pipe(reader, upstream_writer), self.pipe(upstream_reader, writer))
+        finally:
+            self.active[port] -= 1
+            for w in (writer, upstream_writer):
+                w.close()
+
+    async def pipe(self, reader, writer):
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+            if writer.can_write_eof():
+                writer.write_eof()
+        except (ConnectionError, OSError):
+            writer.close()
+
+    def set_target(self, port):
+        self.target_port = port
+
+    def connections(self, port):
+        return self.active[port]
+
+    def close(self):
+        if self.server:
+            self.loop.call_soon_threadsafe(self.server.close)
+        self.stop_loop()
+
+    def stop_loop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(2)
@@ -0,0 +1,454 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+import time
+import psutil
+from binary import BinaryError, BinaryResolver
+from disk_monitor import DiskMonitor, default_trin_data_dir
+from log import configure_log_retention, get_app_data_dir, setup_logging
+from log_pipeline import LogPipeline
+from output_buffer import OutputBuffer, save_crash_report
+from process_tree import LEFTOVER_GRACE, descendants, kill_all, terminate_leftovers
+from readiness import ReadinessPoller, ReadinessTracker, STARTING, LISTENING, apply_phase
+from resource_limits import ResourceLimits
+from restart_policy import RestartPolicy
+from sampler import ResourceSampler
+from trin_config import CONFIG_FILE, load_config, save_config
+
+# Headless supervisor for servers: same config, binary resolution, log
+# pipeline, restart policy and readiness tracking as the tray app, driven by
+# asyncio instead of Qt. Never imports PyQt5.
+APP_NAME = "TrinApp"
+CONTROL_SOCKET = "control.sock"
+COMMANDS = ("start", "stop", "restart", "status", "reload")
+KILL_WAIT = 5  # seconds to wait for trin to go after SIGKILL
+
+
+class AsyncDaemon:
+    # asyncio counterpart of DaemonManager for a single trin instance
+    def __init__(self, app_logger, daemon_logger, data_dir, config, name="Daemon"):
+        self.name = name
+        self.config = config
+        self.app_logger = app_logger
+        self.loop = asyncio.get_running_loop()
+        self.process = None
+        self.ps_process = None  # psutil handle, for the process tree
+        self.watcher = None  # watch_process task of the current process
+        self.binary = None
+        self.started_at = None
+        self.stopping = False
+        self.restarting = False
+        self.restart_count = 0
+        self.exit_count = 0
+        self.restart_handle = None
+        self.generation = 0
+        self.log_pipeline = LogPipeline(daemon_logger, error_logger=app_logger)
+        self.log_pipeline.line_watchers.append(self.watch_line)
+        self.output_buffer = OutputBuffer()
+        self.crash_report_dir = os.path.join(data_dir, "crash_reports")
+        self.last_crash_report = None
+        self.restart_policy = RestartPolicy(os.path.join(data_dir, "restart_history.json"))
+        self.readiness = ReadinessTracker(os.path.join(data_dir, "startup_history.jsonl"))
+        self.readiness_poller = None
+        self.sampler = ResourceSampler(config.sample_interval)
+        self.sampler.on_rss_limit = lambda rss, limit: self.loop.call_soon_threadsafe(
+            self.app_logger.warning, f"{self.name} resident memory {rss / 1024 / 1024:.0f} MiB is above "
+                                     f"its soft limit of {limit / 1024 / 1024:.0f} MiB")
+        self.binary_resolver = BinaryResolver(os.path.join(data_dir, "binary_cache.json"))
+        self.tasks = set()
+
+    def is_running(self):
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self):
+        if self.is_running():
+            return
+        limits = ResourceLimits.from_config(self.config)
+        if limits.config_error:
+            self.app_logger.warning(f"{self.name}: {limits.config_error}")
+        self.sampler.set_limits(limits)
+        try:
+            self.binary = self.binary_resolver.resolve(self.config)
+            if self.config.data_dir:
+                os.makedirs(self.config.data_dir, exist_ok=True)
+            self.process = await asyncio.create_subprocess_exec(
+                self.binary.path, *self.config.get_trin_config(),
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except (BinaryError, OSError) as e:
+            self.app_logger.error(f"Failed to start {self.name.lower()}: {str(e)}")
+            self.handle_start_failure()
+            return
+        self.started_at = time.monotonic()
+        try:
+            self.ps_process = psutil.Process(self.process.pid)
+        except psutil.NoSuchProcess:
+            self.ps_process = None
+        self.app_logger.info(f"{self.name} started with PID: {self.process.pid} from {self.binary}")
+        self.generation += 1
+        self.readiness.start()
+        self.readiness_poller = ReadinessPoller(self.config.rpc_port, self.phase_callback(self.generation))
+        self.readiness_poller.start()
+        self.sampler.attach(self.process.pid)
+        self.watcher = self.spawn(self.watch_process(self.process))
+
+    def spawn(self, coro):
+        task = self.loop.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def phase_callback(self, generation):
+        # Poller and log writer threads report back on the loop
+        def on_phase(phase, detail):
+            self.loop.call_soon_threadsafe(self.handle_phase, generation, phase, detail)
+        return on_phase
+
+    def watch_line(self, level, line):
+        if self.readiness.phase not in (STARTING, LISTENING):
+            return
+        phase = self.readiness.match_line(line)
+        if phase:
+            self.loop.call_soon_threadsafe(self.handle_phase, self.generation, phase, line)
+
+    def handle_phase(self, generation, phase, detail):
+        if generation != self.generation:
+            return
+        apply_phase(self.readiness, phase, detail, self.app_logger, self.name)
+
+    async def pump(self, stream, level):
+        while True:
+            data = await stream.read(65536)
+            if not data:
+                return
+            self.output_buffer.append(level, data)
+            self.log_pipeline.submit(level, data)
+
+    async def watch_process(self, process):
+        await asyncio.gather(self.pump(process.stdout, logging.INFO), self.pump(process.stderr, logging.ERROR))
+        returncode = await process.wait()
+        self.log_pipeline.end_of_stream()
+        self.output_buffer.flush()
+        uptime = time.monotonic() - self.started_at
+        phase = self.readiness.phase  # cleared with the process
+        # asyncio reports death by signal as a negative return code
+        exit_code, signal_number = (-1, -returncode) if returncode < 0 else (returncode, 0)
+        self.clear_process()
+        if self.stopping:
+            return
+        self.app_logger.warning(f"{self.name} exited unexpectedly (exit code {exit_code}, "
+                                f"signal {signal_number}, uptime {uptime:.1f}s)")
+        self.exit_count += 1
+        self.restart_policy.record_exit(exit_code, signal_number, uptime)
+        self.last_crash_report = save_crash_report(self, process.pid, exit_code, signal_number, uptime, phase)
+        self.schedule_restart()
+
+    def handle_start_failure(self):
+        restarting = self.restarting
+        self.clear_process()
+        self.restart_policy.record_exit(-1, 0, 0.0)
+        if restarting:
+            self.schedule_restart()
+
+    def clear_process(self):
+        if self.readiness_poller:
+            self.readiness_poller.stop()
+            self.readiness_poller = None
+        self.readiness.stop()
+        self.sampler.detach()
+        self.process = None
+        self.ps_process = None
+        self.watcher = None
+        self.started_at = None
+        self.restarting = False
+
+    def schedule_restart(self):
+        if self.restart_handle:
+            return
+        delay = self.restart_policy.next_delay()
+        if delay is None:
+            self.app_logger.error(f"{self.name} restarted {self.restart_policy.recent_restarts()} times in "
+                                  f"{self.restart_policy.window}s, automatic restarts suspended")
+            return
+        self.app_logger.info(f"Restarting {self.name.lower()} in {delay:.1f}s")
+        self.restart_handle = self.loop.call_later(delay, self.restart)
+
+    def restart(self):
+        self.restart_handle = None
+        if self.is_running():
+            return
+        self.restart_count += 1
+        self.restart_policy.record_restart()
+        self.restarting = True
+        self.spawn(self.start())
+
+    async def stop(self, timeout=10):
+        # SIGTERM, then SIGKILL for the whole tree once timeout runs out
+        if self.restart_handle:
+            self.restart_handle.cancel()
+            self.restart_handle = None
+        process = self.process
+        if process is None or process.returncode is not None:
+            return
+        self.stopping = True
+        watcher = self.watcher
+        try:
+            # Captured up front: once trin is gone its children are reparented
+            tree = descendants(self.ps_process)
+            process.terminate()
+            if not await self.wait_exit(process, timeout):
+                self.app_logger.warning(f"{self.name} did not exit within its grace period, killing it")
+                tree += [child for child in descendants(self.ps_process) if child not in tree]
+                kill_all(tree)
+                process.kill()
+                await self.wait_exit(process, KILL_WAIT)
+            survivors = terminate_leftovers(tree)
+            if survivors:
+                self.app_logger.warning(f"{self.name}: terminating {len(survivors)} leftover child processes")
+            # Let watch_process drain the pipes and clear state; a leftover
+            # child still holding them open is killed first
+            done, pending = await asyncio.wait({watcher}, timeout=LEFTOVER_GRACE)
+            if pending:
+                kill_all(survivors)
+                done, pending = await asyncio.wait({watcher}, timeout=KILL_WAIT)
+            if pending:
+                watcher.cancel()
+                self.clear_process()
+            self.app_logger.info(f"{self.name} stopped")
+        except ProcessLookupError:
+            pass
+        finally:
+            self.stopping = False
+
+    async def wait_exit(self, process, timeout):
+        # Returns whether trin exited. Before Python 3.12 process.wait() also
+        # waits for the pipes, which a leftover child can hold open, while
+        # the return code is set as soon as trin itself is gone.
+        try:
+            await asyncio.wait_for(process.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return process.returncode is not None
+
+    def status(self):
+        policy = self.restart_policy
+        log_stats = self.log_pipeline.stats()
+        return {
+            "name": self.name,
+            "running": self.is_running(),
+            "pid": self.process.pid if self.is_running() else None,
+            "uptime": round(time.monotonic() - self.started_at, 1) if self.started_at else 0.0,
+            "phase": self.readiness.phase,
+            "phases": {phase: round(seconds, 3) for phase, seconds in self.readiness.durations().items()},
+            "binary": str(self.binary) if self.binary else None,
+            "http_port": self.config.http_port,
+            "restart_count": self.restart_count,
+            "exit_count": self.exit_count,
+            "recent_restarts": policy.recent_restarts(),
+            "restarts_suspended": policy.circuit_open(),
+            "restart_pending": self.restart_handle is not None,
+            "last_exit": policy.last_exit(),
+            "log_lines_per_sec": round(log_stats["lines_per_sec"], 1),
+            "log_dropped_lines": log_stats["dropped_lines"],
+            "log_errors": log_stats["errors"],
+            "resources": self.sampler.summary(),
+            "resource_limits": self.sampler.limit_status(),
+            "output_buffer": self.output_buffer.stats(),
+            "last_crash_report": self.last_crash_report,
+        }
+
+    def close(self):
+        self.log_pipeline.close()
+        self.sampler.close()
+
+
+class HeadlessSupervisor:
+    def __init__(self, app_name=APP_NAME, socket_path=None):
+        self.app_name = app_name
+        self.data_dir = get_app_data_dir(app_name)
+        self.config_file = os.path.join(self.data_dir, CONFIG_FILE)
+        self.socket_path = socket_path or os.path.join(self.data_dir, CONTROL_SOCKET)
+        self.app_logger, self.daemon_logger = setup_logging(app_name)
+        self.daemon = None
+        self.disk_monitor = None
+        self.server = None
+        self.stopped = None
+
+    async def run(self, autostart=True):
+        loop = asyncio.get_running_loop()
+        self.stopped = asyncio.Event()
+        config = load_config(self.config_file)
+        if config.instances > 1:
+            self.app_logger.warning("Headless mode runs a single instance; ignoring instances setting")
+        configure_log_retention(config)
+        self.daemon = AsyncDaemon(self.app_logger, self.daemon_logger, self.data_dir, config)
+        self.disk_monitor = DiskMonitor()
+        self.disk_monitor.on_alert = lambda level, message: loop.call_soon_threadsafe(
+            self.app_logger.warning, f"Disk space {level}: {message}")
+        self.disk_monitor.on_recommendation = lambda storage_mb: loop.call_soon_threadsafe(
+            self.daemon.spawn, self.apply_recommended_storage(storage_mb))
+        self.configure_disk_monitor(config)
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, self.stopped.set)
+        loop.add_signal_handler(signal.SIGHUP, lambda: self.daemon.spawn(self.reload()))
+        await self.start_control_server()
+        self.app_logger.info(f"Headless supervisor listening on {self.socket_path}")
+        try:
+            if autostart:
+                self.daemon.restart_policy.reset()
+                await self.daemon.start()
+            await self.stopped.wait()
+        finally:
+            self.app_logger.info("Shutting down headless supervisor")
+            self.server.close()
+            await self.server.wait_closed()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            await self.daemon.stop()
+            self.daemon.close()
+            self.disk_monitor.close()
+
+    async def start_control_server(self):
+        os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+        if os.path.exists(self.socket_path):
+            # Stale socket from a previous run, unless someone is still answering on it
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.socket_path)
+                writer.close()
+                raise RuntimeError(f"Another supervisor is already listening on {self.socket_path}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(self.socket_path)
+        self.server = await asyncio.start_unix_server(self.handle_client, self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+
+    async def handle_client(self, reader, writer):
+        # One JSON response line per command line
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    # Over the stream limit (64 KiB); no command is that long
+                    self.app_logger.warning("Control socket: command line too long, closing the connection")
+                    writer.write(json.dumps({"ok": False, "error": "command too long"}).encode("utf8") + b"\n")
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                command = line.decode("utf8", "replace").strip()
+                try:
+                    response = {"ok": True, "result": await self.handle_command(command)}
+                except Exception as e:
+                    response = {"ok": False, "error": str(e)}
+                writer.write(json.dumps(response).encode("utf8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle_command(self, command):
+        if command == "start":
+            # A manual start overrides the crash-loop breaker
+            self.daemon.restart_policy.reset()
+            await self.daemon.start()
+        elif command == "stop":
+            await self.daemon.stop()
+        elif command == "restart":
+            await self.daemon.stop()
+            self.daemon.restart_policy.reset()
+            await self.daemon.start()
+        elif command == "reload":
+            await self.reload()
+        elif command != "status":
+            raise ValueError(f"Unknown command {command!r}, expected one of {', '.join(COMMANDS)}")
+        status = self.daemon.status()
+        status["disk"] = self.disk_monitor.latest()
+        return status
+
+    def configure_disk_monitor(self, config):
+        self.disk_monitor.configure([config.data_dir or default_trin_data_dir()], config.storage,
+                                    config.disk_headroom_mb)
+
+    async def apply_recommended_storage(self, storage_mb):
+        config = self.daemon.config
+        if not config.storage_auto:
+            self.app_logger.info(f"Recommended storage for this disk: {storage_mb} MB "
+                                 f"(configured: {config.storage} MB)")
+            return
+        self.app_logger.info(f"Resizing storage from {config.storage} MB to {storage_mb} MB to fit the disk")
+        config = config.copy()
+        config.storage = storage_mb
+        try:
+            save_config(config, self.config_file)
+        except OSError as e:
+            self.app_logger.error(f"Failed to save config: {str(e)}")
+        await self.apply_config(config)
+
+    async def reload(self):
+        await self.apply_config(load_config(self.config_file))
+
+    async def apply_config(self, config):
+        changed = self.daemon.config.changed_fields(config)
+        restart = self.daemon.config.restart_fields(config)
+        if changed:
+            self.app_logger.info(f"Config changed: {', '.join(changed)}{' (restart required)' if restart else ''}")
+        running = self.daemon.is_running()
+        if restart and running:
+            await self.daemon.stop()
+        self.daemon.config = config
+        self.daemon.sampler.set_interval(config.sample_interval)
+        self.daemon.sampler.set_limits(ResourceLimits.from_config(config))
+        configure_log_retention(config)
+        self.configure_disk_monitor(config)
+        if restart and running:
+            await self.daemon.start()
+
+
+async def send_command(socket_path, command, timeout=30):
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    try:
+        writer.write(command.encode("utf8") + b"\n")
+        await writer.drain()
+        return json.loads(await asyncio.wait_for(reader.readline(), timeout))
+    finally:
+        writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run and control trin without the tray app")
+    parser.add_argument("command", nargs="?", default="run", choices=("run",) + COMMANDS)
+    parser.add_argument("--socket", help="control socket path (default: in the app data dir)")
+    parser.add_argument("--no-start", action="store_true", help="with run: wait for a start command")
+    args = parser.parse_args(argv)
+    socket_path = args.socket or os.path.join(get_app_data_dir(APP_NAME), CONTROL_SOCKET)
+
+    if args.command != "run":
+        try:
+            response = asyncio.run(send_command(socket_path, args.command))
+        except (OSError, asyncio.TimeoutError) as e:
+            print(f"Cannot reach supervisor on {socket_path}: {str(e)}", file=sys.stderr)
+            return 2
+        print(json.dumps(response, indent=2))
+        return 0 if response.get("ok") else 1
+
+    supervisor = HeadlessSupervisor(socket_path=socket_path)
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    supervisor.app_logger.addHandler(console)
+    try:
+        asyncio.run(supervisor.run(autostart=not args.no_start))
+    except RuntimeError as e:
+        supervisor.app_logger.error(str(e))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,231 @@
+import collections
+import http.client
+import random
+import socket
+import time
+from PyQt5.QtCore import QObject, QThread, QTimer, pyqtSignal, pyqtSlot
+from metrics import LatencyHistogram
+from rpc_client import JsonRpcClient, JsonRpcError
+
+# Probe stages, cheapest first
+PROCESS = "process"
+TCP = "tcp"
+RPC = "rpc"
+
+
+class HealthProbe(QObject):
+    # Emitted from the main thread, delivered to probe() on the worker thread
+    probe_requested = pyqtSignal(int)
+    # port, last stage attempted, ok, round-trip latency in seconds
+    probe_finished = pyqtSignal(int, str, bool, float)
+
+    def __init__(self, timeout=2.0):
+        super().__init__()
+        self.timeout = timeout
+        self.clients = {}  # port -> JsonRpcClient, one pooled connection per node
+        self.histogram = LatencyHistogram()  # all ports
+        self.histograms = {}  # port -> LatencyHistogram
+        self.failures = 0
+        self.failures_by_port = {}
+        self.probe_requested.connect(self.probe)
+
+    @pyqtSlot(int)
+    def probe(self, port):
+        # A refused connect is much cheaper than a timed-out RPC call
+        start = time.monotonic()
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=self.timeout).close()
+        except OSError:
+            self.record_failure(port)
+            self.probe_finished.emit(port, TCP, False, time.monotonic() - start)
+            return
+        client = self.clients.get(port)
+        if client is None:
+            client = JsonRpcClient(port, timeout=self.timeout)
+            self.clients[port] = client
+        start = time.monotonic()
+        try:
+            # Same call web3's is_connected() makes
+            client.call("web3_clientVersion")
+            ok = True
+        except (OSError, http.client.HTTPException, JsonRpcError, ValueError):
+            ok = False
+        latency = time.monotonic() - start
+        if ok:
+            self.histogram.observe(latency)
+            self.histogram_for(port).observe(latency)
+        else:
+            self.record_failure(port)
+        self.probe_finished.emit(port, RPC, ok, latency)
+
+    def record_failure(self, port):
+        self.failures += 1
+        self.failures_by_port[port] = self.failures_by_port.get(port, 0) + 1
+
+    def histogram_for(self, port):
+        histogram = self.histograms.get(port)
+        if histogram is None:
+            histogram = self.histograms.setdefault(port, LatencyHistogram())
+        return histogram
+
+    @pyqtSlot()
+    def close(self):
+        for client in self.clients.values():
+            client.close()
+        self.clients = {}
+
+
+def start_health_probe(timeout=2.0):
+    thread = QThread()
+    probe = HealthProbe(timeout)
+    probe.moveToThread(thread)
+    thread.finished.connect(probe.close)
+    thread.start()
+    return thread, probe
+
+
+class AdaptiveInterval:
+    # Short right after a start or failure, growing by factor on every
+    # healthy probe up to max_interval; jittered so instances drift apart
+    def __init__(self, min_interval=2.0, max_interval=60.0, factor=1.5, jitter=0.2):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.factor = factor
+        self.jitter = jitter
+        self.current = min_interval
+
+    def tighten(self):
+        self.current = self.min_interval
+
+    def relax(self):
+        self.current = min(self.max_interval, self.current * self.factor)
+
+    def next_delay(self):
+        return self.current * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+class ProbeState:
+    def __init__(self, manager, interval, history_size):
+        self.manager = manager
+        self.interval = interval
+        self.history = collections.deque(maxlen=history_size)  # (wall time, stage, ok, latency)
+        self.timer = None
+        self.due_at = None
+        self.pending_port = None  # set while a network probe is in flight
+
+
+class HealthScheduler(QObject):
+    # Runs the cheap process check on the GUI thread and only hands the node
+    # to the worker for TCP and RPC probes once it is alive and answering
+    probed = pyqtSignal(object)  # DaemonManager, after every probe
+    probe_failed = pyqtSignal(object, str, float)  # DaemonManager, stage, latency
+
+    def __init__(self, health_probe, min_interval=2.0, max_interval=60.0, jitter=0.2, history_size=20):
+        super().__init__()
+        self.health_probe = health_probe
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.history_size = history_size
+        self.states = {}  # DaemonManager -> ProbeState
+        self.health_probe.probe_finished.connect(self.handle_result)
+
+    def watch(self, manager):
+        if manager in self.states:
+            return
+        interval = AdaptiveInterval(self.min_interval, self.max_interval, jitter=self.jitter)
+        state = ProbeState(manager, interval, self.history_size)
+        state.timer = QTimer(self)
+        state.timer.setSingleShot(True)
+        state.timer.timeout.connect(lambda: self.run_probe(manager))
+        self.states[manager] = state
+        if not manager.is_daemon_running():
+            # Idle instances only need the slow fallback check
+            interval.current = interval.max_interval
+        manager.daemon_started.connect(lambda *args: self.tighten(manager))
+        manager.daemon_exited.connect(lambda *args: self.tighten(manager))
+        manager.readiness_changed.connect(lambda *args: self.tighten(manager))
+        self.schedule(state)
+
+    def unwatch(self, manager):
+        state = self.states.pop(manager, None)
+        if state:
+            state.timer.stop()
+            state.timer.deleteLater()
+
+    def tighten(self, manager):
+        state = self.states.get(manager)
+        if state is None:
+            return
+        state.interval.tighten()
+        if state.pending_port is None:
+            self.schedule(state)
+
+    def schedule(self, state):
+        delay = state.interval.next_delay()
+        state.due_at = time.monotonic() + delay
+        state.timer.start(int(delay * 1000))
+
+    def run_probe(self, manager):
+        from readiness import RPC_READY, SYNCED
+        state = self.states.get(manager)
+        if state is None:
+            return
+        if manager.closing:
+            self.unwatch(manager)
+            return
+        if manager.stopping or manager.config is None:
+            self.schedule(state)
+            return
+        if not manager.is_daemon_running():
+            # Exits are normally caught through daemon_exited; this is the fallback.
+            # Restarts have their own backoff, so the check itself can slow down.
+            # Nothing to report while a restart is pending or the breaker is open.
+            self.record(state, PROCESS, False, 0.0)
+            if not manager.restart_pending():
+                self.probe_failed.emit(manager, PROCESS, 0.0)
+            state.interval.relax()
+            self.schedule(state)
+            self.probed.emit(manager)
+            return
+        if manager.readiness.phase not in (RPC_READY, SYNCED):
+            # Still starting; the readiness poller is already hitting the port
+            self.record(state, PROCESS, True, 0.0)
+            self.schedule(state)
+            self.probed.emit(manager)
+            return
+        state.pending_port = manager.config.rpc_port
+        state.due_at = None
+        self.health_probe.probe_requested.emit(state.pending_port)
+
+    def handle_result(self, port, stage, ok, latency):
+        for manager, state in list(self.states.items()):
+            if state.pending_port != port:
+                continue
+            state.pending_port = None
+            self.record(state, stage, ok, latency)
+            if ok:
+                state.interval.relax()
+            else:
+                state.interval.tighten()
+                self.probe_failed.emit(manager, stage, latency)
+            self.schedule(state)
+            self.probed.emit(manager)
+
+    def record(self, state, stage, ok, latency):
+        state.history.append((time.time(), stage, ok, latency))
+
+    def describe(self, manager):
+        state = self.states.get(manager)
+        if state is None:
+            return "N/A", []
+        if state.pending_port is not None:
+            schedule = f"every ~{state.interval.current:.0f}s, probe in flight"
+        else:
+            remaining = max(0.0, state.due_at - time.monotonic()) if state.due_at else 0.0
+            schedule = f"every ~{state.interval.current:.0f}s, next in {remaining:.0f}s"
+        return schedule, list(state.history)
+
+    def close(self):
+        for manager in list(self.states):
+            self.unwatch(manager)
@@ -1,25 +1,237 @@
 import os
+import re
 import sys
+import gzip
+import shutil
+import threading
+import queue
+import time
 import logging
 from logging.handlers import RotatingFileHandler
-from PyQt5.QtCore import QStandardPaths
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAX_LOG_BYTES = 5 * 1024 * 1024  # live file size that triggers a rotation
+PRUNE_INTERVAL = 3600  # seconds between retention passes over every log dir, rotations or not
+# Rotated files are named <log>.<YYYYmmdd-HHMMSS.ffffff>[.gz|.zst]; older
+# versions of the app numbered them <log>.1 to <log>.5
+ROTATED = re.compile(r"\.log\.(\d{8}-\d{6}\.\d{6}|\d+)(\.gz|\.zst)?$")
 
 
 def get_app_data_dir(app_name):
     if sys.platform == 'darwin':
+        # Only macOS needs Qt here; keep it out of the import path elsewhere
+        from PyQt5.QtCore import QStandardPaths
         return os.path.join(QStandardPaths.writableLocation(QStandardPaths.AppDataLocation), app_name)
     elif sys.platform == 'win32':
         return os.path.join(os.environ.get('APPDATA', ''), app_name)
     else:  # linux and other unix-like
         return os.path.join(os.path.expanduser('~'), f'.{app_name.lower()}')
 
+def compressed_suffix():
+    return ".zst" if zstandard is not None else ".gz"
+
+
+def rotated_files(log_dir, prefix=""):
+    # (path, size, mtime) of every rotated log in log_dir starting with prefix, oldest first
+    found = []
+    try:
+        entries = list(os.scandir(log_dir))
+    except OSError:
+        return []
+    for entry in entries:
+        match = ROTATED.search(entry.name)
+        if not match or not entry.name.startswith(prefix) or not entry.is_file():
+            continue
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        stamp = match.group(1)
+        # Numbered legacy rotations predate every timestamped one, higher is older
+        order = ("0", f"{100000 - int(stamp):06d}") if stamp.isdigit() else ("1", stamp)
+        found.append((order, entry.path, stat.st_size, stat.st_mtime))
+    found.sort()
+    return [(path, size, mtime) for order, path, size, mtime in found]
+
+
+class LogArchiver:
+    # Compresses rotated logs on a background thread and enforces retention
+    # over everything rotated in the log directory. Rotation only renames the
+    # live file and queues it, so writers never wait on compression.
+    def __init__(self, max_bytes=200 * 1024 * 1024, max_age=30 * 86400):
+        self.max_bytes = max_bytes
+        self.max_age = max_age  # seconds, 0 = keep regardless of age
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.log_dirs = set()
+        self.thread = None
+        self.compressed_files = 0
+        self.compressed_bytes = 0  # input bytes
+        self.removed_files = 0
+
+    def set_limits(self, max_bytes, max_age):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        for log_dir in list(self.log_dirs):
+            self.queue.put((None, log_dir))
+        self.ensure_thread()
+
+    def watch(self, log_dir):
+        # Picks up rotations left uncompressed by an earlier run
+        with self.lock:
+            if log_dir in self.log_dirs:
+                return
+            self.log_dirs.add(log_dir)
+        for path, size, mtime in rotated_files(log_dir):
+            if not path.endswith((".gz", ".zst")):
+                self.queue.put((path, log_dir))
+        self.queue.put((None, log_dir))
+        self.ensure_thread()
+
+    def submit(self, path):
+        log_dir = os.path.dirname(path)
+        self.log_dirs.add(log_dir)
+        self.queue.put((path, log_dir))
+        self.ensure_thread()
+
+    def ensure_thread(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="log-archiver", daemon=True)
+                self.thread.start()
+
+    def run(self):
+        try:
+            # Compression must not compete with trin or the GUI for CPU
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+        except (AttributeError, OSError):
+            pass
+        # Retention runs once the queue drains, for every dir that had work,
+        # and periodically for all of them so the age limit holds on a node
+        # that never rotates
+        pending = set()
+        next_prune = time.monotonic() + PRUNE_INTERVAL
+        while True:
+            try:
+                path, log_dir = self.queue.get(timeout=max(0.0, next_prune - time.monotonic()))
+            except queue.Empty:
+                path, log_dir = None, None
+            if path is not None:
+                self.compress(path)
+            if log_dir is not None:
+                pending.add(log_dir)
+            if time.monotonic() >= next_prune:
+                next_prune = time.monotonic() + PRUNE_INTERVAL
+                pending.update(list(self.log_dirs))
+            if self.queue.empty():
+                for log_dir in pending:
+                    self.prune(log_dir)
+                pending.clear()
+
+    def compress(self, path):
+        target = path + compressed_suffix()
+        tmp_file = target + ".tmp"
+        try:
+            size = os.path.getsize(path)
+            with open(path, "rb") as source, open(tmp_file, "wb") as f:
+                if zstandard is not None:
+                    with zstandard.ZstdCompressor(level=3).stream_writer(f, closefd=False) as writer:
+                        shutil.copyfileobj(source, writer, 1024 * 1024)
+                else:
+                    with gzip.GzipFile(fileobj=f, mode="wb", compresslevel=6) as writer:
+                        shutil.copyfileobj(source, writer, 1024 * 1024)
+            # Keep the rotation time so age-based retention still works
+            stat = os.stat(path)
+            os.utime(tmp_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            os.replace(tmp_file, target)
+            os.unlink(path)
+        except OSError:
+            try:
+                os.unlink(tmp_file)
+            except OSError:
+                pass
+            return
+        self.compressed_files += 1
+        self.compressed_bytes += size
+
+    def prune(self, log_dir):
+        files = rotated_files(log_dir)
+        total = sum(size for path, size, mtime in files)
+        cutoff = time.time() - self.max_age if self.max_age else None
+        for path, size, mtime in files:
+            if total <= self.max_bytes and (cutoff is None or mtime >= cutoff):
+                continue
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            self.removed_files += 1
+
+    def stats(self):
+        return {"pending": self.queue.qsize(), "compressed_files": self.compressed_files,
+                "compressed_bytes": self.compressed_bytes, "removed_files": self.removed_files}
+
+
+archiver = LogArchiver()
+
+
+def configure_log_retention(config):
+    archiver.set_limits(config.log_retention_mb * 1024 * 1024, config.log_retention_days * 86400)
+
+
+class ArchivingFileHandler(RotatingFileHandler):
+    # Rotation renames the live file to a timestamped name and leaves
+    # compression and retention to the archiver thread
+    def __init__(self, filename, maxBytes=MAX_LOG_BYTES):
+        super().__init__(filename, maxBytes=maxBytes, backupCount=0)
+        archiver.watch(os.path.dirname(self.baseFilename))
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        if os.path.exists(self.baseFilename):
+            now = time.time()
+            rotated = f"{self.baseFilename}.{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}.{int(now * 1e6) % 1000000:06d}"
+            try:
+                os.rename(self.baseFilename, rotated)
+                archiver.submit(rotated)
+            except OSError:
+                pass
+        if not self.delay:
+            self.stream = self._open()
+
+
+class BatchRotatingFileHandler(ArchivingFileHandler):
+    # Lets LogPipeline write a whole batch of records with a single flush
+    def emit_batch(self, records):
+        self.acquire()
+        try:
+            for record in records:
+                try:
+                    if self.shouldRollover(record):
+                        self.doRollover()
+                    if self.stream is None:
+                        self.stream = self._open()
+                    self.stream.write(self.format(record) + self.terminator)
+                except Exception:
+                    self.handleError(record)
+            if self.stream:
+                self.stream.flush()
+        finally:
+            self.release()
+
 def setup_logging(app_name):
     log_dir = os.path.join(get_app_data_dir(app_name), 'logs')
     os.makedirs(log_dir, exist_ok=True)
 
     # Setup for main app logger
     app_log_file = os.path.join(log_dir, f'{app_name}.log')
-    app_handler = RotatingFileHandler(app_log_file, maxBytes=5*1024*1024, backupCount=5)
+    app_handler = ArchivingFileHandler(app_log_file)
     app_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     app_handler.setFormatter(app_formatter)
 
@@ -27,14 +239,26 @@ def setup_logging(app_name):
     app_logger.setLevel(logging.INFO)
     app_logger.addHandler(app_handler)
 
-    # Setup for daemon logger
-    daemon_log_file = os.path.join(log_dir, f'{app_name}_daemon.log')
-    daemon_handler = RotatingFileHandler(daemon_log_file, maxBytes=5*1024*1024, backupCount=5)
+    daemon_logger = setup_daemon_logger(app_name)
+
+    return app_logger, daemon_logger
+
+def setup_daemon_logger(app_name, instance=0, standby=False):
+    # Instance 0 keeps the original file name; extra instances and warm-swap
+    # standbys get their own file
+    log_dir = os.path.join(get_app_data_dir(app_name), 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+    suffix = (f"_{instance}" if instance else "") + ("_standby" if standby else "")
+
+    daemon_log_file = os.path.join(log_dir, f'{app_name}_daemon{suffix}.log')
+    daemon_logger = logging.getLogger(f"{app_name}_daemon{suffix}")
+    if daemon_logger.handlers:
+        return daemon_logger
+    daemon_handler = BatchRotatingFileHandler(daemon_log_file)
     daemon_formatter = logging.Formatter('%(asctime)s - DAEMON - %(levelname)s - %(message)s')
     daemon_handler.setFormatter(daemon_formatter)
 
-    daemon_logger = logging.getLogger(f"{app_name}_daemon")
     daemon_logger.setLevel(logging.INFO)
     daemon_logger.addHandler(daemon_handler)
 
-    return app_logger, daemon_logger
+    return daemon_logger
@@ -0,0 +1,366 @@
+import argparse
+import contextlib
+import gzip
+import json
+import mmap
+import os
+import re
+import sys
+import time
+from log import get_app_data_dir, rotated_files, zstandard
+
+# Sidecar index over the daemon logs written by setup_daemon_logger. Each file
+# is cut into ~64 KB blocks at line boundaries; a block records its time range
+# and which levels occur in it, so a query only reads (through mmap) the blocks
+# that can match. Indexes are keyed by inode, which the rename on rotation
+# preserves, so a rotated file is indexed again only once it is compressed.
+# Compressed rotations are decompressed into memory to be read.
+APP_NAME = "TrinApp"
+INDEX_DIR = "index"
+INDEX_VERSION = 1
+BLOCK_SIZE = 64 * 1024
+HEAD_BYTES = 64  # start of the file stored with the index to catch inode reuse
+COMPRESSED = (".gz", ".zst")
+# '%(asctime)s - DAEMON - %(levelname)s - %(message)s'
+LINE = re.compile(rb"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d),\d+ - \w+ - ([A-Z]+) - ", re.MULTILINE)
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+LEVELS = {"DEBUG": 1, "INFO": 2, "WARNING": 4, "ERROR": 8, "CRITICAL": 16}
+
+
+def level_mask(min_level):
+    # Bits of min_level and everything more severe
+    bit = LEVELS[min_level]
+    return sum(value for value in LEVELS.values() if value >= bit)
+
+
+def line_matches(line, mask, regex=None):
+    # Filter for lines read straight from the file, e.g. when following it
+    match = LINE.match(line.encode("utf8", "replace"))
+    if match and not LEVELS.get(match.group(2).decode("ascii"), 0) & mask:
+        return False
+    return not regex or regex.search(line) is not None
+
+
+def format_time(seconds):
+    # Log timestamps are local time and sort as strings
+    return time.strftime(TIME_FORMAT, time.localtime(seconds)).encode("ascii")
+
+
+def parse_time(text, now=None):
+    # "15m", "2h", "1d" ago, or a local "YYYY-MM-DD HH:MM[:SS]"
+    now = time.time() if now is None else now
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if text and text[-1] in units and text[:-1].replace(".", "", 1).isdigit():
+        return now - float(text[:-1]) * units[text[-1]]
+    for fmt in (TIME_FORMAT, "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return time.mktime(time.strptime(text, fmt))
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised time {text!r}")
+
+
+def log_files(log_dir, instance=0, app_name=APP_NAME):
+    # Oldest rotation first, the live file last
+    suffix = f"_{instance}" if instance else ""
+    name = f"{app_name}_daemon{suffix}.log"
+    paths = [path for path, size, mtime in rotated_files(log_dir, name + ".")]
+    base = os.path.join(log_dir, name)
+    return paths + [base] if os.path.exists(base) else paths
+
+
+@contextlib.contextmanager
+def open_log(path):
+    # Plain files are mapped; compressed ones are immutable and read whole
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            yield f.read()
+    elif path.endswith(".zst"):
+        if zstandard is None:
+            raise OSError(f"zstandard is not installed, cannot read {path}")
+        with open(path, "rb") as f, zstandard.ZstdDecompressor().stream_reader(f) as reader:
+            yield reader.read()
+    else:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+
+class FileIndex:
+    def __init__(self, path, index_dir):
+        self.path = path
+        self.index_dir = index_dir
+        self.blocks = []  # [offset, end, first_time, last_time, level_mask, lines]
+        self.size = 0  # bytes covered by the index, always at a line boundary
+        self.head = b""
+        self.key = None
+
+    def index_file(self):
+        return os.path.join(self.index_dir, f"{self.key}.idx")
+
+    def load(self, stat):
+        self.key = f"{stat.st_dev}-{stat.st_ino}"
+        try:
+            with open(self.index_file()) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != INDEX_VERSION:
+            return
+        if not self.path.endswith(COMPRESSED) and data.get("size", 0) > stat.st_size:
+            return
+        self.size = data["size"]
+        self.head = bytes.fromhex(data["head"])
+        self.blocks = [[b[0], b[1], b[2].encode("ascii"), b[3].encode("ascii"), b[4], b[5]] for b in data["blocks"]]
+
+    def save(self):
+        data = {"version": INDEX_VERSION, "size": self.size, "head": self.head.hex(),
+                "blocks": [[b[0], b[1], b[2].decode("ascii"), b[3].decode("ascii"), b[4], b[5]]
+                           for b in self.blocks]}
+        tmp_file = self.index_file() + ".tmp"
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)
+            with open(tmp_file, "w") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp_file, self.index_file())
+        except OSError:
+            pass
+
+    def update(self):
+        # Indexes whatever was appended since the last call; returns self
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            self.blocks, self.size = [], 0
+            return self
+        if self.key != f"{stat.st_dev}-{stat.st_ino}":
+            self.blocks, self.size, self.head = [], 0, b""
+            self.load(stat)
+        compressed = self.path.endswith(COMPRESSED)
+        if compressed and self.size or stat.st_size == self.size or stat.st_size == 0:
+            return self
+        with open_log(self.path) as data:
+            head = data[:HEAD_BYTES]
+            if not compressed and stat.st_size < self.size or not head.startswith(self.head):
+                # Truncated or a different file under a reused inode
+                self.blocks, self.size = [], 0
+            self.head = head
+            # The last block may be short; redo it so blocks stay ~BLOCK_SIZE
+            if self.blocks and self.blocks[-1][1] - self.blocks[-1][0] < BLOCK_SIZE:
+                self.size = self.blocks.pop()[0]
+            end = data.rfind(b"\n", self.size) + 1
+            if end <= self.size:
+                return self
+            self.index_range(data, self.size, end)
+        self.size = end
+        self.save()
+        return self
+
+    def index_range(self, data, start, end):
+        while start < end:
+            stop = data.find(b"\n", min(start + BLOCK_SIZE, end) - 1) + 1 or end
+            stop = min(stop, end)
+            first = last = b""
+            mask = lines = 0
+            for match in LINE.finditer(data[start:stop]):
+                if not first:
+                    first = match.group(1)
+                last = match.group(1)
+                mask |= LEVELS.get(match.group(2).decode("ascii"), 0)
+                lines += 1
+            self.blocks.append([start, stop, first, last, mask, lines])
+            start = stop
+
+    def candidate_blocks(self, since, until, mask):
+        # since/until are formatted times or None
+        for block in self.blocks:
+            offset, end, first, last, levels, lines = block
+            if not levels & mask:
+                continue
+            if since and last and last < since:
+                continue
+            if until and first and first > until:
+                continue
+            yield block
+
+    def search(self, since=None, until=None, min_level="DEBUG", pattern=None, limit=None):
+        # Matching (offset, line) pairs, newest first
+        mask = level_mask(min_level)
+        blocks = list(self.candidate_blocks(since, until, mask))
+        if not blocks:
+            return
+        with open_log(self.path) as data:
+            for offset, end, *_ in reversed(blocks):
+                chunk = data[offset:end]
+                matches = []
+                for match in LINE.finditer(chunk):
+                    stamp = match.group(1)
+                    if since and stamp < since or until and stamp > until:
+                        continue
+                    if not LEVELS.get(match.group(2).decode("ascii"), 0) & mask:
+                        continue
+                    line_end = chunk.find(b"\n", match.start())
+                    line = chunk[match.start():line_end if line_end >= 0 else len(chunk)].decode("utf8", "replace")
+                    if pattern and not pattern.search(line):
+                        continue
+                    matches.append((offset + match.start(), line))
+                for result in reversed(matches):
+                    yield result
+                    if limit is not None:
+                        limit -= 1
+                        if limit <= 0:
+                            return
+
+
+class LogQuery:
+    # Searches across the live daemon log and its rotations
+    def __init__(self, log_dir, instance=0, app_name=APP_NAME):
+        self.log_dir = log_dir
+        self.instance = instance
+        self.app_name = app_name
+        self.index_dir = os.path.join(log_dir, INDEX_DIR)
+        self.indexes = {}  # inode key -> FileIndex
+
+    def files(self):
+        # FileIndex per file, oldest first, each brought up to date
+        current = []
+        for path in log_files(self.log_dir, self.instance, self.app_name):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            key = f"{stat.st_dev}-{stat.st_ino}"
+            index = self.indexes.get(key) or FileIndex(path, self.index_dir)
+            index.path = path  # follows renames on rotation
+            current.append(index.update())
+        self.indexes = {index.key: index for index in current if index.key}
+        return current
+
+    def search(self, since=None, until=None, min_level="DEBUG", pattern=None, limit=1000):
+        # Oldest-first list of the newest `limit` matching lines; since and
+        # until are epoch seconds, pattern a case-insensitive regex
+        since = format_time(since) if since is not None else None
+        until = format_time(until) if until is not None else None
+        regex = re.compile(pattern, re.IGNORECASE) if pattern else None
+        results = []
+        for index in reversed(self.files()):
+            remaining = None if limit is None else limit - len(results)
+            if remaining is not None and remaining <= 0:
+                break
+            results.extend(line for offset, line in index.search(since, until, min_level, regex, remaining))
+        results.reverse()
+        return results
+
+    def prune(self):
+        # Drops index files of logs that have rotated away, for every instance
+        prefix = f"{self.app_name}_daemon"
+        live = set()
+        try:
+            for entry in os.scandir(self.log_dir):
+                if entry.name.startswith(prefix) and entry.is_file():
+                    stat = entry.stat()
+                    live.add(f"{stat.st_dev}-{stat.st_ino}.idx")
+            names = os.listdir(self.index_dir)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith(".idx") and name not in live:
+                try:
+                    os.unlink(os.path.join(self.index_dir, name))
+                except OSError:
+                    pass
+
+
+class LogFollower:
+    # Returns lines appended to the live log since the last poll, carrying
+    # over a partial last line and finishing the old file after a rotation
+    def __init__(self, log_dir, instance=0, app_name=APP_NAME, from_end=True):
+        self.path = os.path.join(log_dir, f"{app_name}_daemon{f'_{instance}' if instance else ''}.log")
+        self.file = None
+        self.inode = None
+        self.partial = b""
+        self.from_end = from_end
+
+    def open(self):
+        try:
+            self.file = open(self.path, "rb")
+        except OSError:
+            self.file = None
+            return
+        self.inode = os.fstat(self.file.fileno()).st_ino
+        if self.from_end:
+            self.file.seek(0, os.SEEK_END)
+        self.from_end = False  # files that appear later are read from the start
+
+    def poll(self, max_bytes=4 * 1024 * 1024):
+        if self.file is None:
+            self.open()
+            if self.file is None:
+                return []
+        data = self.file.read(max_bytes)
+        try:
+            rotated = os.stat(self.path).st_ino != self.inode
+        except OSError:
+            rotated = False
+        if rotated and len(data) < max_bytes:
+            # The old file is fully read through our open handle; switch over
+            self.file.close()
+            self.open()
+            if self.file is not None:
+                data += self.file.read(max_bytes)
+        data = self.partial + data
+        lines = data.split(b"\n")
+        self.partial = lines.pop()
+        return [line.decode("utf8", "replace") for line in lines]
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search the trin daemon logs")
+    parser.add_argument("pattern", nargs="?", help="case-insensitive regex to match")
+    parser.add_argument("--instance", type=int, default=0)
+    parser.add_argument("--since", help="e.g. 15m, 2h, 1d or 'YYYY-MM-DD HH:MM'")
+    parser.add_argument("--until", help="same formats as --since")
+    parser.add_argument("--level", default="DEBUG", type=str.upper, choices=list(LEVELS),
+                        help="minimum level")
+    parser.add_argument("--limit", type=int, default=200, help="newest matches to show, 0 = all")
+    parser.add_argument("--follow", "-f", action="store_true", help="keep printing new matching lines")
+    parser.add_argument("--log-dir", help="default: the app's log directory")
+    args = parser.parse_args(argv)
+    log_dir = args.log_dir or os.path.join(get_app_data_dir(APP_NAME), "logs")
+    try:
+        since = parse_time(args.since) if args.since else None
+        until = parse_time(args.until) if args.until else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    query = LogQuery(log_dir, args.instance)
+    follower = LogFollower(log_dir, args.instance)
+    if args.follow:
+        # Opened first so nothing written during the search is missed
+        follower.open()
+    for line in query.search(since, until, args.level, args.pattern, args.limit or None):
+        print(line)
+    query.prune()
+    if not args.follow:
+        return 0
+
+    regex = re.compile(args.pattern, re.IGNORECASE) if args.pattern else None
+    mask = level_mask(args.level)
+    try:
+        while True:
+            for line in follower.poll():
+                if line_matches(line, mask, regex):
+                    print(line, flush=True)
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        follower.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
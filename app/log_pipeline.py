@@ -0,0 +1,221 @@
+import codecs
+import collections
+import logging
+import threading
+import time
+
+
+class LineSplitter:
+    # Decodes a byte stream incrementally and returns complete lines, carrying
+    # a trailing partial line (or partial UTF-8 sequence) over to the next chunk
+    def __init__(self, max_line=64 * 1024):
+        self.decoder = codecs.getincrementaldecoder('utf8')(errors='replace')
+        self.partial = ''
+        self.max_line = max_line
+
+    def feed(self, data):
+        text = self.partial + self.decoder.decode(data)
+        lines = text.split('\n')
+        self.partial = lines.pop()
+        # Don't let a runaway line without a newline grow forever
+        if len(self.partial) > self.max_line:
+            lines.append(self.partial)
+            self.partial = ''
+        return lines
+
+    def flush(self):
+        text = self.partial + self.decoder.decode(b'', final=True)
+        self.partial = ''
+        self.decoder.reset()
+        return [text] if text else []
+
+
+class LogPipeline:
+    DROP_OLDEST = 'drop-oldest'  # keep the most recent output
+    DROP_NEWEST = 'drop-newest'  # keep what is already queued
+
+    def __init__(self, logger, max_pending_bytes=8 * 1024 * 1024, batch_size=512,
+                 flush_interval=0.1, policy=DROP_OLDEST, error_logger=None):
+        self.logger = logger
+        self.error_logger = error_logger or logging.getLogger(__name__)  # failures of the pipeline itself
+        self.max_pending_bytes = max_pending_bytes
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.pending = collections.deque()  # (level, bytes); level None marks end of stream
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.pending_bytes = 0
+        self.splitters = collections.defaultdict(LineSplitter)  # level -> splitter
+        self.lines_total = 0
+        self.bytes_total = 0
+        self.dropped_lines = 0
+        self.dropped_bytes = 0
+        self.reported_drops = 0
+        self.errors = 0
+        self.last_error_logged = None
+        self.closed = False
+        self.line_watchers = []  # callables(level, line), run on the writer thread
+        self.rate_samples = collections.deque(maxlen=11)  # (time, lines, bytes), ~10 s window
+        self.thread = threading.Thread(target=self.run, name="daemon-log-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, level, data):
+        # Called from the GUI thread; never blocks
+        if not data:
+            return
+        with self.lock:
+            self.bytes_total += len(data)
+            if self.pending_bytes + len(data) > self.max_pending_bytes:
+                if self.policy == self.DROP_NEWEST:
+                    self.drop(data)
+                    return
+                self.drop_oldest(self.pending_bytes + len(data) - self.max_pending_bytes)
+            self.pending_bytes += len(data)
+            self.pending.append((level, data))
+            self.not_empty.notify()
+
+    def drop(self, data):
+        self.dropped_bytes += len(data)
+        self.dropped_lines += data.count(b'\n') or 1
+
+    def drop_oldest(self, needed):
+        kept = collections.deque()
+        while self.pending and needed > 0:
+            level, old = self.pending.popleft()
+            if level is None:
+                kept.append((level, old))
+                continue
+            self.pending_bytes -= len(old)
+            needed -= len(old)
+            self.drop(old)
+        kept.extend(self.pending)
+        self.pending = kept
+
+    def end_of_stream(self):
+        # Flush partial lines once the process has exited
+        with self.lock:
+            self.pending.append((None, b''))
+            self.not_empty.notify()
+
+    def close(self, timeout=2.0):
+        self.end_of_stream()
+        with self.lock:
+            self.closed = True
+            self.not_empty.notify()
+        self.thread.join(timeout)
+
+    def take(self, timeout):
+        # Waits up to timeout for pending chunks, then takes up to batch_size of them
+        with self.lock:
+            if not self.pending and not self.closed:
+                self.not_empty.wait(timeout)
+            batch = []
+            while self.pending and len(batch) < self.batch_size:
+                level, data = self.pending.popleft()
+                self.pending_bytes -= len(data)
+                batch.append((level, data))
+            return batch
+
+    def run(self):
+        while True:
+            batch = self.take(1.0)
+            if not batch:
+                self.sample_rates()
+                if self.closed:
+                    return
+                continue
+            # Let a burst accumulate so it goes out in a single write and flush.
+            # Only the write waits: chunks are split and shown to the line
+            # watchers as they arrive, so readiness lines aren't held back.
+            records = self.process_guarded(batch)
+            taken = len(batch)
+            deadline = time.monotonic() + self.flush_interval
+            while taken < self.batch_size and not self.closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                batch = self.take(remaining)
+                records.extend(self.process_guarded(batch))
+                taken += len(batch)
+            self.lines_total += len(records)
+            dropped = self.dropped_lines - self.reported_drops
+            if dropped:
+                self.reported_drops += dropped
+                records.append(self.make_record(logging.WARNING, f"[log pipeline dropped {dropped} lines]"))
+            try:
+                self.write(records)
+            except Exception:
+                self.report_error("writing the log")
+            self.sample_rates()
+
+    def process_guarded(self, batch):
+        try:
+            return self.process(batch)
+        except Exception:
+            self.report_error("processing output")
+            return []
+
+    def process(self, batch):
+        records = []
+        for level, data in batch:
+            if level is None:
+                for splitter_level, splitter in self.splitters.items():
+                    records.extend(self.make_record(splitter_level, line) for line in splitter.flush() if line.strip())
+                continue
+            lines = self.splitters[level].feed(data)
+            for watcher in self.line_watchers:
+                try:
+                    for line in lines:
+                        watcher(level, line)
+                except Exception:
+                    self.report_error("a line watcher")
+            records.extend(self.make_record(level, line.rstrip('\r')) for line in lines if line.strip())
+        return records
+
+    def report_error(self, stage):
+        # Called from an except block on the writer thread, which carries on;
+        # the traceback is logged at most once a minute
+        self.errors += 1
+        now = time.monotonic()
+        if self.last_error_logged is None or now - self.last_error_logged >= 60:
+            self.last_error_logged = now
+            self.error_logger.exception(f"Daemon log pipeline failed {stage} ({self.errors} errors so far)")
+
+    def make_record(self, level, line):
+        return self.logger.makeRecord(self.logger.name, level, "", 0, line, None, None)
+
+    def write(self, records):
+        if not records:
+            return
+        records = [r for r in records if self.logger.isEnabledFor(r.levelno)]
+        for handler in self.logger.handlers:
+            if hasattr(handler, 'emit_batch'):
+                handler.emit_batch(records)
+            else:
+                for record in records:
+                    handler.handle(record)
+
+    def sample_rates(self):
+        now = time.monotonic()
+        if self.rate_samples and now - self.rate_samples[-1][0] < 1.0:
+            return
+        self.rate_samples.append((now, self.lines_total, self.bytes_total))
+
+    def stats(self):
+        lines_per_sec = bytes_per_sec = 0.0
+        if len(self.rate_samples) >= 2:
+            (t0, l0, b0), (t1, l1, b1) = self.rate_samples[0], self.rate_samples[-1]
+            if t1 > t0:
+                lines_per_sec = (l1 - l0) / (t1 - t0)
+                bytes_per_sec = (b1 - b0) / (t1 - t0)
+        return {
+            "lines_total": self.lines_total,
+            "bytes_total": self.bytes_total,
+            "dropped_lines": self.dropped_lines,
+            "dropped_bytes": self.dropped_bytes,
+            "errors": self.errors,
+            "pending_bytes": self.pending_bytes,
+            "lines_per_sec": lines_per_sec,
+            "bytes_per_sec": bytes_per_sec,
+        }
@@ -0,0 +1,274 @@
+import re
+import threading
+import time
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QSpinBox, QCheckBox, QPushButton,
+                             QComboBox, QLineEdit, QPlainTextEdit)
+from PyQt5.QtCore import QTimer, pyqtSignal
+from PyQt5.QtGui import QFontDatabase
+from log_index import LEVELS, LogFollower, LogQuery, level_mask, line_matches
+
+MAX_LINES = 5000  # kept in the view; older lines scroll away
+
+
+class LogWindow(QWidget):
+    # Internal: generation, lines, seconds taken; emitted from the search thread
+    search_finished = pyqtSignal(int, list, float)
+
+    def __init__(self, log_dir, instances=1):
+        super().__init__()
+        self.log_dir = log_dir
+        self.queries = {}  # instance -> LogQuery, so indexes stay warm between searches
+        self.follower = None
+        self.search_lock = threading.Lock()  # one search at a time touches the indexes
+        self.generation = 0  # bumped per search so stale results are ignored
+        self.follow_timer = QTimer(self)
+        self.follow_timer.setInterval(1000)
+        self.follow_timer.timeout.connect(self.poll_follower)
+        self.search_finished.connect(self.show_results)
+        self.initUI()
+        self.set_instances(instances)
+
+    def initUI(self):
+        self.setWindowTitle('Daemon logs')
+        self.setGeometry(300, 300, 900, 500)
+
+        layout = QVBoxLayout()
+        controls = QHBoxLayout()
+
+        self.instance_input = QComboBox(self)
+        controls.addWidget(QLabel('Instance:'))
+        controls.addWidget(self.instance_input)
+
+        self.level_input = QComboBox(self)
+        self.level_input.addItems(list(LEVELS))
+        self.level_input.setCurrentText('INFO')
+        controls.addWidget(QLabel('Level:'))
+        controls.addWidget(self.level_input)
+
+        self.minutes_input = QSpinBox(self)
+        self.minutes_input.setRange(0, 7 * 24 * 60)
+        self.minutes_input.setValue(60)
+        controls.addWidget(QLabel('Last minutes (0 = all):'))
+        controls.addWidget(self.minutes_input)
+
+        self.pattern_input = QLineEdit(self)
+        self.pattern_input.setPlaceholderText('Regex, case-insensitive')
+        self.pattern_input.returnPressed.connect(self.search)
+        controls.addWidget(self.pattern_input)
+
+        search_button = QPushButton('Search', self)
+        search_button.clicked.connect(self.search)
+        controls.addWidget(search_button)
+
+        self.follow_checkbox = QCheckBox('Follow', self)
+        self.follow_checkbox.toggled.connect(self.set_follow)
+        controls.addWidget(self.follow_checkbox)
+
+        layout.addLayout(controls)
+
+        self.output = QPlainTextEdit(self)
+        self.output.setReadOnly(True)
+        self.output.setMaximumBlockCount(MAX_LINES)
+        self.output.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.output.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        layout.addWidget(self.output)
+
+        self.status_label = QLabel('', self)
+        layout.addWidget(self.status_label)
+
+        self.setLayout(layout)
+
+    def set_instances(self, count):
+        current = self.instance_input.currentIndex()
+        self.instance_input.clear()
+        self.instance_input.addItems([str(index) for index in range(count)])
+        self.instance_input.setCurrentIndex(current if 0 <= current < count else 0)
+
+    def filters(self):
+        pattern = self.pattern_input.text().strip() or None
+        if pattern:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                self.status_label.setText(f'Bad pattern: {str(e)}')
+                return None
+        minutes = self.minutes_input.value()
+        since = time.time() - minutes * 60 if minutes else None
+        return self.instance_input.currentIndex(), self.level_input.currentText(), since, pattern
+
+    def search(self):
+        filters = self.filters()
+        if filters is None:
+            return
+        instance, level, since, pattern = filters
+        query = self.queries.setdefault(instance, LogQuery(self.log_dir, instance))
+        self.generation += 1
+        generation = self.generation
+        self.status_label.setText('Searching...')
+
+        # Indexing a fresh set of rotations can take a moment; keep it off the GUI thread
+        def run():
+            started = time.monotonic()
+            try:
+                with self.search_lock:
+                    lines = query.search(since, None, level, pattern, MAX_LINES)
+                    query.prune()
+            except (OSError, ValueError) as e:
+                lines = [f'[search failed: {str(e)}]']
+            self.search_finished.emit(generation, lines, time.monotonic() - started)
+        threading.Thread(target=run, name="log-search", daemon=True).start()
+        if self.follow_checkbox.isChecked():
+            self.restart_follower()
+
+    def show_results(self, generation, lines, seconds):
+        if generation != self.generation:
+            return
+        self.output.setPlainText('\n'.join(lines))
+        self.output.moveCursor(self.output.textCursor().End)
+        self.status_label.setText(f'{len(lines)} lines in {seconds * 1000:.0f} ms')
+
+    def set_follow(self, enabled):
+        if enabled:
+            self.restart_follower()
+            self.follow_timer.start()
+        else:
+            self.follow_timer.stop()
+            if self.follower:
+                self.follower.close()
+                self.follower = None
+
+    def restart_follower(self):
+        if self.follower:
+            self.follower.close()
+        self.follower = LogFollower(self.log_dir, self.instance_input.currentIndex())
+        self.follower.open()
+
+    def poll_follower(self):
+        filters = self.filters()
+        if filters is None or self.follower is None:
+            return
+        instance, level, since, pattern = filters
+        mask = level_mask(level)
+        regex = re.compile(pattern, re.IGNORECASE) if pattern else None
+        # Small reads so a log flood can't stall the event loop
+        lines = [line for line in self.follower.poll(max_bytes=256 * 1024) if line_matches(line, mask, regex)]
+        if lines:
+            self.output.appendPlainText('\n'.join(lines))
+
+    def closeEvent(self, event):
+        self.follow_checkbox.setChecked(False)
+        super().closeEvent(event)
+
+
+class LiveLogWindow(QWidget):
+    # Tails the daemon's in-memory output buffer; never reads the log files
+    def __init__(self, managers, instances=1):
+        super().__init__()
+        self.managers = managers  # callable returning the current DaemonManagers
+        self.buffer = None  # OutputBuffer being tailed; replaced managers bring a new one
+        self.cursor = 0
+        self.timer = QTimer(self)
+        self.timer.setInterval(250)
+        self.timer.timeout.connect(self.poll)
+        self.initUI()
+        self.set_instances(instances)
+
+    def initUI(self):
+        self.setWindowTitle('Live daemon output')
+        self.setGeometry(300, 300, 900, 500)
+
+        layout = QVBoxLayout()
+        controls = QHBoxLayout()
+
+        self.instance_input = QComboBox(self)
+        self.instance_input.currentIndexChanged.connect(self.reset)
+        controls.addWidget(QLabel('Instance:'))
+        controls.addWidget(self.instance_input)
+
+        self.pattern_input = QLineEdit(self)
+        self.pattern_input.setPlaceholderText('Only lines matching (regex, case-insensitive)')
+        self.pattern_input.returnPressed.connect(self.reset)
+        controls.addWidget(self.pattern_input)
+
+        self.pause_checkbox = QCheckBox('Pause', self)
+        controls.addWidget(self.pause_checkbox)
+
+        clear_button = QPushButton('Clear', self)
+        clear_button.clicked.connect(lambda: self.output.clear())
+        controls.addWidget(clear_button)
+
+        layout.addLayout(controls)
+
+        self.output = QPlainTextEdit(self)
+        self.output.setReadOnly(True)
+        self.output.setMaximumBlockCount(MAX_LINES)
+        self.output.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.output.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        layout.addWidget(self.output)
+
+        self.status_label = QLabel('', self)
+        layout.addWidget(self.status_label)
+
+        self.setLayout(layout)
+
+    def set_instances(self, count):
+        current = self.instance_input.currentIndex()
+        self.instance_input.blockSignals(True)
+        self.instance_input.clear()
+        self.instance_input.addItems([str(index) for index in range(count)])
+        self.instance_input.setCurrentIndex(current if 0 <= current < count else 0)
+        self.instance_input.blockSignals(False)
+        self.reset()
+
+    def current_buffer(self):
+        managers = self.managers()
+        index = self.instance_input.currentIndex()
+        return managers[index].output_buffer if 0 <= index < len(managers) else None
+
+    def regex(self):
+        pattern = self.pattern_input.text().strip()
+        try:
+            return re.compile(pattern, re.IGNORECASE) if pattern else None
+        except re.error as e:
+            self.status_label.setText(f'Bad pattern: {str(e)}')
+            return None
+
+    def reset(self, *args):
+        # Starts over from what the buffer holds
+        self.buffer = self.current_buffer()
+        self.cursor = self.buffer.start if self.buffer else 0
+        self.output.clear()
+        self.poll()
+
+    def poll(self):
+        if self.pause_checkbox.isChecked():
+            return
+        buffer = self.current_buffer()
+        if buffer is not self.buffer:
+            self.reset()
+            return
+        if buffer is None:
+            return
+        data, self.cursor, skipped = buffer.read_since(self.cursor)
+        stats = buffer.stats()
+        self.status_label.setText(f"{stats['bytes'] / 1024:.0f} of {stats['capacity'] / 1024:.0f} KB buffered, "
+                                  f"{stats['lines_total']} lines since the app started"
+                                  + (f", {skipped / 1024:.0f} KB missed while paused" if skipped else ''))
+        if not data:
+            return
+        lines = data.decode('utf8', 'replace').splitlines()
+        regex = self.regex()
+        if regex:
+            lines = [line for line in lines if regex.search(line)]
+        # Only what the view can hold
+        if lines:
+            self.output.appendPlainText('\n'.join(lines[-MAX_LINES:]))
+
+    def showEvent(self, event):
+        self.reset()
+        self.timer.start()
+        super().showEvent(event)
+
+    def closeEvent(self, event):
+        self.timer.stop()
+        super().closeEvent(event)
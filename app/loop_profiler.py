@@ -0,0 +1,211 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from metrics import LatencyHistogram
+
+# Opt-in (TRIN_APP_PROFILE=1, or a trace file path) profiling of the Qt main
+# thread. A fast timer measures how late the event loop runs it; a watchdog
+# thread samples the main thread's stack while the loop is stalled; slots are
+# wrapped to time each call. Stalls, their stack samples and slow slot calls
+# go to a Chrome trace event file, which chrome://tracing, Perfetto and
+# speedscope can open.
+ENV_VAR = "TRIN_APP_PROFILE"
+DRIFT_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+SLOT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+# Slots that run on the GUI thread, by class name
+SLOTS = {
+    "MenubarApp": ("finish_startup", "drain_signal_socket", "update_tray_status", "start_daemon", "stop_daemon",
+                   "show_about", "show_config", "show_logs", "show_live_log", "show_telemetry",
+                   "update_telemetry_targets", "update_config", "connect_manager", "rebuild_metrics",
+                   "handle_probe_failed", "handle_daemon_exit", "handle_start_failed",
+                   "handle_readiness_changed", "handle_restarts_suspended", "handle_rss_limit_exceeded",
+                   "handle_disk_alert", "handle_storage_recommended", "handle_all_stopped", "quit"),
+    "DaemonManager": ("handle_started", "handle_stdout", "handle_stderr", "handle_finished", "handle_error",
+                      "handle_phase_detected", "restart_daemon", "kill_process", "handle_stopped",
+                      "stop_daemon"),
+    "HealthScheduler": ("run_probe", "handle_result", "tighten"),
+    "DaemonSupervisor": ("configure", "start_all", "stop_managers"),
+}
+MAIN_TID = 1
+STALL_TID = 2  # stall spans and stack samples get their own track
+
+
+def profile_path(default_dir):
+    # Trace file to write, or None if profiling is off
+    value = os.environ.get(ENV_VAR, "")
+    if not value or value == "0":
+        return None
+    if value == "1":
+        return os.path.join(default_dir, f"loop_profile_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    return value
+
+
+class TraceWriter:
+    # Chrome trace event JSON array, written incrementally. A crash leaves
+    # the closing bracket off, which the viewers accept.
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.file = open(path, "w")
+        self.lock = threading.Lock()
+        self.first = True
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.metadata(MAIN_TID, "Qt main thread")
+        self.metadata(STALL_TID, "Event-loop stalls (sampled stacks)")
+
+    def timestamp(self, seconds):
+        return round((seconds - self.origin) * 1e6, 1)
+
+    def metadata(self, tid, name):
+        self.write({"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}})
+
+    def span(self, name, tid, start, duration, category, args=None):
+        event = {"name": name, "cat": category, "ph": "X", "pid": self.pid, "tid": tid,
+                 "ts": self.timestamp(start), "dur": round(duration * 1e6, 1)}
+        if args:
+            event["args"] = args
+        self.write(event)
+
+    def write(self, event):
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(("[\n" if self.first else ",\n") + json.dumps(event))
+            self.first = False
+
+    def close(self):
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write("\n]\n")
+            self.file.close()
+            self.file = None
+
+
+class LoopProfiler:
+    def __init__(self, trace_path, interval_ms=10, stall_threshold=0.1, sample_interval=0.02,
+                 slot_trace_threshold=0.005):
+        self.interval = interval_ms / 1000
+        self.stall_threshold = stall_threshold
+        self.sample_interval = sample_interval
+        self.slot_trace_threshold = slot_trace_threshold  # slot calls at least this long go to the trace
+        self.trace = TraceWriter(trace_path)
+        self.drift = LatencyHistogram(buckets=DRIFT_BUCKETS)
+        self.slots = {}  # "Class.method" -> LatencyHistogram
+        self.stalls = 0
+        self.longest_stall = 0.0
+        self.main_ident = threading.main_thread().ident
+        self.last_tick = time.perf_counter()
+        self.timer = None
+        self.stopped = threading.Event()
+        self.watchdog = threading.Thread(target=self.watch, name="loop-watchdog", daemon=True)
+
+    def instrument(self, *classes):
+        # Wraps the listed slots at class level, so it must run before
+        # instances connect them to signals
+        for cls in classes:
+            for name in SLOTS.get(cls.__name__, ()):
+                method = cls.__dict__.get(name)
+                if method is None or getattr(method, "profiled", False):
+                    continue
+                setattr(cls, name, self.wrap(f"{cls.__name__}.{name}", method))
+
+    def wrap(self, label, method):
+        histogram = self.slots.setdefault(label, LatencyHistogram(buckets=SLOT_BUCKETS))
+
+        @functools.wraps(method)
+        def profiled(*args, **kwargs):
+            # Calls from worker threads don't hold up the event loop
+            if threading.get_ident() != self.main_ident:
+                return method(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                histogram.observe(elapsed)
+                if elapsed >= self.slot_trace_threshold:
+                    self.trace.span(label, MAIN_TID, started, elapsed, "slot")
+        profiled.profiled = True
+        return profiled
+
+    def start(self):
+        # Needs the QApplication to exist
+        from PyQt5.QtCore import Qt, QTimer
+        self.timer = QTimer()
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.setInterval(int(self.interval * 1000))
+        self.timer.timeout.connect(self.tick)
+        self.last_tick = time.perf_counter()
+        self.timer.start()
+        self.watchdog.start()
+
+    def tick(self):
+        now = time.perf_counter()
+        self.drift.observe(max(0.0, now - self.last_tick - self.interval))
+        self.last_tick = now
+
+    def watch(self):
+        # Samples the main thread's stack for as long as the loop stays stalled
+        samples = []  # (time, frames outermost first)
+        stall_from = None
+        while not self.stopped.wait(self.sample_interval if samples else self.stall_threshold / 4):
+            last_tick = self.last_tick
+            now = time.perf_counter()
+            if stall_from is not None and last_tick > stall_from:
+                self.record_stall(stall_from, last_tick, samples)
+                samples, stall_from = [], None
+            if now - last_tick - self.interval > self.stall_threshold:
+                if stall_from is None:
+                    stall_from = last_tick
+                samples.append((now, self.main_stack()))
+
+    def main_stack(self):
+        frame = sys._current_frames().get(self.main_ident)
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            if code.co_filename != __file__:  # leave the slot wrappers out
+                frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        frames.reverse()
+        return frames
+
+    def record_stall(self, start, end, samples):
+        # The loop was due at start + interval and ran again at end
+        duration = end - start - self.interval
+        if duration < self.stall_threshold:
+            return
+        self.stalls += 1
+        self.longest_stall = max(self.longest_stall, duration)
+        stall_start = start + self.interval
+        self.trace.span("event-loop stall", STALL_TID, stall_start, duration, "stall",
+                        {"duration_ms": round(duration * 1000, 1), "samples": len(samples)})
+        # Each sample stands for the time until the next one (the first one
+        # also for the time before the stall was noticed); nested spans
+        # per frame make a flame chart under the stall
+        for index, (when, frames) in enumerate(samples):
+            until = samples[index + 1][0] if index + 1 < len(samples) else end
+            begin = stall_start if index == 0 else when
+            for frame in frames:
+                self.trace.span(frame, STALL_TID, begin, max(0.0, until - begin), "stack")
+
+    def summary(self, top=5):
+        drift = self.drift.summary()
+        slots = [(label, histogram.summary()) for label, histogram in self.slots.items()]
+        slots = sorted(((label, stats) for label, stats in slots if stats), key=lambda item: item[1]["max"],
+                       reverse=True)
+        return {"drift": drift, "stalls": self.stalls, "longest_stall": self.longest_stall,
+                "slots": slots[:top], "trace": self.trace.path}
+
+    def close(self):
+        self.stopped.set()
+        if self.timer:
+            self.timer.stop()
+        if self.watchdog.is_alive():
+            self.watchdog.join(1)
+        self.trace.close()
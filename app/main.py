@@ -1,28 +1,34 @@
 import sys
 import os
-from web3 import Web3
-import psutil
-import subprocess
-from PyQt5.QtWidgets import QApplication, QSystemTrayIcon, QMenu, QWidget, QVBoxLayout, QLabel, QLineEdit, QPushButton, QSpinBox, QMessageBox, QCheckBox
-from PyQt5.QtGui import QIcon
-from PyQt5.QtCore import Qt, pyqtSignal, QTimer, QStandardPaths
-from trin_config import TrinConfig
+import functools
+import time
 import atexit
 import signal
+import socket
 import logging
-from logging.handlers import RotatingFileHandler
-from log import get_app_data_dir, setup_logging
-from window import ConfigWindow
-from daemon import DaemonManager
+from PyQt5.QtWidgets import QAction, QApplication, QSystemTrayIcon, QMenu
+from PyQt5.QtGui import QIcon
+from PyQt5.QtCore import QSocketNotifier, QTimer
+from trin_config import CONFIG_FILE, load_config, save_config
+from log import archiver, configure_log_retention, get_app_data_dir, setup_logging
+from loop_profiler import LoopProfiler, profile_path
+
+# Everything else (supervisor, psutil, health probes, exporter, windows) is
+# imported on first use so the tray icon shows up as early as possible
+STARTED_AT = time.perf_counter()
 
 class MenubarApp:
     def __init__(self):
         self.app = QApplication(sys.argv)
         self.app.setQuitOnLastWindowClosed(False)
         self.tray = None
-        self.config = TrinConfig()
+        self.config_file = os.path.join(get_app_data_dir("TrinApp"), CONFIG_FILE)
+        self.config = load_config(self.config_file)
         self.version = "0.1.0"
         self.config_window = None
+        self.log_window = None
+        self.live_log_window = None
+        self.telemetry_window = None
         
         # Set up error handling
         sys.excepthook = self.handle_exception
@@ -30,14 +36,89 @@ class MenubarApp:
         # Ensure cleanup on normal exit
         atexit.register(self.cleanup)
         
-        # Handle SIGTERM
-        signal.signal(signal.SIGTERM, self.sigterm_handler)
+        # Handle SIGTERM and Ctrl-C through the event loop
+        self.shutting_down = False
+        self.cleaned_up = False
+        self.install_signal_handlers()
 
         # Set up logging
         self.app_logger, self.daemon_logger = setup_logging("TrinApp")
-        self.daemon_manager = DaemonManager(self.app_logger, self.daemon_logger)
+        self.supervisor = None
+        self.probe_thread = None
+        self.health_probe = None
+        self.metrics_registry = None
+        self.metrics_exporter = None
+        self.health_scheduler = None
+        self.telemetry = None
+
+        # Opt-in event-loop profiling; slots are wrapped before anything connects them
+        self.profiler = None
+        trace_path = profile_path(os.path.join(get_app_data_dir("TrinApp"), "logs"))
+        if trace_path:
+            self.profiler = LoopProfiler(trace_path)
+            self.profiler.instrument(MenubarApp)
+            self.profiler.start()
+            self.app_logger.info(f"Profiling the event loop to {trace_path}")
 
         self.init_ui()
+        self.startup_times = {"tray_visible": time.perf_counter() - STARTED_AT}
+        # The rest of startup runs once the event loop is up
+        QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        if self.supervisor is not None:
+            return
+        from supervisor import DaemonSupervisor
+        from health import HealthScheduler, start_health_probe
+        from exporter import MetricsRegistry
+        from telemetry import TelemetryCollector
+        if self.profiler:
+            from daemon import DaemonManager
+            self.profiler.instrument(DaemonSupervisor, DaemonManager, HealthScheduler)
+        self.supervisor = DaemonSupervisor("TrinApp", self.app_logger, self.config)
+        self.supervisor.manager_added.connect(self.connect_manager)
+        self.supervisor.instances_changed.connect(self.rebuild_metrics)
+        self.supervisor.disk_alert.connect(self.handle_disk_alert)
+        # Node info and routing tables, batched per instance on a worker thread
+        self.telemetry = TelemetryCollector(self.config.telemetry_interval)
+        self.supervisor.instances_changed.connect(self.update_telemetry_targets)
+        self.supervisor.storage_recommended.connect(self.handle_storage_recommended)
+
+        # RPC health probes run on a worker thread so a busy node can't block the tray
+        self.probe_thread, self.health_probe = start_health_probe()
+        # Process, then TCP, then RPC checks on a per-instance adaptive schedule
+        self.health_scheduler = HealthScheduler(self.health_probe)
+        self.health_scheduler.probe_failed.connect(self.handle_probe_failed)
+        self.health_scheduler.probed.connect(self.update_tray_status)
+
+        self.metrics_registry = MetricsRegistry()
+        configure_log_retention(self.config)
+        self.supervisor.configure(self.config)
+        self.update_metrics_exporter()
+        self.update_tray_status()
+        self.startup_times["ready"] = time.perf_counter() - STARTED_AT
+        self.app_logger.info(f"Tray visible after {self.startup_times['tray_visible'] * 1000:.0f} ms, "
+                             f"ready after {self.startup_times['ready'] * 1000:.0f} ms")
+
+    def install_signal_handlers(self):
+        # Python only runs signal handlers when the interpreter gets control,
+        # which can take arbitrarily long while Qt's loop is idle. The wakeup
+        # fd turns a pending signal into socket activity that wakes the loop.
+        self.signal_socket, self.signal_wakeup = socket.socketpair()
+        self.signal_socket.setblocking(False)
+        self.signal_wakeup.setblocking(False)
+        signal.set_wakeup_fd(self.signal_wakeup.fileno())
+        self.signal_notifier = QSocketNotifier(self.signal_socket.fileno(), QSocketNotifier.Read)
+        self.signal_notifier.activated.connect(self.drain_signal_socket)
+        signal.signal(signal.SIGTERM, self.sigterm_handler)
+        signal.signal(signal.SIGINT, self.sigterm_handler)
+
+    def drain_signal_socket(self):
+        try:
+            while self.signal_socket.recv(64):
+                pass
+        except BlockingIOError:
+            pass
 
     def init_ui(self):
         # Create the tray icon
@@ -46,6 +127,9 @@ class MenubarApp:
 
         # Create the menu
         menu = QMenu()
+        self.menu = menu
+        self.instance_actions = []
+        self.instance_separator = menu.addSeparator()
 
         # Add actions to the menu
         about_action = menu.addAction("About")
@@ -56,72 +140,407 @@ class MenubarApp:
         stop_action.triggered.connect(self.stop_daemon)
         config_action = menu.addAction("Configure")
         config_action.triggered.connect(self.show_config)
+        logs_action = menu.addAction("Logs")
+        logs_action.triggered.connect(self.show_logs)
+        live_log_action = menu.addAction("Live log")
+        live_log_action.triggered.connect(self.show_live_log)
+        telemetry_action = menu.addAction("Network")
+        telemetry_action.triggered.connect(self.show_telemetry)
         quit_action = menu.addAction("Quit")
         quit_action.triggered.connect(self.quit)
 
         # Add the menu to the tray
         self.tray.setContextMenu(menu)
+        self.update_tray_status()
         self.tray.show()
 
-        # Add a timer to periodically check daemon status
-        self.status_timer = QTimer(self.app)
-        self.status_timer.timeout.connect(self.check_daemon_status)
-        self.status_timer.start(60000)  # Check every minute
+    def describe_instance(self, manager):
+        # One-line health summary for the tray menu
+        config = manager.config
+        if manager.stopping:
+            return f"{manager.name} (:{config.http_port}): stopping"
+        if manager.is_daemon_running():
+            state = manager.readiness.phase or "running"
+            return f"{manager.name} (:{config.http_port}): {state}, PID {manager.pid()}"
+        if manager.restart_timer.isActive():
+            return f"{manager.name} (:{config.http_port}): restarting"
+        if manager.restart_policy.circuit_open():
+            return f"{manager.name} (:{config.http_port}): stopped (restarts paused)"
+        return f"{manager.name} (:{config.http_port}): stopped"
+
+    def instance_about(self, manager):
+        from sampler import format_value as format_sample
+        latency = self.health_probe.histogram_for(manager.config.rpc_port).summary()
+        if latency:
+            rpc_latency = f"p50 {latency['p50'] * 1000:.1f} ms, p95 {latency['p95'] * 1000:.1f} ms, " \
+                    f"max {latency['max'] * 1000:.1f} ms ({latency['samples']} probes)"
+        else:
+            rpc_latency = "N/A"
+        log_stats = manager.log_pipeline.stats()
+        log_errors = f", {log_stats['errors']} errors" if log_stats["errors"] else ""
+        policy = manager.restart_policy
+        last_exit = policy.last_exit()
+        if last_exit:
+            last_exit_text = f"code {last_exit['exit_code']}, signal {last_exit['signal']}, " \
+                    f"uptime {last_exit['uptime']:.0f}s at " \
+                    f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last_exit['time']))}"
+        else:
+            last_exit_text = "N/A"
+        restart_state = "suspended (crash loop)" if policy.circuit_open() else "enabled"
+        schedule, history = self.health_scheduler.describe(manager)
+        history_text = "".join(
+            f"  {time.strftime('%H:%M:%S', time.localtime(when))} {stage} "
+            f"{'ok' if ok else 'FAILED'}{f' {latency * 1000:.1f} ms' if latency else ''}\n"
+            for when, stage, ok, latency in history[-5:]
+        ) or "  N/A\n"
+        if manager.last_shutdown:
+            seconds, killed = manager.last_shutdown
+            shutdown_text = f"{seconds:.2f}s{' (killed after grace period)' if killed else ''}"
+        else:
+            shutdown_text = "N/A"
+        proxy = self.supervisor.proxies.get(manager.index)
+        if proxy:
+            cache = proxy.stats()
+            lookups = cache["hits"] + cache["misses"]
+            hit_rate = f"{cache['hits'] / lookups * 100:.0f}%" if lookups else "N/A"
+            cache_text = f"port {proxy.listen_port}, {hit_rate} hits, {cache['coalesced']} coalesced, " \
+                    f"{cache['entries']} entries ({cache['bytes'] / 1024 / 1024:.1f} MB), " \
+                    f"{cache['evictions']} evicted, {cache['spill_bytes'] / 1024 / 1024:.1f} MB on disk"
+        else:
+            cache_text = "off"
+        readiness = manager.readiness
+        phase_text = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in readiness.durations().items())
+        readiness_text = f"{readiness.phase} ({phase_text})" if readiness.phase else "N/A"
+        resources = manager.sampler.summary()
+        resource_text = "".join(
+            f"  {name}: " + ", ".join(f"{key} {format_sample(name, value)}" for key, value in stats.items()) + "\n"
+            for name, stats in resources.items()
+        ) or "  N/A\n"
+        limits = manager.sampler.limit_status()
+        if limits is None or limits["limits"] == "none":
+            limits_text = "none"
+        else:
+            problems = limits["mismatches"] + limits["errors"]
+            if limits["in_effect"]:
+                state = "in effect"
+            elif limits["checked_at"] is None:
+                state = "not checked yet"
+            else:
+                state = "NOT in effect"
+            over = ", over memory limit" if limits["rss_over_limit"] else ""
+            limits_text = f"{limits['limits']} ({state}{over})" + "".join(f"\n  {problem}" for problem in problems[:3])
+        last_start = readiness.last_record()
+        if last_start:
+            last_start_text = f"{last_start['total']:.1f}s to synced ({last_start['version'] or 'unknown version'})"
+        else:
+            last_start_text = "N/A"
+        return f"{manager.name}\n" \
+                f"HTTP Port: {manager.config.http_port}\n" \
+                f"Daemon status: {manager.status()}\n" \
+                f"Daemon PID: {manager.pid()}\n" \
+                f"Binary: {manager.binary or 'N/A'}\n" \
+                f"Readiness: {readiness_text}\n" \
+                f"Last cold start: {last_start_text}\n" \
+                f"RPC latency: {rpc_latency}\n" \
+                f"Health checks: {schedule}\n" \
+                f"Recent health checks:\n{history_text}" \
+                f"Restarts: {policy.recent_restarts()} in last {policy.window // 60} min, " \
+                f"automatic restarts {restart_state}\n" \
+                f"Last exit: {last_exit_text}\n" \
+                f"Last shutdown: {shutdown_text}\n" \
+                f"Last crash report: {manager.last_crash_report or 'N/A'}\n" \
+                f"RPC cache: {cache_text}\n" \
+                f"Daemon log: {log_stats['lines_per_sec']:.1f} lines/s, " \
+                f"{log_stats['bytes_per_sec'] / 1024:.1f} KB/s, {log_stats['dropped_lines']} dropped{log_errors}\n" \
+                f"Resource limits: {limits_text}\n" \
+                f"Resources (p50/p95/max):\n{resource_text}"
 
     def show_about(self):
-        daemon_status = self.daemon_manager.status()
-        daemon_pid = self.daemon_manager.pid()
+        from PyQt5.QtWidgets import QMessageBox
+        if self.supervisor is None:
+            return
+        instances_text = "\n".join(self.instance_about(manager) for manager in self.supervisor.managers)
+        archive = archiver.stats()
         about_text = "Trin Menubar App\n\n" \
                 f"Version: {self.version}\n" \
                 f"Storage (mb): {self.config.storage}\n" \
                 f"History: {self.config.history}\n" \
                 f"State: {self.config.state}\n" \
                 f"Beacon: {self.config.beacon}\n" \
-                f"HTTP Port: {self.config.http_port}\n" \
-                f"Daemon status: {daemon_status}\n" \
-                f"Daemon PID: {daemon_pid}\n" \
-                f"Logs: {get_app_data_dir('TrinApp')}/logs\n"
+                f"Instances: {len(self.supervisor.managers)}\n" \
+                f"Disk: {self.supervisor.disk_monitor.describe()}\n" \
+                f"Logs: {get_app_data_dir('TrinApp')}/logs ({archive['compressed_files']} rotations compressed, " \
+                f"{archive['removed_files']} removed, {archive['pending']} pending)\n\n" \
+                f"{instances_text}"
+        if self.profiler:
+            about_text += f"\n\n{self.profiler_about()}"
         QMessageBox.about(None, "About Trin Menubar App", about_text)
 
+    def profiler_about(self):
+        summary = self.profiler.summary()
+        drift = summary["drift"]
+        drift_text = f"{drift['p50'] * 1000:.1f} / {drift['p95'] * 1000:.1f} / {drift['max'] * 1000:.1f} ms" \
+            if drift else "-"
+        slots_text = "\n".join(f"  {label}: {stats['p50'] * 1000:.1f} / {stats['p95'] * 1000:.1f} / "
+                               f"{stats['max'] * 1000:.1f} ms" for label, stats in summary["slots"])
+        return f"Event-loop drift (p50/p95/max): {drift_text}\n" \
+               f"Stalls: {summary['stalls']}, longest {summary['longest_stall'] * 1000:.0f} ms\n" \
+               f"Slowest slots (p50/p95/max):\n{slots_text or '  -'}\n" \
+               f"Trace: {summary['trace']}"
+
     def show_config(self):
         if not self.config_window:
+            from window import ConfigWindow
             self.config_window = ConfigWindow(self.config)
             self.config_window.config_saved.connect(self.update_config)
         self.config_window.storage_input.setValue(self.config.storage)
+        disk = self.supervisor.disk_monitor.latest() if self.supervisor else None
+        self.config_window.set_recommended_storage(disk["recommended_mb"] if disk else None)
+        self.config_window.storage_auto_checkbox.setChecked(self.config.storage_auto)
+        self.config_window.disk_headroom_mb_input.setValue(self.config.disk_headroom_mb)
         self.config_window.history_checkbox.setChecked(self.config.history)
         self.config_window.state_checkbox.setChecked(self.config.state)
         self.config_window.beacon_checkbox.setChecked(self.config.beacon)
         self.config_window.http_port_input.setValue(self.config.http_port)
+        self.config_window.sample_interval_input.setValue(self.config.sample_interval)
+        self.config_window.telemetry_interval_input.setValue(self.config.telemetry_interval)
+        self.config_window.metrics_port_input.setValue(self.config.metrics_port)
+        self.config_window.instances_input.setValue(self.config.instances)
+        self.config_window.rpc_shim_checkbox.setChecked(self.config.rpc_shim)
+        self.config_window.rpc_cache_checkbox.setChecked(self.config.rpc_cache)
+        self.config_window.rpc_cache_mb_input.setValue(self.config.rpc_cache_mb)
+        self.config_window.rpc_cache_ttl_input.setValue(self.config.rpc_cache_ttl)
+        self.config_window.rpc_cache_spill_mb_input.setValue(self.config.rpc_cache_spill_mb)
+        self.config_window.shutdown_grace_input.setValue(self.config.shutdown_grace)
+        self.config_window.log_retention_mb_input.setValue(self.config.log_retention_mb)
+        self.config_window.log_retention_days_input.setValue(self.config.log_retention_days)
+        self.config_window.nice_input.setValue(self.config.nice)
+        self.config_window.cpu_affinity_input.setText(self.config.cpu_affinity)
+        self.config_window.io_class_input.setCurrentText(self.config.io_class)
+        self.config_window.rss_limit_mb_input.setValue(self.config.rss_limit_mb)
+        self.config_window.update_resource_profile()
+        self.config_window.build_profile_input.setCurrentText(self.config.build_profile)
+        self.config_window.trin_path_input.setText(self.config.trin_path or "")
+        self.config_window.config = self.config
         self.config_window.show()
         self.config_window.activateWindow()  # Bring window to front
         self.config_window.raise_()  # Raise window to top
 
+    def show_logs(self):
+        instances = len(self.supervisor.managers) if self.supervisor else 1
+        if not self.log_window:
+            from log_window import LogWindow
+            self.log_window = LogWindow(os.path.join(get_app_data_dir("TrinApp"), "logs"), instances)
+        else:
+            self.log_window.set_instances(instances)
+        self.log_window.show()
+        self.log_window.activateWindow()
+        self.log_window.raise_()
+        self.log_window.search()
+
+    def show_live_log(self):
+        instances = len(self.supervisor.managers) if self.supervisor else 1
+        if not self.live_log_window:
+            from log_window import LiveLogWindow
+            self.live_log_window = LiveLogWindow(lambda: self.supervisor.managers if self.supervisor else [],
+                                                 instances)
+        else:
+            self.live_log_window.set_instances(instances)
+        self.live_log_window.show()
+        self.live_log_window.activateWindow()
+        self.live_log_window.raise_()
+
+    def show_telemetry(self):
+        instances = len(self.supervisor.managers) if self.supervisor else 1
+        if self.telemetry is None:
+            return
+        if not self.telemetry_window:
+            from window import TelemetryWindow
+            self.telemetry_window = TelemetryWindow(self.telemetry, instances)
+        else:
+            self.telemetry_window.set_instances(instances)
+        self.telemetry_window.show()
+        self.telemetry_window.activateWindow()
+        self.telemetry_window.raise_()
+
+    def update_telemetry_targets(self):
+        from disk_monitor import MB, default_trin_data_dir
+        from telemetry import NETWORKS
+        disk_monitor = self.supervisor.disk_monitor
+
+        def storage_fill(config):
+            status = disk_monitor.latest()
+            entry = status["dirs"].get(config.data_dir or default_trin_data_dir()) if status else None
+            return entry["bytes"] / (config.storage * MB) if entry else None
+
+        targets = []
+        for manager in self.supervisor.managers:
+            config = manager.config
+            enabled = {"history": config.history, "state": config.state, "beacon": config.beacon}
+            networks = [network for network in NETWORKS if enabled[network]]
+            targets.append((manager.index, config.rpc_port, networks, functools.partial(storage_fill, config)))
+        self.telemetry.set_interval(self.config.telemetry_interval)
+        self.telemetry.set_targets(targets)
+
     def update_config(self, new_config):
+        changed = self.config.changed_fields(new_config)
+        restart = self.config.restart_fields(new_config)
+        if changed:
+            self.app_logger.info(f"Config changed: {', '.join(changed)}"
+                                 f"{' (restart required)' if restart else ''}")
         self.config = new_config
+        try:
+            save_config(self.config, self.config_file)
+        except OSError as e:
+            self.app_logger.error(f"Failed to save config: {str(e)}")
+        configure_log_retention(self.config)
+        added = self.supervisor.configure(self.config)
+        if added and self.supervisor.any_running():
+            self.supervisor.start_all(added)
+        self.update_metrics_exporter()
 
-    def check_daemon_status(self):
-        if not self.daemon_manager.is_daemon_running():
-            self.tray.setIcon(QIcon("../assets/off.png"))
-            self.start_daemon()
-        w3 = Web3(Web3.HTTPProvider(f"http://127.0.0.1:{self.config.http_port}"))
-        if not w3.is_connected():
-            self.tray.setIcon(QIcon("../assets/off.png"))
-            self.start_daemon()
+    def connect_manager(self, manager):
+        manager.daemon_exited.connect(functools.partial(self.handle_daemon_exit, manager))
+        manager.daemon_started.connect(self.update_tray_status)
+        manager.start_failed.connect(functools.partial(self.handle_start_failed, manager))
+        manager.restart_scheduled.connect(self.update_tray_status)
+        manager.restarts_suspended.connect(functools.partial(self.handle_restarts_suspended, manager))
+        manager.readiness_changed.connect(functools.partial(self.handle_readiness_changed, manager))
+        manager.rss_limit_exceeded.connect(functools.partial(self.handle_rss_limit_exceeded, manager))
+        self.health_scheduler.watch(manager)
 
-    def start_daemon(self):
+    def rebuild_metrics(self):
+        from exporter import (MetricsRegistry, register_daemon_metrics, register_disk_metrics,
+                              register_loop_metrics, register_proxy_metrics, register_telemetry_metrics)
+        from disk_monitor import default_trin_data_dir
+        self.metrics_registry = MetricsRegistry()
+        for manager in self.supervisor.managers:
+            register_daemon_metrics(self.metrics_registry, manager, self.health_probe,
+                                    {"instance": str(manager.index)})
+            register_telemetry_metrics(self.metrics_registry, self.telemetry, manager.index,
+                                       {"instance": str(manager.index)})
+        for index, proxy in self.supervisor.proxies.items():
+            register_proxy_metrics(self.metrics_registry, proxy, {"instance": str(index)})
+        register_disk_metrics(self.metrics_registry, self.supervisor.disk_monitor,
+                              {manager.index: manager.config.data_dir or default_trin_data_dir()
+                               for manager in self.supervisor.managers})
+        if self.profiler:
+            register_loop_metrics(self.metrics_registry, self.profiler)
+        if self.metrics_exporter:
+            self.metrics_exporter.set_registry(self.metrics_registry)
+
+    def update_metrics_exporter(self):
+        port = self.config.metrics_port
+        if self.metrics_exporter and self.metrics_exporter.port == port:
+            return
+        if self.metrics_exporter:
+            self.metrics_exporter.close()
+            self.metrics_exporter = None
+        if not port:
+            return
+        from exporter import MetricsExporter
         try:
-            self.daemon_manager.start_daemon(self.config)
+            self.metrics_exporter = MetricsExporter(self.metrics_registry, port)
+            self.app_logger.info(f"Serving metrics on http://127.0.0.1:{port}/metrics")
+        except OSError as e:
+            self.app_logger.error(f"Failed to start metrics exporter on port {port}: {str(e)}")
+
+    def handle_probe_failed(self, manager, stage, latency):
+        from health import PROCESS
+        if stage == PROCESS:
+            manager.schedule_restart()
+            return
+        self.app_logger.warning(f"{manager.name}: {stage} health probe on port {manager.config.rpc_port} "
+                                f"failed after {latency:.3f}s")
+
+    def handle_daemon_exit(self, manager, exit_code, signal_number, uptime):
+        if signal_number:
+            reason = f"killed by signal {signal_number}"
+        else:
+            reason = f"exited with code {exit_code}"
+        report = f"; crash report in {manager.last_crash_report}" if manager.last_crash_report else ""
+        self.tray.showMessage("Daemon", f"{manager.name} {reason} after {uptime:.0f}s{report}")
+        self.update_tray_status()
+
+    def handle_start_failed(self, manager, message):
+        self.tray.showMessage("Error", f"Failed to start {manager.name.lower()}: {message}")
+        self.update_tray_status()
+
+    def handle_readiness_changed(self, manager, phase, elapsed):
+        from readiness import RPC_READY
+        if phase == RPC_READY:
+            self.tray.showMessage("Daemon", f"{manager.name} ready after {elapsed:.1f}s")
+        self.update_tray_status()
+
+    def handle_rss_limit_exceeded(self, manager, rss, limit):
+        self.tray.showMessage("Daemon", f"{manager.name} is using {rss / 1024 / 1024:.0f} MiB of memory, "
+                                        f"above its {limit / 1024 / 1024:.0f} MiB limit")
+
+    def handle_disk_alert(self, level, message):
+        self.app_logger.warning(f"Disk space {level}: {message}")
+        self.tray.showMessage("Disk space", message)
+
+    def handle_storage_recommended(self, storage_mb):
+        if not self.config.storage_auto:
+            self.app_logger.info(f"Recommended storage for this disk: {storage_mb} MB "
+                                 f"(configured: {self.config.storage} MB)")
+            return
+        self.app_logger.info(f"Resizing storage from {self.config.storage} MB to {storage_mb} MB to fit the disk")
+        self.tray.showMessage("Disk space", f"Storage set to {storage_mb} MB to fit the disk; restarting trin")
+        new_config = self.config.copy()
+        new_config.storage = storage_mb
+        self.update_config(new_config)
+
+    def handle_restarts_suspended(self, manager, recent):
+        self.tray.showMessage("Error", f"{manager.name} restarted {recent} times in a short period. "
+                                       "Automatic restarts are paused; use Start Daemon to retry.")
+        self.update_tray_status()
+
+    def update_tray_status(self, *args):
+        managers = self.supervisor.managers if self.supervisor else []
+        # One informational menu entry per instance
+        while len(self.instance_actions) < len(managers):
+            action = QAction(self.menu)
+            action.setEnabled(False)
+            self.menu.insertAction(self.instance_separator, action)
+            self.instance_actions.append(action)
+        while len(self.instance_actions) > len(managers):
+            self.menu.removeAction(self.instance_actions.pop())
+        lines = []
+        for action, manager in zip(self.instance_actions, managers):
+            text = self.describe_instance(manager)
+            action.setText(text)
+            lines.append(text)
+        # The icon only turns on once every instance answers RPC
+        if managers and self.all_ready(managers):
             self.tray.setIcon(QIcon("../assets/on.png"))
-            self.tray.showMessage("Daemon", "Daemon started successfully")
-        except Exception as e:
+        else:
             self.tray.setIcon(QIcon("../assets/off.png"))
-            self.tray.showMessage("Error", f"Failed to start daemon: {str(e)}")
-            logging.error(f"Error in start_daemon: {str(e)}")
+        self.tray.setToolTip("\n".join(lines))
+
+    def all_ready(self, managers):
+        from readiness import RPC_READY, SYNCED
+        return all(manager.readiness.phase in (RPC_READY, SYNCED) for manager in managers)
+
+    def start_daemon(self):
+        if self.supervisor is None:
+            return
+        self.supervisor.start_all()
+        self.tray.showMessage("Daemon", "Daemon starting")
+        self.update_tray_status()
 
     def stop_daemon(self):
-        self.daemon_manager.stop_daemon()
-        self.tray.setIcon(QIcon("../assets/off.png"))
+        if self.supervisor is None:
+            return
+        self.supervisor.stop_all(self.handle_all_stopped)
+        self.tray.showMessage("Daemon", "Daemon stopping")
+        self.update_tray_status()
+
+    def handle_all_stopped(self):
+        if self.shutting_down:
+            return
         self.tray.showMessage("Daemon", "Daemon stopped")
+        self.update_tray_status()
 
     def handle_exception(self, exc_type, exc_value, exc_traceback):
         logging.error("Uncaught exception", exc_info=(exc_type, exc_value, exc_traceback))
@@ -130,15 +549,49 @@ class MenubarApp:
         sys.exit(1)
 
     def cleanup(self):
+        # Runs from quit, atexit and fatal errors; only the first call does anything
+        if self.cleaned_up:
+            return
+        self.cleaned_up = True
         logging.info("Performing cleanup")
-        self.daemon_manager.stop_daemon()
+        if self.supervisor:
+            self.supervisor.close()
+        if self.probe_thread:
+            self.probe_thread.quit()
+            self.probe_thread.wait(1000)
+        if self.metrics_exporter:
+            self.metrics_exporter.close()
+            self.metrics_exporter = None
+        if self.telemetry:
+            self.telemetry.close()
+        if self.profiler:
+            self.profiler.close()
 
     def sigterm_handler(self, signum, frame):
-        logging.info("Received SIGTERM. Exiting.")
-        self.cleanup()
-        sys.exit(0)
+        logging.info(f"Received {signal.Signals(signum).name}. Exiting.")
+        # Leave the handler right away; the shutdown runs on the event loop
+        QTimer.singleShot(0, self.quit)
 
     def quit(self):
+        # Stops every instance without blocking the event loop, then exits
+        if self.shutting_down:
+            return
+        self.shutting_down = True
+        self.quit_started_at = time.monotonic()
+        if self.health_scheduler:
+            self.health_scheduler.close()
+        if self.supervisor is None:
+            self.finish_quit()
+            return
+        self.tray.setToolTip("Stopping trin...")
+        self.supervisor.shutdown(self.finish_quit)
+        # Backstop in case a stop never reports back
+        QTimer.singleShot(int((self.config.shutdown_grace + 5) * 1000), self.finish_quit)
+
+    def finish_quit(self):
+        if self.cleaned_up:
+            return
+        self.app_logger.info(f"Shutdown took {time.monotonic() - self.quit_started_at:.2f}s")
         self.cleanup()
         self.tray.hide()
         self.app.quit()
@@ -0,0 +1,165 @@
+import math
+import threading
+from bisect import bisect_left
+from array import array
+
+
+class RingBuffer:
+    def __init__(self, capacity, typecode='d'):
+        self.capacity = capacity
+        self.data = array(typecode, [0]) * capacity
+        self.index = 0  # next slot to write
+        self.size = 0
+
+    def append(self, value):
+        self.data[self.index] = value
+        self.index = (self.index + 1) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+
+    def values(self):
+        # Oldest to newest
+        if self.size < self.capacity:
+            return self.data[:self.size]
+        return self.data[self.index:] + self.data[:self.index]
+
+    def last(self):
+        if self.size == 0:
+            return None
+        return self.data[self.index - 1]
+
+    def resize(self, capacity):
+        # Keeps the newest values that still fit
+        values = self.values()[-capacity:]
+        self.capacity = capacity
+        self.data = array(self.data.typecode, [0]) * capacity
+        self.data[:len(values)] = values
+        self.size = len(values)
+        self.index = self.size % capacity
+
+    def __len__(self):
+        return self.size
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class LatencyHistogram:
+    # Bucket upper bounds in seconds
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=1024):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.recent = RingBuffer(window)  # rolling window for percentiles
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        with self.lock:
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            self.recent.append(value)
+
+    def snapshot(self):
+        # Cumulative bucket counts, count and sum
+        with self.lock:
+            cumulative = []
+            total = 0
+            for c in self.counts:
+                total += c
+                cumulative.append(total)
+            return cumulative, self.count, self.sum
+
+    def rolling_counts(self):
+        # Per-bucket counts over the rolling window only
+        with self.lock:
+            values = self.recent.values()
+        counts = [0] * (len(self.buckets) + 1)
+        for value in values:
+            counts[bisect_left(self.buckets, value)] += 1
+        return counts
+
+    def summary(self):
+        with self.lock:
+            values = sorted(self.recent.values())
+        if not values:
+            return None
+        return {
+            "p50": percentile(values, 0.50),
+            "p95": percentile(values, 0.95),
+            "max": values[-1],
+            "samples": len(values),
+        }
+
+
+# (seconds per point, points kept): an hour at 1 s, a week at 1 min, a year at 1 h.
+# About 90 KB per series, however long the app runs.
+TIERS = ((1, 3600), (60, 7 * 24 * 60), (3600, 366 * 24))
+
+
+class SeriesTier:
+    # Fixed-step ring of float32 means; steps without samples hold NaN
+    def __init__(self, step, capacity):
+        self.step = step
+        self.capacity = capacity
+        self.values = array('f', [math.nan]) * capacity
+        self.slot = None  # step number being accumulated
+        self.sum = 0.0
+        self.count = 0
+
+    def add(self, when, value):
+        slot = int(when // self.step)
+        if self.slot is None or slot > self.slot:
+            if self.slot is not None:
+                for skipped in range(self.slot + 1, min(slot, self.slot + 1 + self.capacity)):
+                    self.values[skipped % self.capacity] = math.nan
+            self.slot, self.sum, self.count = slot, 0.0, 0
+        # A clock stepping back lands in the current slot
+        self.sum += value
+        self.count += 1
+        self.values[self.slot % self.capacity] = self.sum / self.count
+
+    def points(self, since):
+        # (slot start time, mean) from since up to now, oldest first
+        if self.slot is None:
+            return []
+        first = max(int(since // self.step), self.slot - self.capacity + 1)
+        return [(slot * self.step, self.values[slot % self.capacity]) for slot in range(first, self.slot + 1)]
+
+
+class TieredSeries:
+    # One numeric series kept at several resolutions; every sample goes into
+    # each tier, whose steps average whatever falls in them
+    def __init__(self, tiers=TIERS):
+        self.tiers = [SeriesTier(step, capacity) for step, capacity in tiers]
+        self.last = None  # (time, value)
+        self.lock = threading.Lock()
+
+    def add(self, when, value):
+        with self.lock:
+            for tier in self.tiers:
+                tier.add(when, value)
+            self.last = (when, value)
+
+    def query(self, span, points=120, now=None):
+        # Up to points (time, value) pairs covering the last span seconds
+        # from the finest tier that reaches back that far; NaN where no samples
+        with self.lock:
+            if self.last is None:
+                return []
+            now = self.last[0] if now is None else now
+            tier = next((tier for tier in self.tiers if tier.step * tier.capacity >= span), self.tiers[-1])
+            values = tier.points(now - span)
+        group = max(1, math.ceil(len(values) / points))
+        result = []
+        for start in range(0, len(values), group):
+            chunk = [value for _, value in values[start:start + group] if not math.isnan(value)]
+            result.append((values[start][0], sum(chunk) / len(chunk) if chunk else math.nan))
+        return result
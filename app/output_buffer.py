@@ -0,0 +1,158 @@
+import os
+import time
+
+# The most recent trin output kept in memory, for the live log view and
+# crash reports. Chunks are copied into a fixed bytearray as they arrive;
+# only whole lines go in (a stream's trailing partial line waits for the
+# rest), so stdout and stderr never interleave mid-line and a line starts
+# right after every newline. Line starts are located with bytearray.find
+# when read, never split or decoded on the way in.
+OUTPUT_BUFFER_BYTES = 1024 * 1024
+CRASH_REPORT_BYTES = 64 * 1024  # output tail included in a crash report
+MAX_CRASH_REPORTS = 20
+
+
+class OutputBuffer:
+    # Not thread-safe: written and read on the thread that reads the process pipes
+    def __init__(self, capacity=OUTPUT_BUFFER_BYTES, max_partial=64 * 1024):
+        self.capacity = capacity
+        self.data = bytearray(capacity)
+        self.written = 0  # bytes appended since creation; offsets below are absolute
+        self.lines_total = 0
+        self.max_partial = max_partial
+        self.partial = {}  # stream -> bytes after its last newline
+
+    @property
+    def start(self):
+        # Oldest byte still held, possibly in the middle of a line
+        return max(0, self.written - self.capacity)
+
+    def append(self, stream, chunk):
+        if not chunk:
+            return
+        end = chunk.rfind(b'\n') + 1
+        pending = self.partial.pop(stream, b'')
+        if not end:
+            pending += chunk
+            if len(pending) <= self.max_partial:
+                self.partial[stream] = pending
+            else:
+                self.write(pending + b'\n')
+            return
+        if pending:
+            self.write(pending)
+        self.write(chunk[:end] if end < len(chunk) else chunk)
+        if end < len(chunk):
+            self.partial[stream] = chunk[end:]
+
+    def flush(self):
+        # End of the process: its unterminated lines go in as they are
+        for stream in list(self.partial):
+            self.write(self.partial.pop(stream) + b'\n')
+
+    def write(self, data):
+        self.lines_total += data.count(b'\n')
+        if len(data) > self.capacity:
+            self.written += len(data) - self.capacity
+            data = memoryview(data)[-self.capacity:]
+        offset = self.written % self.capacity
+        first = min(len(data), self.capacity - offset)
+        self.data[offset:offset + first] = data[:first]
+        self.data[:len(data) - first] = data[first:]
+        self.written += len(data)
+
+    def find_line_start(self, position):
+        # First line start at or after the absolute offset position
+        if position == 0:
+            return 0
+        if position > self.start and self.data[(position - 1) % self.capacity] == 0x0A:
+            return position
+        index = self.find(b'\n', position)
+        return self.written if index < 0 else index + 1
+
+    def find(self, needle, position):
+        # Absolute offset of needle at or after position, or -1; one C-level search per segment
+        for begin, end in self.segments(position, self.written):
+            index = self.data.find(needle, begin, end)
+            if index >= 0:
+                return position + index - begin
+            position += end - begin
+        return -1
+
+    def segments(self, first, last):
+        # (begin, end) slices of self.data covering absolute offsets [first, last)
+        if first >= last:
+            return []
+        begin = first % self.capacity
+        end = begin + (last - first)
+        if end <= self.capacity:
+            return [(begin, end)]
+        return [(begin, self.capacity), (0, end - self.capacity)]
+
+    def read(self, first, last=None):
+        last = self.written if last is None else last
+        return b''.join(self.data[begin:end] for begin, end in self.segments(first, last))
+
+    def read_since(self, cursor):
+        # Whole lines written after cursor, the new cursor, and how many
+        # bytes were lost (overwritten, or part of a line that was) before
+        # they could be read
+        skipped = 0
+        if cursor < self.start:
+            skipped = self.find_line_start(self.start) - cursor
+            cursor += skipped
+        return self.read(cursor), self.written, skipped
+
+    def tail(self, max_bytes):
+        # The last whole lines fitting in max_bytes
+        return self.read(self.find_line_start(max(self.start, self.written - max_bytes)))
+
+    def stats(self):
+        return {"bytes": min(self.written, self.capacity), "capacity": self.capacity,
+                "bytes_total": self.written, "lines_total": self.lines_total}
+
+
+def write_crash_report(directory, name, details, output, keep=MAX_CRASH_REPORTS):
+    # Saves details (label -> value) and the output tail; returns the report's path
+    os.makedirs(directory, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(directory, f"{name.lower().replace(' ', '_')}-{stamp}.log")
+    header = "".join(f"{label}: {value}\n" for label, value in details.items())
+    with open(path, "wb") as f:
+        f.write(header.encode("utf8"))
+        f.write(f"--- last {len(output)} bytes of output ---\n".encode("utf8"))
+        f.write(output)
+    reports = sorted((entry for entry in os.scandir(directory) if entry.name.endswith(".log")),
+                     key=lambda entry: entry.stat().st_mtime)
+    for entry in reports[:-keep]:
+        try:
+            os.unlink(entry.path)
+        except OSError:
+            pass
+    return path
+
+
+def save_crash_report(manager, pid, exit_code, signal_number, uptime, phase):
+    # Shared by DaemonManager and the headless AsyncDaemon so both write the
+    # same report; returns its path, or None without a report dir or on failure
+    if not manager.crash_report_dir:
+        return None
+    details = {
+        "Instance": manager.name,
+        "Time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "PID": pid,
+        "Exit code": exit_code,
+        "Signal": signal_number,
+        "Uptime": f"{uptime:.1f}s",
+        "Binary": manager.binary,
+        "Arguments": " ".join(manager.config.get_trin_config()),
+        "Readiness": phase,
+    }
+    try:
+        path = write_crash_report(manager.crash_report_dir, manager.name, details,
+                                  manager.output_buffer.tail(CRASH_REPORT_BYTES))
+    except OSError as e:
+        manager.app_logger.error(f"Failed to write crash report for {manager.name.lower()}: {str(e)}")
+        return None
+    manager.app_logger.info(f"Crash report for {manager.name.lower()} saved to {path}")
+    return path
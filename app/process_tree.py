@@ -0,0 +1,38 @@
+import psutil
+
+# Stopping trin's whole process tree, shared by DaemonManager and the
+# headless AsyncDaemon. Descendants have to be captured before trin exits:
+# once it is gone they are reparented and no longer show up as its children.
+LEFTOVER_GRACE = 2  # seconds leftover descendants get between SIGTERM and SIGKILL
+
+
+def descendants(process):
+    # psutil handles of every descendant of process, [] once it is gone
+    if process is None:
+        return []
+    try:
+        return process.children(recursive=True)
+    except psutil.Error:
+        return []
+
+
+def kill_all(processes):
+    for process in processes:
+        try:
+            process.kill()
+        except psutil.Error:
+            pass
+
+
+def terminate_leftovers(processes):
+    # Sends SIGTERM to the descendants that outlived trin; returns them so
+    # the caller can SIGKILL them after LEFTOVER_GRACE
+    survivors = []
+    for process in processes:
+        try:
+            if process.is_running() and process.status() != psutil.STATUS_ZOMBIE:
+                process.terminate()
+                survivors.append(process)
+        except psutil.Error:
+            pass
+    return survivors
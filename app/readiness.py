@@ -0,0 +1,191 @@
+import http.client
+import json
+import os
+import re
+import threading
+import time
+from rpc_client import JsonRpcClient, JsonRpcError
+
+STARTING = "starting"
+LISTENING = "listening"
+RPC_READY = "rpc-ready"
+SYNCED = "synced"
+PHASES = [STARTING, LISTENING, RPC_READY, SYNCED]
+
+# Stdout lines that signal a phase transition; the RPC poll is authoritative
+# for rpc-ready, these just let us notice it a little earlier
+LINE_PATTERNS = [
+    (LISTENING, re.compile(r"discv5.*(start|listen)|local enr|udp.*listen", re.IGNORECASE)),
+    (RPC_READY, re.compile(r"(json-?rpc|http|web3).*(server|listening).*(start|listen|on )", re.IGNORECASE)),
+]
+VERSION_PATTERN = re.compile(r"launching trin\S*\s*:?\s*(v?\d+\.\d+\.\d+\S*)", re.IGNORECASE)
+
+
+def count_peers(routing_table):
+    # Routing table info is {"localNodeId", "buckets"}, with buckets a list
+    # (or a distance-keyed object) of buckets, each a list of node entries.
+    # None if the result doesn't look like that.
+    buckets = routing_table.get("buckets") if isinstance(routing_table, dict) else None
+    if isinstance(buckets, dict):
+        buckets = list(buckets.values())
+    if not isinstance(buckets, list):
+        return None
+    return sum(len(bucket) for bucket in buckets if isinstance(bucket, list))
+
+
+def apply_phase(tracker, phase, detail, logger, name):
+    # Shared by DaemonManager and the headless AsyncDaemon: moves tracker on to
+    # a phase seen in the log or by the RPC poll. Returns the seconds since
+    # start if the phase changed, else None.
+    if phase == RPC_READY and tracker.version is None and detail.lower().startswith("trin"):
+        tracker.version = detail
+    if not tracker.advance(phase):
+        return None
+    elapsed = tracker.elapsed()
+    logger.info(f"{name} {phase} after {elapsed:.2f}s")
+    return elapsed
+
+
+class ReadinessTracker:
+    def __init__(self, history_file=None, history_size=50):
+        self.history_file = history_file
+        self.history_size = history_size
+        self.phase = None
+        self.started_at = None
+        self.phase_times = {}  # phase -> seconds since start
+        self.version = None
+        self.history = self.load()
+
+    def load(self):
+        if not self.history_file or not os.path.exists(self.history_file):
+            return []
+        history = []
+        try:
+            with open(self.history_file) as f:
+                for line in f:
+                    try:
+                        history.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            return []
+        return history[-self.history_size:]
+
+    def start(self):
+        self.phase = STARTING
+        self.started_at = time.monotonic()
+        self.phase_times = {STARTING: 0.0}
+        self.version = None
+
+    def stop(self):
+        self.phase = None
+        self.started_at = None
+
+    def match_line(self, line):
+        # Returns the phase a stdout line announces, if any
+        if self.version is None:
+            match = VERSION_PATTERN.search(line)
+            if match:
+                self.version = match.group(1)
+        for phase, pattern in LINE_PATTERNS:
+            if pattern.search(line):
+                return phase
+        return None
+
+    def advance(self, phase):
+        # Moves forward to phase, filling in any skipped phases; returns True on change
+        if self.phase is None or PHASES.index(phase) <= PHASES.index(self.phase):
+            return False
+        elapsed = time.monotonic() - self.started_at
+        for skipped in PHASES[PHASES.index(self.phase) + 1:PHASES.index(phase) + 1]:
+            self.phase_times[skipped] = elapsed
+        self.phase = phase
+        if phase == SYNCED:
+            self.record()
+        return True
+
+    def elapsed(self):
+        if self.started_at is None:
+            return None
+        return time.monotonic() - self.started_at
+
+    def durations(self):
+        # Seconds spent reaching each phase from the previous one
+        durations = {}
+        previous = 0.0
+        for phase in PHASES[1:]:
+            if phase not in self.phase_times:
+                break
+            durations[phase] = self.phase_times[phase] - previous
+            previous = self.phase_times[phase]
+        return durations
+
+    def record(self):
+        entry = {"time": time.time(), "version": self.version,
+                 "durations": {k: round(v, 3) for k, v in self.durations().items()},
+                 "total": round(self.phase_times.get(self.phase, 0.0), 3)}
+        self.history.append(entry)
+        del self.history[:-self.history_size]
+        if not self.history_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
+            with open(self.history_file, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError:
+            pass
+
+    def last_record(self):
+        return self.history[-1] if self.history else None
+
+
+class ReadinessPoller:
+    # Polls the node's HTTP port with a short backoff until RPC answers, then
+    # until the routing table holds min_peers. Runs on its own thread and
+    # reports through on_phase(phase, detail).
+    def __init__(self, port, on_phase, min_peers=8, initial_delay=0.05, max_delay=1.0,
+                 sync_max_delay=5.0, sync_timeout=600):
+        self.port = port
+        self.on_phase = on_phase
+        self.min_peers = min_peers
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.sync_max_delay = sync_max_delay
+        self.sync_timeout = sync_timeout
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name=f"readiness-{port}", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        client = JsonRpcClient(self.port, timeout=1.0)
+        try:
+            delay = self.initial_delay
+            while not self.stopped.is_set():
+                try:
+                    version = client.call("web3_clientVersion")
+                    self.on_phase(RPC_READY, str(version or ""))
+                    break
+                except (OSError, http.client.HTTPException, JsonRpcError, ValueError):
+                    pass
+                self.stopped.wait(delay)
+                delay = min(self.max_delay, delay * 2)
+
+            delay = self.initial_delay
+            deadline = time.monotonic() + self.sync_timeout
+            while not self.stopped.is_set() and time.monotonic() < deadline:
+                try:
+                    peers = count_peers(client.call("discv5_routingTableInfo"))
+                    if peers is not None and peers >= self.min_peers:
+                        self.on_phase(SYNCED, str(peers))
+                        return
+                except (OSError, http.client.HTTPException, JsonRpcError, ValueError):
+                    pass
+                self.stopped.wait(delay)
+                delay = min(self.sync_max_delay, delay * 2)
+        finally:
+            client.close()
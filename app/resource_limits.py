@@ -0,0 +1,137 @@
+import sys
+import psutil
+
+# Scheduling and memory controls for trin and its children, applied through
+# psutil. Each control is skipped where the platform has no equivalent
+# (macOS has neither CPU affinity nor I/O priority).
+IO_CLASSES = ("default", "best-effort", "idle")
+# ConfigWindow presets: name -> (nice, cpu_affinity, io_class)
+PROFILES = {
+    "normal": (0, "", "default"),
+    "background": (10, "", "best-effort"),
+    "minimal": (19, "half", "idle"),
+}
+SOFT_LIMIT_SAMPLES = 3  # consecutive samples over the RSS limit before it counts
+
+
+def parse_cpu_list(text, cpu_count=None):
+    # "" = every CPU, "half" = the upper half, otherwise e.g. "0-3,6"
+    cpu_count = cpu_count or psutil.cpu_count() or 1
+    text = text.strip()
+    if not text:
+        return None
+    if text == "half":
+        return list(range(cpu_count // 2, cpu_count)) or [0]
+    cpus = set()
+    for part in text.split(","):
+        part = part.strip()
+        first, _, last = part.partition("-")
+        try:
+            first, last = int(first), int(last or first)
+        except ValueError:
+            raise ValueError(f"{part!r} is not a CPU number or a range like 0-3")
+        if not 0 <= first <= last < cpu_count:
+            raise ValueError(f"{part!r} is not within CPUs 0-{cpu_count - 1} of this machine")
+        cpus.update(range(first, last + 1))
+    return sorted(cpus)
+
+
+def windows_priority(nice):
+    if nice >= 15:
+        return psutil.IDLE_PRIORITY_CLASS
+    if nice > 0:
+        return psutil.BELOW_NORMAL_PRIORITY_CLASS
+    return psutil.NORMAL_PRIORITY_CLASS
+
+
+class ResourceLimits:
+    def __init__(self, nice=0, cpus=None, io_class="default", rss_limit=0, config_error=None):
+        self.nice = nice
+        self.cpus = cpus  # sorted CPU numbers, None = no restriction
+        self.io_class = io_class if io_class in IO_CLASSES else "default"
+        self.rss_limit = rss_limit  # bytes, 0 = none
+        # Why a configured setting couldn't be used; the limits then never count as in effect
+        self.config_error = config_error
+
+    @classmethod
+    def from_config(cls, config):
+        try:
+            cpus = parse_cpu_list(config.cpu_affinity)
+            config_error = None
+        except ValueError as e:
+            cpus = None
+            config_error = f"CPU affinity {config.cpu_affinity!r} ignored: {str(e)}"
+        return cls(config.nice, cpus, config.io_class, config.rss_limit_mb * 1024 * 1024, config_error)
+
+    def __eq__(self, other):
+        return isinstance(other, ResourceLimits) and vars(self) == vars(other)
+
+    def expected(self):
+        # What check() compares against: name -> value as psutil reports it
+        expected = {}
+        if self.nice:
+            expected["nice"] = windows_priority(self.nice) if sys.platform == "win32" else self.nice
+        if self.cpus is not None and hasattr(psutil.Process, "cpu_affinity"):
+            expected["cpu_affinity"] = self.cpus
+        if self.io_class != "default" and hasattr(psutil.Process, "ionice"):
+            expected["ionice"] = self.io_priority()
+        return expected
+
+    def io_priority(self):
+        if sys.platform == "win32":
+            return psutil.IOPRIO_VERYLOW if self.io_class == "idle" else psutil.IOPRIO_LOW
+        return psutil.IOPRIO_CLASS_IDLE if self.io_class == "idle" else psutil.IOPRIO_CLASS_BE
+
+    def apply(self, process):
+        # Returns the errors; anything not allowed (e.g. lowering nice
+        # without privileges) is reported rather than raised
+        errors = []
+        for name, value in self.expected().items():
+            try:
+                if name == "nice":
+                    process.nice(value)
+                elif name == "cpu_affinity":
+                    process.cpu_affinity(value)
+                elif name == "ionice":
+                    if sys.platform == "win32":
+                        process.ionice(value)
+                    else:
+                        # Lowest priority within best-effort; idle has no levels
+                        process.ionice(value, 7 if value == psutil.IOPRIO_CLASS_BE else None)
+            except psutil.NoSuchProcess:
+                raise
+            except (psutil.Error, OSError, ValueError) as e:
+                errors.append(f"{name} on PID {process.pid}: {str(e) or type(e).__name__}")
+        return errors
+
+    def check(self, process):
+        # Settings that differ from what is expected, as "name is X, expected Y"
+        mismatches = []
+        for name, value in self.expected().items():
+            try:
+                if name == "nice":
+                    actual = process.nice()
+                elif name == "cpu_affinity":
+                    actual = sorted(process.cpu_affinity())
+                else:
+                    actual = process.ionice()
+                    actual = actual if sys.platform == "win32" else actual.ioclass
+            except psutil.AccessDenied:
+                continue
+            if actual != value:
+                mismatches.append(f"{name} of PID {process.pid} is {actual}, expected {value}")
+        return mismatches
+
+    def describe(self):
+        parts = []
+        if self.nice:
+            parts.append(f"nice {self.nice}")
+        if self.cpus is not None:
+            parts.append(f"CPUs {','.join(map(str, self.cpus))}")
+        elif self.config_error:
+            parts.append("CPUs invalid")
+        if self.io_class != "default":
+            parts.append(f"I/O {self.io_class}")
+        if self.rss_limit:
+            parts.append(f"RSS soft limit {self.rss_limit / 1024 / 1024:.0f} MiB")
+        return ", ".join(parts) or "none"
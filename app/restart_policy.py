@@ -0,0 +1,90 @@
+import json
+import os
+import random
+import time
+
+
+class RestartPolicy:
+    def __init__(self, history_file=None, base_delay=1.0, max_delay=300.0, jitter=0.2,
+                 max_restarts=5, window=600, healthy_uptime=120, history_size=100):
+        self.history_file = history_file
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter  # +/- fraction applied to each delay
+        self.max_restarts = max_restarts  # circuit breaker: restarts allowed per window
+        self.window = window  # seconds
+        self.healthy_uptime = healthy_uptime  # a run this long resets the backoff
+        self.history_size = history_size
+        self.failures = 0  # consecutive short-lived runs
+        self.exits = []  # [{"time", "exit_code", "signal", "uptime"}], oldest first
+        self.restarts = []  # wall-clock times of automatic restarts
+        self.load()
+
+    def load(self):
+        if not self.history_file or not os.path.exists(self.history_file):
+            return
+        try:
+            with open(self.history_file) as f:
+                data = json.load(f)
+            self.exits = data.get("exits", [])[-self.history_size:]
+            self.restarts = data.get("restarts", [])[-self.history_size:]
+            self.failures = data.get("failures", 0)
+        except (OSError, ValueError):
+            pass
+
+    def save(self):
+        if not self.history_file:
+            return
+        data = {"exits": self.exits, "restarts": self.restarts, "failures": self.failures}
+        tmp_file = self.history_file + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
+            with open(tmp_file, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_file, self.history_file)
+        except OSError:
+            pass
+
+    def record_exit(self, exit_code, signal_number, uptime):
+        self.exits.append({"time": time.time(), "exit_code": exit_code,
+                           "signal": signal_number, "uptime": round(uptime, 3)})
+        del self.exits[:-self.history_size]
+        if uptime >= self.healthy_uptime:
+            self.mark_healthy()
+        else:
+            self.failures += 1
+        self.save()
+
+    def record_restart(self):
+        self.restarts.append(time.time())
+        del self.restarts[:-self.history_size]
+        self.save()
+
+    def mark_healthy(self):
+        # Ran long enough: forget earlier crashes for backoff and breaker purposes
+        self.failures = 0
+        self.restarts = []
+
+    def reset(self):
+        # Manual start: close the breaker
+        self.mark_healthy()
+        self.save()
+
+    def recent_restarts(self):
+        cutoff = time.time() - self.window
+        return sum(1 for t in self.restarts if t >= cutoff)
+
+    def circuit_open(self):
+        return self.recent_restarts() >= self.max_restarts
+
+    def next_delay(self):
+        # Seconds to wait before the next restart, or None while the breaker is open
+        if self.circuit_open():
+            return None
+        if self.failures == 0:
+            return 0.0
+        delay = min(self.max_delay, self.base_delay * 2 ** min(self.failures - 1, 30))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def last_exit(self):
+        return self.exits[-1] if self.exits else None
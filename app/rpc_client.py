@@ -0,0 +1,88 @@
+import http.client
+import json
+import time
+
+
+class JsonRpcError(Exception):
+    pass
+
+
+class JsonRpcClient:
+    # Keeps a single keep-alive HTTP connection to the node and reuses it
+    # across calls. Not thread-safe: use one client per thread.
+    def __init__(self, port, host="127.0.0.1", timeout=2.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.connection = None
+        self.request_id = 0
+
+    def call(self, method, params=None):
+        response = self._post(self._payload(method, params))
+        if not isinstance(response, dict):
+            raise JsonRpcError(f"{method}: unexpected response: {response}")
+        if "error" in response:
+            raise JsonRpcError(f"{method}: {response['error']}")
+        return response.get("result")
+
+    def batch(self, calls):
+        # calls: list of (method, params). Returns results in the same order,
+        # with a JsonRpcError instance in place of any failed call.
+        payload = [self._payload(method, params) for method, params in calls]
+        responses = self._post(payload)
+        if not isinstance(responses, list):
+            raise JsonRpcError(f"Unexpected batch response: {responses}")
+        by_id = {r.get("id"): r for r in responses if isinstance(r, dict)}
+        results = []
+        for request in payload:
+            response = by_id.get(request["id"])
+            if response is None:
+                results.append(JsonRpcError(f"{request['method']}: missing response"))
+            elif "error" in response:
+                results.append(JsonRpcError(f"{request['method']}: {response['error']}"))
+            else:
+                results.append(response.get("result"))
+        return results
+
+    def close(self):
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+    def _payload(self, method, params):
+        self.request_id += 1
+        return {"jsonrpc": "2.0", "method": method, "params": params or [], "id": self.request_id}
+
+    def _post(self, payload):
+        body = json.dumps(payload).encode('utf8')
+        deadline = time.monotonic() + self.timeout
+        # A reused connection may have been closed by the server while idle,
+        # so retry once on a fresh connection in that case
+        reused = self.connection is not None
+        try:
+            return self._send(body, deadline)
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            self.close()
+            if not reused or time.monotonic() >= deadline:
+                raise
+            return self._send(body, deadline)
+        except Exception:
+            self.close()
+            raise
+
+    def _send(self, body, deadline):
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        self.connection.request("POST", "/", body, {"Content-Type": "application/json"})
+        # Bound the whole round-trip, not just each individual socket operation
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("JSON-RPC request timed out")
+        self.connection.sock.settimeout(remaining)
+        response = self.connection.getresponse()
+        data = response.read()
+        if response.will_close:
+            self.close()
+        if response.status != 200:
+            raise JsonRpcError(f"HTTP {response.status}")
+        return json.loads(data)
@@ -0,0 +1,402 @@
+import asyncio
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+from async_http import ConnectionPool, HttpError, LineTooLong, format_response, read_request
+
+# Methods whose successful, non-null result can never change for the same
+# params: lookups by block/transaction hash and portal content by content key.
+# Beacon content is left out since light client updates move with the chain.
+# So are receipts (they move with reorgs) and *LocalContent, which reflects
+# what this node happens to store right now.
+CACHEABLE_METHODS = frozenset({
+    "eth_getBlockByHash",
+    "eth_getTransactionByHash",
+    "portal_historyGetContent",
+    "portal_historyRecursiveFindContent",
+    "portal_stateGetContent",
+    "portal_stateRecursiveFindContent",
+})
+
+
+def cache_key(call):
+    # None for anything the cache must not answer
+    if not isinstance(call, dict) or "id" not in call or call.get("method") not in CACHEABLE_METHODS:
+        return None
+    return call["method"] + json.dumps(call.get("params", []), separators=(",", ":"), sort_keys=True)
+
+
+class ResponseCache:
+    # LRU over serialized results, bounded by total bytes, with a TTL. Entries
+    # pushed out of memory can spill to files in spill_dir (also byte-bounded),
+    # which survive restarts since the content never changes.
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=24 * 3600, spill_dir=None, spill_max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_bytes // 4  # one huge body must not flush everything else
+        self.ttl = ttl
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes
+        self.entries = collections.OrderedDict()  # key -> (value, expires_at)
+        self.bytes = 0
+        self.spilled = collections.OrderedDict()  # file name -> size, oldest first
+        self.spill_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self.spill_hits = 0
+        self.spill_writes = 0
+        self.spill_evictions = 0
+        if spill_dir:
+            self.load_spill_index()
+
+    def load_spill_index(self):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        files = []
+        with os.scandir(self.spill_dir) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, entry.name, stat.st_size))
+        for mtime, name, size in sorted(files):
+            self.spilled[name] = size
+            self.spill_bytes += size
+        self.trim_spill()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.time():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.remove(key)
+            self.expired += 1
+        if self.spill_dir:
+            value = self.read_spill(key)
+            if value is not None:
+                self.spill_hits += 1
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def put(self, key, value, expires_at=None):
+        if len(value) > self.max_entry_bytes:
+            return
+        if key in self.entries:
+            self.remove(key)
+        self.entries[key] = (value, expires_at or time.time() + self.ttl)
+        self.bytes += len(value)
+        while self.bytes > self.max_bytes:
+            old_key, (old_value, old_expires) = self.entries.popitem(last=False)
+            self.bytes -= len(old_value)
+            self.evictions += 1
+            if self.spill_dir and self.spill_max_bytes:
+                self.write_spill(old_key, old_value, old_expires)
+
+    def resize(self, max_bytes, ttl, spill_max_bytes):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_bytes // 4
+        self.ttl = ttl
+        self.spill_max_bytes = spill_max_bytes
+        while self.bytes > self.max_bytes:
+            old_key, (old_value, old_expires) = self.entries.popitem(last=False)
+            self.bytes -= len(old_value)
+            self.evictions += 1
+        if self.spill_dir:
+            self.trim_spill()
+
+    def remove(self, key):
+        value, expires_at = self.entries.pop(key)
+        self.bytes -= len(value)
+
+    def spill_name(self, key):
+        return hashlib.sha256(key.encode("utf8")).hexdigest()
+
+    def write_spill(self, key, value, expires_at):
+        name = self.spill_name(key)
+        path = os.path.join(self.spill_dir, name)
+        data = json.dumps({"key": key, "expires_at": expires_at}).encode("utf8") + b"\n" + value
+        try:
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+        except OSError:
+            return
+        self.spill_bytes += len(data) - self.spilled.pop(name, 0)
+        self.spilled[name] = len(data)
+        self.spill_writes += 1
+        self.trim_spill()
+
+    def read_spill(self, key):
+        name = self.spill_name(key)
+        if name not in self.spilled:
+            return None
+        try:
+            with open(os.path.join(self.spill_dir, name), "rb") as f:
+                header, _, value = f.read().partition(b"\n")
+            meta = json.loads(header)
+        except (OSError, ValueError):
+            self.drop_spill(name)
+            return None
+        if meta.get("key") != key or meta.get("expires_at", 0) <= time.time():
+            self.drop_spill(name)
+            return None
+        # Back into memory; the file stays until it ages out of the spill budget
+        self.spilled.move_to_end(name)
+        self.put(key, value, meta["expires_at"])
+        return value
+
+    def drop_spill(self, name):
+        self.spill_bytes -= self.spilled.pop(name, 0)
+        try:
+            os.unlink(os.path.join(self.spill_dir, name))
+        except OSError:
+            pass
+
+    def trim_spill(self):
+        while self.spill_bytes > self.spill_max_bytes and self.spilled:
+            self.drop_spill(next(iter(self.spilled)))
+            self.spill_evictions += 1
+
+    def stats(self):
+        return {
+            "entries": len(self.entries), "bytes": self.bytes,
+            "hits": self.hits, "misses": self.misses, "evictions": self.evictions, "expired": self.expired,
+            "spill_files": len(self.spilled), "spill_bytes": self.spill_bytes,
+            "spill_hits": self.spill_hits, "spill_writes": self.spill_writes,
+            "spill_evictions": self.spill_evictions,
+        }
+
+
+def encode_result(request_id, value):
+    return b'{"jsonrpc":"2.0","id":' + json.dumps(request_id).encode("utf8") + b',"result":' + value + b'}'
+
+
+def encode_error(request_id, code, message):
+    return json.dumps({"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}).encode("utf8")
+
+
+class RpcProxy:
+    # Caching JSON-RPC proxy in front of one trin endpoint. Runs its own
+    # asyncio loop on a thread, like PortForwarder. Identical cacheable calls
+    # that arrive while the first is still upstream share its answer.
+    def __init__(self, listen_port, upstream_port, cache, host="127.0.0.1"):
+        self.host = host
+        self.listen_port = listen_port
+        self.upstream_port = upstream_port
+        self.cache = cache
+        self.inflight = {}  # cache key -> Future of (value bytes or None, response dict or None)
+        self.requests = 0  # JSON-RPC calls received, batch members counted one by one
+        self.upstream_requests = 0  # HTTP requests sent to trin
+        self.coalesced = 0
+        self.errors = 0
+        self.tasks = set()
+        self.server = None
+        self.pool = None
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name=f"rpc-proxy-{listen_port}", daemon=True)
+        self.thread.start()
+        try:
+            asyncio.run_coroutine_threadsafe(self.start_server(), self.loop).result(5)
+        except Exception:
+            self.stop_loop()
+            raise
+
+    async def start_server(self):
+        self.pool = ConnectionPool(self.upstream_port, self.host)
+        self.server = await asyncio.start_server(self.handle, self.host, self.listen_port)
+
+    def set_upstream(self, port):
+        self.loop.call_soon_threadsafe(self.swap_pool, port)
+
+    def resize(self, max_bytes, ttl, spill_max_bytes):
+        # The cache is only touched from the proxy's loop
+        self.loop.call_soon_threadsafe(self.cache.resize, max_bytes, ttl, spill_max_bytes)
+
+    def swap_pool(self, port):
+        if port != self.upstream_port:
+            self.upstream_port = port
+            self.pool.close()
+            self.pool = ConnectionPool(port, self.host)
+
+    async def handle(self, reader, writer):
+        task = asyncio.current_task()
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except LineTooLong:
+                    writer.write(format_response(431, b"", keep_alive=False))
+                    break
+                except (HttpError, ValueError, asyncio.IncompleteReadError):
+                    writer.write(format_response(400, b"", keep_alive=False))
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                if method != "POST":
+                    writer.write(format_response(405, b"", keep_alive=keep_alive))
+                else:
+                    status, response = await self.handle_body(body)
+                    writer.write(format_response(status, response, keep_alive=keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle_body(self, body):
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = None
+        if isinstance(payload, dict):
+            self.requests += 1
+            if cache_key(payload) is None:
+                return await self.forward(body)
+            return 200, (await self.handle_calls([payload], batch=False))[0]
+        if isinstance(payload, list) and payload:
+            self.requests += len(payload)
+            if all(cache_key(call) is None for call in payload):
+                return await self.forward(body)
+            responses = [r for r in await self.handle_calls(payload, batch=True) if r is not None]
+            return 200, b"[" + b",".join(responses) + b"]" if responses else b""
+        # Let trin produce the proper parse / invalid request error
+        return await self.forward(body)
+
+    async def forward(self, body):
+        self.upstream_requests += 1
+        try:
+            return await self.pool.post("/", body)
+        except (OSError, HttpError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            self.errors += 1
+            return 502, encode_error(None, -32603, f"upstream unavailable: {str(e)}")
+        except ValueError as e:
+            # Unparseable status line, Content-Length or chunk size
+            self.errors += 1
+            return 502, encode_error(None, -32603, f"bad upstream response: {str(e)}")
+
+    async def handle_calls(self, calls, batch):
+        # Returns one encoded response per call (None for notifications)
+        responses = [None] * len(calls)
+        fetch = []  # (index, call, key, future)
+        waits = []  # (index, future)
+        for index, call in enumerate(calls):
+            key = cache_key(call)
+            if key is None:
+                fetch.append((index, call, None, None))
+                continue
+            value = self.cache.get(key)
+            if value is not None:
+                responses[index] = encode_result(call["id"], value)
+            elif key in self.inflight:
+                self.coalesced += 1
+                waits.append((index, self.inflight[key]))
+            else:
+                future = self.loop.create_future()
+                self.inflight[key] = future
+                fetch.append((index, call, key, future))
+        if fetch:
+            await self.fetch(fetch, calls, responses, batch)
+        for index, future in waits:
+            responses[index] = self.encode_shared(calls[index], await future)
+        return responses
+
+    async def fetch(self, fetch, calls, responses, batch):
+        # Upstream ids are rewritten to positions so coalesced and duplicate
+        # client ids can't collide
+        upstream = [dict(call, id=position) if isinstance(call, dict) and "id" in call else call
+                    for position, (index, call, key, future) in enumerate(fetch)]
+        results = {}
+        error = None
+        status = None
+        try:
+            status, body = await self.forward(json.dumps(upstream if batch else upstream[0]).encode("utf8"))
+            decoded = json.loads(body)
+            for response in decoded if isinstance(decoded, list) else [decoded]:
+                if not isinstance(response, dict):
+                    continue
+                if isinstance(response.get("id"), int):
+                    results[response["id"]] = response
+                elif isinstance(response.get("error"), dict):
+                    # Whole request rejected, e.g. upstream down
+                    error = response["error"].get("message")
+        except ValueError:
+            error = f"bad upstream response (HTTP {status})"
+        except BaseException:
+            results, error = {}, "request cancelled"
+            raise
+        finally:
+            # Never leave coalesced waiters hanging
+            self.resolve(fetch, results, error, responses)
+
+    def resolve(self, fetch, results, error, responses):
+        for position, (index, call, key, future) in enumerate(fetch):
+            response = results.get(position)
+            if response is None:
+                shared = (None, None if error is None and not self.expects_reply(call) else
+                          {"error": {"code": -32603, "message": error or "no upstream response"}})
+            elif response.get("result") is not None and "error" not in response:
+                value = json.dumps(response["result"], separators=(",", ":")).encode("utf8")
+                if key is not None:
+                    self.cache.put(key, value)
+                shared = (value, None)
+            else:
+                shared = (None, response)
+            if future is not None:
+                self.inflight.pop(key, None)
+                if not future.done():  # a waiter cancelled while awaiting cancels it too
+                    future.set_result(shared)
+            if self.expects_reply(call):
+                responses[index] = self.encode_shared(call, shared)
+
+    def expects_reply(self, call):
+        return not isinstance(call, dict) or "id" in call
+
+    def encode_shared(self, call, shared):
+        value, response = shared
+        request_id = call.get("id") if isinstance(call, dict) else None
+        if value is not None:
+            return encode_result(request_id, value)
+        if response is None:
+            return None
+        response = dict(response, id=request_id, jsonrpc="2.0")
+        return json.dumps(response).encode("utf8")
+
+    def stats(self):
+        stats = self.cache.stats()
+        stats.update(requests=self.requests, upstream_requests=self.upstream_requests,
+                     coalesced=self.coalesced, errors=self.errors)
+        return stats
+
+    async def shutdown(self):
+        if self.server:
+            self.server.close()
+        # Idle keep-alive clients would otherwise be left pending forever
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        if self.pool:
+            self.pool.close()
+
+    def close(self):
+        try:
+            asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop).result(2)
+        except Exception:
+            pass
+        self.stop_loop()
+
+    def stop_loop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(2)
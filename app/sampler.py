@@ -0,0 +1,290 @@
+import threading
+import time
+import psutil
+from metrics import RingBuffer, percentile
+from resource_limits import SOFT_LIMIT_SAMPLES
+
+# name, array typecode, unit stored. Fixed-width columns keep a sample at 28 bytes;
+# the buffers cover the retention window at any interval, so a week of history
+# is ~3.4 MB at the default one sample per 5 s and ~17 MB at one per second.
+COLUMNS = [
+    ("time", 'I', "unix seconds"),
+    ("cpu_percent", 'H', "0.1 %"),
+    ("rss", 'I', "KiB"),
+    ("uss", 'I', "KiB"),
+    ("read_bytes", 'I', "KiB per interval"),
+    ("write_bytes", 'I', "KiB per interval"),
+    ("num_fds", 'H', "count"),
+    ("num_threads", 'H', "count"),
+    ("connections", 'H', "count"),
+]
+LIMITS = {'H': 0xFFFF, 'I': 0xFFFFFFFF}
+SUMMARY_SAMPLES = 4096  # percentiles are taken over at most this many evenly spaced samples
+SUMMARY_REFRESH = 60  # seconds between summary recomputations on the sampler thread
+
+
+def format_value(name, value):
+    if name == "cpu_percent":
+        return f"{value / 10:.1f}%"
+    if name in ("rss", "uss"):
+        return f"{value / 1024:.1f} MiB"
+    if name in ("read_bytes", "write_bytes"):
+        return f"{value} KiB"
+    return str(value)
+
+
+class ResourceSampler:
+    def __init__(self, interval=5.0, retention=7 * 24 * 3600, uss_every=10):
+        self.interval = interval
+        self.retention = retention  # seconds of history kept, whatever the interval
+        capacity = self.capacity_for(interval)
+        self.uss_every = uss_every  # memory_full_info() is expensive, sample USS less often
+        self.series = {name: RingBuffer(capacity, typecode) for name, typecode, _ in COLUMNS}
+        self.lock = threading.Lock()
+        self.process = None
+        self.children = {}  # pid -> psutil.Process, kept so cpu_percent has a baseline
+        self.last_io = None
+        self.last_uss = 0
+        self.sample_count = 0
+        # ResourceLimits applied to the process and every child that shows up,
+        # then checked on each sample
+        self.limits = None
+        self.limits_changed = False
+        self.limit_errors = []
+        self.limit_mismatches = []
+        self.limits_checked_at = None
+        self.rss_over = 0  # consecutive samples above the RSS soft limit
+        self.summary_stats = {}  # what summary() returns, refreshed on the sampler thread
+        self.summary_at = None
+        self.on_rss_limit = None  # callable(rss_bytes, limit_bytes), run on the sampler thread
+        self.wakeup = threading.Event()
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name="resource-sampler", daemon=True)
+        self.thread.start()
+
+    def attach(self, pid):
+        try:
+            process = psutil.Process(pid)
+            process.cpu_percent(None)
+        except psutil.Error:
+            return
+        # Right after spawn, before trin gets going
+        errors = self.apply_limits(process)
+        with self.lock:
+            self.process = process
+            self.children = {}
+            self.last_io = None
+            self.sample_count = 0
+            self.limit_errors = errors
+            self.limit_mismatches = []
+            self.rss_over = 0
+        self.wakeup.set()
+
+    def set_limits(self, limits):
+        # Applied to a running process on the sampler thread
+        if limits == self.limits:
+            return
+        self.limits = limits
+        self.limits_changed = True
+        self.wakeup.set()
+
+    def apply_limits(self, process):
+        if self.limits is None:
+            return []
+        try:
+            return self.limits.apply(process)
+        except psutil.NoSuchProcess:
+            return []
+
+    def detach(self):
+        with self.lock:
+            self.process = None
+            self.children = {}
+
+    def capacity_for(self, interval):
+        return max(1, int(self.retention / interval))
+
+    def set_interval(self, interval):
+        # Resizes the buffers so they still cover the retention window
+        capacity = self.capacity_for(interval)
+        with self.lock:
+            if capacity != self.series["time"].capacity:
+                for buffer in self.series.values():
+                    buffer.resize(capacity)
+        self.interval = interval
+        self.wakeup.set()
+
+    def close(self):
+        self.closed = True
+        self.wakeup.set()
+
+    def run(self):
+        while not self.closed:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            with self.lock:
+                process = self.process
+            if process is None or self.closed:
+                continue
+            try:
+                self.sample_once(process)
+            except (psutil.Error, OSError):
+                # Gone, or denied this time round; the next sample tries again
+                continue
+
+    def sample_once(self, process):
+        if self.limits_changed:
+            self.limits_changed = False
+            errors = []
+            for proc in self.processes(process):
+                errors.extend(self.apply_limits(proc))
+            with self.lock:
+                self.limit_errors = errors
+                self.rss_over = 0
+        sample = self.sample(process)
+        self.check_limits(process, sample)
+        with self.lock:
+            if self.process is process:
+                for name, value in sample.items():
+                    buffer = self.series[name]
+                    buffer.append(max(0, min(int(value), LIMITS[buffer.data.typecode])))
+        now = time.monotonic()
+        if self.summary_at is None or now - self.summary_at >= SUMMARY_REFRESH:
+            self.summary_at = now
+            stats = self.compute_summary()
+            with self.lock:
+                self.summary_stats = stats
+
+    def processes(self, process):
+        try:
+            current = process.children(recursive=True)
+        except psutil.Error:
+            current = []
+        children = {}
+        for child in current:
+            known = self.children.get(child.pid)
+            if known is None:
+                try:
+                    child.cpu_percent(None)
+                except psutil.Error:
+                    continue
+                errors = self.apply_limits(child)
+                if errors:
+                    with self.lock:
+                        self.limit_errors = (self.limit_errors + errors)[-10:]
+                known = child
+            children[child.pid] = known
+        self.children = children
+        return [process] + list(children.values())
+
+    def sample(self, process):
+        totals = dict.fromkeys(["cpu", "rss", "uss", "read", "write", "fds", "threads", "connections"], 0)
+        measure_uss = self.sample_count % self.uss_every == 0
+        for proc in self.processes(process):
+            try:
+                with proc.oneshot():
+                    totals["cpu"] += proc.cpu_percent(None)
+                    totals["rss"] += proc.memory_info().rss
+                    totals["threads"] += proc.num_threads()
+                    if hasattr(proc, "num_fds"):
+                        totals["fds"] += proc.num_fds()
+                    if hasattr(proc, "io_counters"):
+                        io = proc.io_counters()
+                        totals["read"] += io.read_bytes
+                        totals["write"] += io.write_bytes
+                if measure_uss:
+                    totals["uss"] += proc.memory_full_info().uss
+                connections = getattr(proc, "net_connections", None) or proc.connections
+                totals["connections"] += len(connections(kind="inet"))
+            except psutil.NoSuchProcess:
+                if proc is process:
+                    raise
+            except psutil.AccessDenied:
+                continue
+        self.sample_count += 1
+        if measure_uss:
+            self.last_uss = totals["uss"]
+        io = (totals["read"], totals["write"])
+        read_delta = write_delta = 0
+        if self.last_io is not None:
+            read_delta = max(0, io[0] - self.last_io[0])
+            write_delta = max(0, io[1] - self.last_io[1])
+        self.last_io = io
+        return {
+            "time": time.time(),
+            "cpu_percent": totals["cpu"] * 10,
+            "rss": totals["rss"] / 1024,
+            "uss": self.last_uss / 1024,
+            "read_bytes": read_delta / 1024,
+            "write_bytes": write_delta / 1024,
+            "num_fds": totals["fds"],
+            "num_threads": totals["threads"],
+            "connections": totals["connections"],
+        }
+
+    def check_limits(self, process, sample):
+        limits = self.limits
+        if limits is None:
+            return
+        mismatches = []
+        for proc in [process] + list(self.children.values()):
+            try:
+                mismatches.extend(limits.check(proc))
+            except psutil.NoSuchProcess:
+                continue
+        if mismatches:
+            # Something reset them (or they never took); try once more per sample
+            for proc in [process] + list(self.children.values()):
+                self.apply_limits(proc)
+        over = limits.rss_limit and sample["rss"] * 1024 > limits.rss_limit
+        with self.lock:
+            self.limit_mismatches = mismatches
+            self.limits_checked_at = sample["time"]
+            self.rss_over = self.rss_over + 1 if over else 0
+            crossed = self.rss_over == SOFT_LIMIT_SAMPLES
+        if crossed and self.on_rss_limit:
+            self.on_rss_limit(sample["rss"] * 1024, limits.rss_limit)
+
+    def limit_status(self):
+        # None when no limits are configured
+        with self.lock:
+            if self.limits is None:
+                return None
+            config_error = self.limits.config_error
+            return {
+                "limits": self.limits.describe(),
+                "in_effect": self.limits_checked_at is not None and not self.limit_mismatches and not config_error,
+                "checked_at": self.limits_checked_at,
+                "mismatches": list(self.limit_mismatches),
+                "errors": ([config_error] if config_error else []) + list(self.limit_errors),
+                "rss_over_limit": self.rss_over >= SOFT_LIMIT_SAMPLES,
+            }
+
+    def latest(self):
+        with self.lock:
+            if not len(self.series["time"]):
+                return None
+            return {name: buffer.last() for name, buffer in self.series.items()}
+
+    def summary(self, names=None):
+        # p50/p95/max per column over the whole buffer, as of the last refresh
+        with self.lock:
+            stats = self.summary_stats
+        return {name: values for name, values in stats.items() if names is None or name in names}
+
+    def compute_summary(self):
+        # A week of samples is too much to sort every minute, so the
+        # percentiles come from an evenly spaced subsample; max is exact
+        with self.lock:
+            columns = {name: buffer.values() for name, buffer in self.series.items() if name != "time"}
+        stats = {}
+        for name, values in columns.items():
+            if not values:
+                continue
+            ordered = sorted(values[::max(1, len(values) // SUMMARY_SAMPLES)])
+            stats[name] = {"p50": percentile(ordered, 0.50), "p95": percentile(ordered, 0.95),
+                           "max": max(values)}
+        return stats
+
+    def memory_bytes(self):
+        return sum(buffer.data.itemsize * buffer.capacity for buffer in self.series.values())
@@ -0,0 +1,400 @@
+import functools
+import json
+import os
+import socket
+from PyQt5.QtCore import QObject, pyqtSignal
+from binary import BinaryResolver
+from daemon import DaemonManager
+from disk_monitor import DiskMonitor, default_trin_data_dir
+from forwarder import PortForwarder
+from log import get_app_data_dir, setup_daemon_logger
+from resource_limits import ResourceLimits
+from rpc_proxy import ResponseCache, RpcProxy
+from swap import WarmSwap
+from trin_config import DEFAULT_DISCOVERY_PORT
+
+BACKEND_PORT_OFFSET = 1000  # backend ports behind the RPC shim start at http_port + this
+MB = 1024 * 1024
+
+
+def port_free(port, kind=socket.SOCK_STREAM):
+    host = "127.0.0.1" if kind == socket.SOCK_STREAM else "0.0.0.0"
+    with socket.socket(socket.AF_INET, kind) as sock:
+        try:
+            sock.bind((host, port))
+            return True
+        except OSError:
+            return False
+
+
+def allocate_ports(count, start, kind, taken, owned=()):
+    # Picks count free ports from start upwards, skipping ports in taken.
+    # Ports in owned belong to our own running instances and count as free.
+    ports = []
+    port = start
+    while len(ports) < count:
+        if port > 65_535:
+            raise RuntimeError(f"No free ports left above {start}")
+        if port not in taken and (port in owned or port_free(port, kind)):
+            ports.append(port)
+            taken.add(port)
+        port += 1
+    return ports
+
+
+class DaemonSupervisor(QObject):
+    manager_added = pyqtSignal(object)  # DaemonManager
+    instances_changed = pyqtSignal()
+    disk_alert = pyqtSignal(str, str)  # level, message
+    storage_recommended = pyqtSignal(int)  # --mb that fits the disk with the configured headroom
+
+    def __init__(self, app_name, app_logger, config):
+        super().__init__()
+        self.app_name = app_name
+        self.app_logger = app_logger
+        self.managers = []
+        self.configs = []
+        self.forwarders = {}  # instance index -> PortForwarder, only with the RPC shim
+        self.proxies = {}  # instance index -> RpcProxy, only with the RPC cache
+        self.swaps = {}  # instance index -> WarmSwap in progress
+        # Warm swaps alternate each instance between its configured data dir and
+        # a standby dir; which one is live is kept across app restarts
+        self.standby_state_file = os.path.join(get_app_data_dir(app_name), "standby_dirs.json")
+        self.standby_homes = {}  # instance index -> data dir its standby dir alternates with
+        self.active_dirs = {}  # instance index -> the one of the two trin runs in now
+        self.load_standby_state()
+        self.sample_interval = config.sample_interval
+        # Shared so every instance reuses the same version cache
+        self.binary_resolver = BinaryResolver(os.path.join(get_app_data_dir(app_name), "binary_cache.json"))
+        # Watches every instance's data dir; callbacks arrive on its thread, signals hop to ours
+        self.disk_monitor = DiskMonitor()
+        self.disk_monitor.on_alert = self.disk_alert.emit
+        self.disk_monitor.on_recommendation = self.storage_recommended.emit
+
+    def used_ports(self):
+        ports = set()
+        for config in self.configs + [swap.config for swap in self.swaps.values()]:
+            ports.update(p for p in (config.http_port, config.backend_port, config.discovery_port) if p)
+        return ports
+
+    def instance_configs(self, config):
+        # Instance 0 runs exactly as configured; extra instances get their own
+        # HTTP and discovery ports and their own data dir. Behind the RPC shim
+        # every instance also needs a backend port; running instances keep theirs.
+        configs = [config.copy()]
+        discovery_port = config.discovery_port or DEFAULT_DISCOVERY_PORT
+        taken = {config.http_port, discovery_port}
+        if config.metrics_port:
+            taken.add(config.metrics_port)
+        owned = self.used_ports()
+        extra = config.instances - 1
+        if extra > 0:
+            http_ports = allocate_ports(extra, config.http_port + 1, socket.SOCK_STREAM, taken, owned)
+            discovery_ports = allocate_ports(extra, discovery_port + 1, socket.SOCK_DGRAM, taken, owned)
+            for index in range(1, config.instances):
+                instance = config.copy()
+                instance.instances = 1
+                instance.http_port = http_ports[index - 1]
+                instance.discovery_port = discovery_ports[index - 1]
+                instance.data_dir = os.path.join(get_app_data_dir(self.app_name), "instances", str(index), "data")
+                configs.append(instance)
+        for index, instance in enumerate(configs):
+            current = self.configs[index] if index < len(self.configs) else None
+            if index in self.active_dirs and index in self.standby_homes \
+                    and self.standby_homes[index] == instance.data_dir:
+                # A warm swap may have moved it to its standby dir; it stays there until the next swap
+                instance.data_dir = self.active_dirs[index]
+            if not config.rpc_shim:
+                instance.backend_port = None
+            elif current is not None and current.backend_port:
+                instance.backend_port = current.backend_port
+                instance.discovery_port = current.discovery_port
+                taken.update((current.backend_port, current.discovery_port))
+        if config.rpc_shim:
+            for instance in configs:
+                if not instance.backend_port:
+                    instance.backend_port = allocate_ports(1, instance.http_port + BACKEND_PORT_OFFSET,
+                                                           socket.SOCK_STREAM, taken, owned)[0]
+        return configs
+
+    def standby_data_dir(self, index):
+        return os.path.join(get_app_data_dir(self.app_name), "instances", str(index), "standby")
+
+    def inactive_data_dir(self, index):
+        # The other of an instance's two data dirs: it holds the node a warm
+        # swap last replaced and is where the next standby starts, so it takes
+        # up to --mb as well. None until the RPC shim makes swaps possible.
+        instance = self.configs[index]
+        standby_dir = self.standby_data_dir(index)
+        if instance.data_dir == standby_dir:
+            return self.standby_homes[index] or default_trin_data_dir()
+        if instance.rpc_shim or index in self.standby_homes:
+            return standby_dir
+        return None
+
+    def load_standby_state(self):
+        try:
+            with open(self.standby_state_file) as f:
+                data = json.load(f)
+            self.standby_homes = {int(index): home for index, home in data.get("homes", {}).items()}
+            self.active_dirs = {int(index): path for index, path in data.get("active", {}).items()}
+        except (OSError, ValueError, AttributeError, TypeError):
+            self.standby_homes = {}
+            self.active_dirs = {}
+
+    def save_standby_state(self):
+        data = {"homes": self.standby_homes, "active": self.active_dirs}
+        tmp_file = self.standby_state_file + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.standby_state_file), exist_ok=True)
+            with open(tmp_file, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_file, self.standby_state_file)
+        except OSError as e:
+            self.app_logger.error(f"Failed to save warm standby state: {str(e)}")
+
+    def standby_config(self, index, instance):
+        # Same settings on a spare backend port and discovery port, and in the
+        # other of the instance's two data dirs: trin's node key lives there,
+        # so sharing one would run two nodes with the same identity on one DB
+        taken = self.used_ports()
+        standby = instance.copy()
+        standby_dir = self.standby_data_dir(index)
+        if instance.data_dir == standby_dir:
+            standby.data_dir = self.standby_homes[index]
+        else:
+            self.standby_homes[index] = instance.data_dir
+            standby.data_dir = standby_dir
+        standby.backend_port = allocate_ports(1, instance.http_port + BACKEND_PORT_OFFSET,
+                                              socket.SOCK_STREAM, taken)[0]
+        standby.discovery_port = allocate_ports(1, (instance.discovery_port or DEFAULT_DISCOVERY_PORT) + 1,
+                                                socket.SOCK_DGRAM, taken)[0]
+        return standby
+
+    def configure(self, config):
+        # Adds or removes instances to match config and restarts running
+        # instances whose command line changed; returns the managers added
+        shim_toggled = bool(self.configs) and self.configs[0].rpc_shim != config.rpc_shim
+        configs = self.instance_configs(config)
+        added = []
+        while len(self.managers) < len(configs):
+            manager = self.create_manager(len(self.managers))
+            self.managers.append(manager)
+            added.append(manager)
+        removed = self.managers[len(configs):]
+        self.managers = self.managers[:len(configs)]
+        for manager in removed:
+            manager.close()
+        for manager, instance in zip(self.managers, configs):
+            manager.sampler.set_interval(config.sample_interval)
+            # Applied to running instances right away, no restart needed
+            manager.sampler.set_limits(ResourceLimits.from_config(instance))
+        self.configs = configs
+        self.sample_interval = config.sample_interval
+        self.configure_disk_monitor()
+
+        changed = []
+        for index, (manager, instance) in enumerate(zip(self.managers, configs)):
+            if manager.is_daemon_running() and manager.config.needs_restart(instance):
+                changed.append(index)
+            else:
+                manager.config = instance
+        if shim_toggled:
+            # The advertised port moves between trin and the forwarder: cold
+            # restart, and only rebind the ports once the old nodes let go of them
+            running = [self.managers[index] for index in changed]
+            self.stop_managers(running, functools.partial(self.restart_stopped, running, configs))
+        else:
+            self.update_forwarders()
+            for index in changed:
+                self.restart_instance(index, configs[index])
+
+        self.update_proxies()
+
+        for manager in added:
+            self.manager_added.emit(manager)
+        self.instances_changed.emit()
+        return added
+
+    def configure_disk_monitor(self):
+        config = self.configs[0]
+        data_dirs = [instance.data_dir or default_trin_data_dir() for instance in self.configs]
+        data_dirs += [path for path in map(self.inactive_data_dir, range(len(self.configs))) if path]
+        self.disk_monitor.configure(data_dirs, config.storage, config.disk_headroom_mb)
+
+    def restart_stopped(self, managers, configs):
+        for manager in managers:
+            manager.config = configs[manager.index]
+        self.update_forwarders()
+        if managers:
+            self.start_all(managers)
+
+    def update_forwarders(self):
+        if not self.configs or not self.configs[0].rpc_shim:
+            for forwarder in self.forwarders.values():
+                forwarder.close()
+            self.forwarders = {}
+            return
+        for index in list(self.forwarders):
+            if index >= len(self.configs):
+                self.forwarders.pop(index).close()
+        for index, (manager, instance) in enumerate(zip(self.managers, self.configs)):
+            # Keep pointing at whatever is actually running until a swap moves it
+            target = manager.config.rpc_port if manager.is_daemon_running() else instance.rpc_port
+            forwarder = self.forwarders.get(index)
+            if forwarder and forwarder.listen_port != instance.http_port:
+                forwarder.close()
+                forwarder = None
+            if forwarder:
+                forwarder.set_target(target)
+                continue
+            try:
+                self.forwarders[index] = PortForwarder(instance.http_port, target)
+            except OSError as e:
+                self.app_logger.error(f"Failed to listen on port {instance.http_port}: {str(e)}")
+
+    def update_proxies(self):
+        # The proxy talks to the advertised port, so it goes through the shim
+        # when that is on and never needs to follow a swap
+        if not self.configs or not self.configs[0].rpc_cache:
+            for proxy in self.proxies.values():
+                proxy.close()
+            self.proxies = {}
+            return
+        for index in list(self.proxies):
+            if index >= len(self.configs):
+                self.proxies.pop(index).close()
+        for index, instance in enumerate(self.configs):
+            sizes = (instance.rpc_cache_mb * MB, instance.rpc_cache_ttl, instance.rpc_cache_spill_mb * MB)
+            proxy = self.proxies.get(index)
+            if proxy and proxy.listen_port != instance.proxy_port:
+                self.proxies.pop(index).close()
+                proxy = None
+            if proxy:
+                proxy.set_upstream(instance.http_port)
+                proxy.resize(*sizes)
+                continue
+            spill_dir = os.path.join(get_app_data_dir(self.app_name), "rpc_cache", str(index))
+            try:
+                cache = ResponseCache(sizes[0], sizes[1], spill_dir, sizes[2])
+                self.proxies[index] = RpcProxy(instance.proxy_port, instance.http_port, cache)
+                self.app_logger.info(f"Serving cached RPC on port {instance.proxy_port} "
+                                     f"for port {instance.http_port}")
+            except OSError as e:
+                self.app_logger.error(f"Failed to start RPC cache on port {instance.proxy_port}: {str(e)}")
+
+    def restart_instance(self, index, instance):
+        manager = self.managers[index]
+        if instance.rpc_shim and index in self.forwarders and index not in self.swaps:
+            swap = WarmSwap(self, index, self.standby_config(index, instance))
+            swap.finished.connect(lambda swapped: self.swaps.pop(index, None))
+            self.swaps[index] = swap
+            swap.start()
+            return
+        self.app_logger.info(f"{manager.name}: restarting for config change")
+        self.stop_managers([manager], functools.partial(self.restart_stopped, [manager], {index: instance}))
+
+    def replace_manager(self, index, manager):
+        manager.index = index
+        self.managers[index] = manager
+        self.configs[index] = manager.config
+        if index in self.standby_homes:
+            self.active_dirs[index] = manager.config.data_dir
+            self.save_standby_state()
+        self.configure_disk_monitor()
+        self.manager_added.emit(manager)
+        self.instances_changed.emit()
+
+    def create_manager(self, index, standby=False):
+        # A standby gets its own log and history files until it takes over
+        suffix = (f"_{index}" if index else "") + ("_standby" if standby else "")
+        data_dir = get_app_data_dir(self.app_name)
+        name = f"Daemon {index}" if index else "Daemon"
+        manager = DaemonManager(self.app_logger, setup_daemon_logger(self.app_name, index, standby),
+                                os.path.join(data_dir, f"restart_history{suffix}.json"),
+                                os.path.join(data_dir, f"startup_history{suffix}.jsonl"),
+                                self.sample_interval, name=f"{name} (standby)" if standby else name,
+                                binary_resolver=self.binary_resolver,
+                                crash_report_dir=os.path.join(data_dir, "crash_reports"))
+        manager.index = index
+        return manager
+
+    def start_all(self, managers=None):
+        # Spawns every instance without waiting on each one in turn
+        for manager in managers or self.managers:
+            if manager.is_daemon_running():
+                continue
+            if manager.config.data_dir:
+                os.makedirs(manager.config.data_dir, exist_ok=True)
+            # A manual start overrides the crash-loop breaker
+            manager.restart_policy.reset()
+            try:
+                manager.start_daemon(manager.config, wait=False)
+            except Exception:
+                continue
+
+    def stop_managers(self, managers, then=None):
+        # Signals every instance at once; then() runs when the last one is gone
+        pending = {manager for manager in managers if manager.stop_daemon()}
+        if not pending:
+            if then:
+                then()
+            return
+        handlers = {}
+
+        def stopped(manager, *args):
+            manager.daemon_stopped.disconnect(handlers.pop(manager))
+            pending.discard(manager)
+            if not pending and then:
+                then()
+        for manager in pending:
+            handlers[manager] = functools.partial(stopped, manager)
+            manager.daemon_stopped.connect(handlers[manager])
+
+    def stop_all(self, then=None):
+        self.stop_managers(self.managers, then)
+
+    def shutdown(self, then=None):
+        # Graceful, non-blocking teardown for quitting the app
+        for swap in list(self.swaps.values()):
+            swap.cancel()
+        self.swaps = {}
+        self.stop_all(functools.partial(self.finish_shutdown, then))
+
+    def finish_shutdown(self, then=None):
+        for manager in self.managers:
+            manager.close()
+        for forwarder in self.forwarders.values():
+            forwarder.close()
+        self.forwarders = {}
+        for proxy in self.proxies.values():
+            proxy.close()
+        self.proxies = {}
+        if then:
+            then()
+
+    def close(self, timeout=5):
+        # Blocking fallback for when the event loop is gone; safe to repeat
+        for swap in list(self.swaps.values()):
+            swap.cancel()
+        self.swaps = {}
+        managers = [manager for manager in self.managers if not manager.closed]
+        for manager in managers:
+            manager.stop_daemon(timeout)
+        for manager in managers:
+            manager.terminate_now(timeout)
+        self.disk_monitor.close()
+        self.finish_shutdown()
+
+    def any_running(self):
+        return any(manager.is_daemon_running() for manager in self.managers)
+
+    def manager_for_port(self, port):
+        for manager in self.managers:
+            if manager.config and manager.config.rpc_port == port:
+                return manager
+        return None
+
+    @property
+    def primary(self):
+        return self.managers[0]
@@ -0,0 +1,106 @@
+import os
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from readiness import RPC_READY
+
+
+class WarmSwap(QObject):
+    # Replaces a running instance without an RPC gap: start a standby on a
+    # spare backend port, wait until it answers RPC, point the forwarder at
+    # it, let connections to the old node drain, then stop the old node.
+    # If the standby never gets ready, fall back to a plain restart.
+    finished = pyqtSignal(bool)  # True if the standby took over
+
+    def __init__(self, supervisor, index, config, ready_timeout=300, drain_timeout=10):
+        super().__init__()
+        self.supervisor = supervisor
+        self.index = index
+        self.old = supervisor.managers[index]
+        self.config = config
+        self.standby = None
+        self.drain_timeout = drain_timeout
+        self.drain_polls_left = 0
+        self.promoted = False
+        self.done = False
+        self.timeout_timer = QTimer(self)
+        self.timeout_timer.setSingleShot(True)
+        self.timeout_timer.timeout.connect(lambda: self.abort("standby did not become ready in time"))
+        self.timeout_timer.setInterval(ready_timeout * 1000)
+        self.drain_timer = QTimer(self)
+        self.drain_timer.timeout.connect(self.check_drained)
+
+    def start(self):
+        logger = self.supervisor.app_logger
+        logger.info(f"{self.old.name}: starting standby on port {self.config.rpc_port} for config change")
+        self.standby = self.supervisor.create_manager(self.index, standby=True)
+        self.standby.readiness_changed.connect(self.handle_readiness)
+        self.standby.daemon_exited.connect(lambda *args: self.abort("standby exited"))
+        self.standby.start_failed.connect(lambda message: self.abort(f"standby failed to start: {message}"))
+        self.timeout_timer.start()
+        try:
+            if self.config.data_dir:
+                os.makedirs(self.config.data_dir, exist_ok=True)
+            self.standby.start_daemon(self.config, wait=False)
+        except Exception as e:
+            self.abort(str(e))
+
+    def handle_readiness(self, phase, elapsed):
+        if self.done or phase != RPC_READY:
+            return
+        self.timeout_timer.stop()
+        forwarder = self.supervisor.forwarders.get(self.index)
+        if forwarder is None:
+            self.abort("forwarder is gone")
+            return
+        forwarder.set_target(self.config.rpc_port)
+        self.supervisor.app_logger.info(f"{self.old.name}: standby ready after {elapsed:.1f}s, switched "
+                                        f"port {self.config.http_port} to {self.config.rpc_port}")
+        self.promoted = True
+        self.standby.name = self.old.name
+        self.standby.take_over(self.old)
+        self.supervisor.replace_manager(self.index, self.standby)
+        self.drain_polls_left = self.drain_timeout * 10  # polls at 100 ms
+        self.drain_timer.start(100)
+
+    def check_drained(self):
+        forwarder = self.supervisor.forwarders.get(self.index)
+        self.drain_polls_left -= 1
+        if forwarder and forwarder.connections(self.old.config.rpc_port) and self.drain_polls_left > 0:
+            return
+        self.drain_timer.stop()
+        self.old.close()
+        self.finish(True)
+
+    def abort(self, reason):
+        # Once promoted the standby is a regular instance with its own restart policy
+        if self.done or self.promoted:
+            return
+        self.done = True
+        self.timeout_timer.stop()
+        self.supervisor.app_logger.warning(f"{self.old.name}: warm swap aborted ({reason}), restarting in place")
+        if self.standby:
+            self.standby.close()
+        # Cold restart keeps the ports and data dir the old node is already using
+        fallback = self.config.copy()
+        fallback.backend_port = self.old.config.backend_port
+        fallback.discovery_port = self.old.config.discovery_port
+        fallback.data_dir = self.old.config.data_dir
+        self.supervisor.configs[self.index] = fallback
+        self.supervisor.stop_managers([self.old], lambda: self.restart_old(fallback))
+
+    def restart_old(self, fallback):
+        self.supervisor.restart_stopped([self.old], {self.index: fallback})
+        self.finish(False)
+
+    def cancel(self):
+        # App shutdown: drop the standby unless it already took over
+        self.done = True
+        self.timeout_timer.stop()
+        self.drain_timer.stop()
+        if self.standby and not self.promoted:
+            self.standby.close()
+        elif self.promoted:
+            self.old.close()
+
+    def finish(self, swapped):
+        self.done = True
+        self.finished.emit(swapped)
@@ -0,0 +1,137 @@
+import http.client
+import math
+import threading
+import time
+from metrics import TieredSeries
+from readiness import count_peers
+from rpc_client import JsonRpcClient, JsonRpcError
+
+# Portal network telemetry: one JSON-RPC batch per instance and interval,
+# asking for node info and every enabled subnetwork's routing table, kept as
+# TieredSeries so a few months of uptime cost the same memory as a few hours.
+NETWORKS = ("history", "state", "beacon")
+PEERS = "peers"
+STORAGE_FILL = "storage_fill"
+
+
+class InstanceTelemetry:
+    def __init__(self, index):
+        self.index = index
+        self.series = {}  # (kind, network or None) -> TieredSeries
+        self.node_info = None  # latest discv5_nodeInfo result
+        self.networks = {}  # network -> "ok" or the error of its last call
+        self.checked_at = None
+        self.error = None  # why the last batch failed, if it did
+        self.batch_latency = None
+
+    def record(self, when, kind, network, value):
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            return
+        key = (kind, network)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series.setdefault(key, TieredSeries())
+        series.add(when, value)
+
+    def latest(self, kind, network=None):
+        series = self.series.get((kind, network))
+        return series.last[1] if series and series.last else None
+
+    def query(self, kind, network, span, points=120):
+        series = self.series.get((kind, network))
+        return series.query(span, points, time.time()) if series else []
+
+
+class TelemetryCollector:
+    # Polls on its own thread with one pooled client per instance
+    def __init__(self, interval=5.0, timeout=5.0):
+        self.interval = interval
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.targets = []  # (index, port, networks, storage fill callable or None)
+        self.instances = {}  # index -> InstanceTelemetry
+        self.clients = {}  # port -> JsonRpcClient, only touched by the collector thread
+        self.wakeup = threading.Event()
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name="telemetry-collector", daemon=True)
+        self.thread.start()
+
+    def set_targets(self, targets):
+        with self.lock:
+            self.targets = list(targets)
+            for index, *_ in self.targets:
+                if index not in self.instances:
+                    self.instances[index] = InstanceTelemetry(index)
+        self.wakeup.set()
+
+    def set_interval(self, interval):
+        self.interval = interval
+        self.wakeup.set()
+
+    def instance(self, index):
+        with self.lock:
+            return self.instances.get(index)
+
+    def close(self):
+        self.closed = True
+        self.wakeup.set()
+
+    def run(self):
+        while not self.closed:
+            started = time.monotonic()
+            with self.lock:
+                targets = list(self.targets)
+                instances = dict(self.instances)
+            ports = set()
+            for index, port, networks, storage_fill in targets:
+                ports.add(port)
+                try:
+                    self.collect(instances[index], port, networks, storage_fill)
+                except Exception as e:
+                    # A malformed answer costs this poll, not the collector thread
+                    instances[index].error = f"{type(e).__name__}: {e}"
+                    client = self.clients.pop(port, None)
+                    if client:
+                        client.close()
+            for port in set(self.clients) - ports:
+                self.clients.pop(port).close()
+            self.wakeup.wait(max(0.0, self.interval - (time.monotonic() - started)))
+            self.wakeup.clear()
+        for client in self.clients.values():
+            client.close()
+
+    def collect(self, telemetry, port, networks, storage_fill):
+        now = time.time()
+        if storage_fill:
+            try:
+                telemetry.record(now, STORAGE_FILL, None, storage_fill())
+            except Exception:
+                pass  # leaves a gap, like a failed batch
+        calls = [("discv5_nodeInfo", []), ("discv5_routingTableInfo", [])]
+        calls += [(f"portal_{network}RoutingTableInfo", []) for network in networks]
+        client = self.clients.get(port)
+        if client is None:
+            client = self.clients.setdefault(port, JsonRpcClient(port, timeout=self.timeout))
+        started = time.monotonic()
+        try:
+            results = client.batch(calls)
+        except (OSError, http.client.HTTPException, JsonRpcError, ValueError) as e:
+            # Not running, not up yet or not speaking HTTP; leaves a gap in the series
+            telemetry.error = str(e).strip() or type(e).__name__
+            telemetry.checked_at = now
+            return
+        telemetry.batch_latency = time.monotonic() - started
+        telemetry.error = None
+        telemetry.checked_at = now
+        node_info, discv5_table, *tables = results
+        if not isinstance(node_info, JsonRpcError):
+            telemetry.node_info = node_info
+        if not isinstance(discv5_table, JsonRpcError):
+            telemetry.record(now, PEERS, "discv5", count_peers(discv5_table))
+        telemetry.networks = {}
+        for network, table in zip(networks, tables):
+            if isinstance(table, JsonRpcError):
+                telemetry.networks[network] = str(table)
+                continue
+            telemetry.networks[network] = "ok"
+            telemetry.record(now, PEERS, network, count_peers(table))
@@ -1,3 +1,52 @@
+import copy
+import json
+import os
+
+DEFAULT_DISCOVERY_PORT = 9009
+CONFIG_FILE = "config.json"
+SCHEMA_VERSION = 1
+RPC_PROXY_PORT_OFFSET = 2000  # caching RPC proxy listens on http_port + this
+
+# How a change to each field reaches a running node
+RESTART = "restart"  # changes trin's command line
+LIVE = "live"  # applied by the app without touching trin
+PORT = (1, 65_535)
+# name -> (how a change applies, stored type, inclusive (min, max) or None)
+FIELDS = {
+    "storage": (RESTART, int, (1, 100_000_000)),
+    "http_port": (RESTART, int, PORT),
+    "history": (RESTART, bool, None),
+    "state": (RESTART, bool, None),
+    "beacon": (RESTART, bool, None),
+    "sample_interval": (LIVE, int, (1, 3600)),
+    "metrics_port": (LIVE, int, (0, 65_535)),
+    "instances": (LIVE, int, (1, 64)),
+    "discovery_port": (RESTART, int, PORT),
+    "data_dir": (RESTART, str, None),
+    "rpc_shim": (RESTART, bool, None),
+    "backend_port": (RESTART, int, PORT),
+    "build_profile": (RESTART, str, None),
+    "trin_path": (RESTART, str, None),
+    "shutdown_grace": (LIVE, int, (1, 600)),
+    "rpc_cache": (LIVE, bool, None),
+    "rpc_cache_mb": (LIVE, int, (1, 65_536)),
+    "rpc_cache_ttl": (LIVE, int, (60, 30 * 24 * 3600)),
+    "rpc_cache_spill_mb": (LIVE, int, (0, 1024 * 1024)),
+    "log_retention_mb": (LIVE, int, (1, 1024 * 1024)),
+    "log_retention_days": (LIVE, int, (0, 3650)),
+    "nice": (LIVE, int, (0, 19)),
+    "cpu_affinity": (LIVE, str, None),
+    "io_class": (LIVE, str, None),
+    "rss_limit_mb": (LIVE, int, (0, 1024 * 1024)),
+    "storage_auto": (LIVE, bool, None),
+    "disk_headroom_mb": (LIVE, int, (0, 1024 * 1024)),
+    "telemetry_interval": (LIVE, int, (1, 3600)),
+}
+RUNTIME_FIELDS = {"backend_port"}  # allocated per run, never persisted
+# version -> function upgrading a stored config dict from that version to the next
+MIGRATIONS = {}
+
+
 class TrinConfig:
     def __init__(self):
         self.storage = 100
@@ -5,12 +54,81 @@ class TrinConfig:
         self.history = True # Always enabled
         self.state = True
         self.beacon = True
+        self.sample_interval = 5 # seconds between resource samples
+        self.metrics_port = 0 # Prometheus exporter on localhost, 0 = disabled
+        self.instances = 1 # number of trin nodes to supervise
+        self.discovery_port = None # None = trin's default
+        self.data_dir = None # None = trin's default
+        self.rpc_shim = False # serve http_port through a local forwarder so restarts don't drop clients
+        self.backend_port = None # port trin itself binds when the shim is in front of it
+        self.build_profile = "release" # cargo profile to run; debug builds are refused unless chosen here
+        self.trin_path = None # explicit binary, used when no build of the profile is found
+        self.shutdown_grace = 10 # seconds between SIGTERM and SIGKILL when stopping trin
+        self.rpc_cache = False # caching JSON-RPC proxy on proxy_port in front of http_port
+        self.rpc_cache_mb = 64 # in-memory cache size
+        self.rpc_cache_ttl = 24 * 3600 # seconds a cached response stays valid
+        self.rpc_cache_spill_mb = 0 # on-disk cache for entries evicted from memory, 0 = disabled
+        self.log_retention_mb = 200 # total size of rotated, compressed logs to keep
+        self.log_retention_days = 30 # rotated logs older than this are deleted, 0 = no age limit
+        self.nice = 0 # scheduling priority of trin and its children, 0 = unchanged
+        self.cpu_affinity = "" # CPUs trin may run on, e.g. "0-3,6" or "half"; "" = all
+        self.io_class = "default" # disk priority: default, best-effort (lowest level) or idle
+        self.rss_limit_mb = 0 # warn when trin's resident memory stays above this, 0 = no limit
+        self.storage_auto = False # apply the disk monitor's storage recommendation (restarts trin)
+        self.disk_headroom_mb = 5000 # free space to leave on the data dir's disk once trin is full
+        self.telemetry_interval = 5 # seconds between Portal network telemetry polls
+
+    def copy(self):
+        return copy.copy(self)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in FIELDS if name not in RUNTIME_FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        # Unknown keys and values of the wrong type or out of range fall back
+        # to the defaults; None is only taken by fields that default to it
+        config = cls()
+        for name, value in data.items():
+            if name not in FIELDS or name in RUNTIME_FIELDS:
+                continue
+            how, kind, bounds = FIELDS[name]
+            if value is None:
+                if getattr(config, name) is not None:
+                    continue
+            elif type(value) is not kind or (bounds and not bounds[0] <= value <= bounds[1]):
+                continue
+            setattr(config, name, value)
+        return config
+
+    def changed_fields(self, other):
+        return [name for name in FIELDS if getattr(self, name) != getattr(other, name)]
+
+    def restart_fields(self, other):
+        fields = [name for name in self.changed_fields(other) if FIELDS[name][0] == RESTART]
+        if "http_port" in fields and self.backend_port and other.backend_port:
+            # Behind the RPC shim trin never sees the advertised port
+            fields.remove("http_port")
+        return fields
+
+    @property
+    def rpc_port(self):
+        # Port trin's JSON-RPC server actually listens on
+        return self.backend_port or self.http_port
+
+    @property
+    def proxy_port(self):
+        return self.http_port + RPC_PROXY_PORT_OFFSET
+
+    def needs_restart(self, other):
+        # Whether switching from this config to other has to restart trin
+        return bool(self.restart_fields(other))
 
     def get_trin_config(self):
         args = [
             f"--mb={self.storage}",
             "--web3-transport=http",
-            "--web3-http-address=http://127.0.0.1:" + str(self.http_port),
+            "--web3-http-address=http://127.0.0.1:" + str(self.rpc_port),
         ]
         subnetworks = ["history"]
         if self.state:
@@ -19,5 +137,38 @@ class TrinConfig:
             subnetworks.append("beacon")
         subnetworks = "--portal-subnetworks=" + ",".join(subnetworks)
         args.append(subnetworks)
+        if self.discovery_port is not None:
+            args.append(f"--discovery-port={self.discovery_port}")
+        if self.data_dir is not None:
+            args.append(f"--data-dir={self.data_dir}")
         return args
 
+
+
+def load_config(path):
+    # Returns the stored config, or the defaults if there is none or it can't be read
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        version = data.get("version", 0)
+        if not isinstance(version, int) or isinstance(version, bool) or version > SCHEMA_VERSION:
+            return TrinConfig()
+        stored = data.get("config", {})
+        while version < SCHEMA_VERSION:
+            if version in MIGRATIONS:
+                stored = MIGRATIONS[version](stored)
+            version += 1
+        return TrinConfig.from_dict(stored)
+    except (OSError, ValueError, AttributeError):
+        return TrinConfig()
+
+
+def save_config(config, path):
+    data = {"version": SCHEMA_VERSION, "config": config.to_dict()}
+    tmp_file = path + ".tmp"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(tmp_file, "w") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
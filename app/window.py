@@ -1,5 +1,12 @@
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QSpinBox, QCheckBox, QPushButton
-from PyQt5.QtCore import pyqtSignal
+import math
+import time
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QGridLayout, QHBoxLayout, QLabel, QSpinBox, QCheckBox,
+                             QPushButton, QComboBox, QLineEdit, QMessageBox)
+from PyQt5.QtCore import QPointF, QTimer, Qt, pyqtSignal
+from PyQt5.QtGui import QPainter, QPen
+from binary import PROFILES
+from resource_limits import IO_CLASSES, PROFILES as RESOURCE_PROFILES, parse_cpu_list
+from telemetry import NETWORKS, PEERS, STORAGE_FILL
 
 
 class ConfigWindow(QWidget):
@@ -22,6 +29,22 @@ class ConfigWindow(QWidget):
         layout.addWidget(QLabel('Storage (mb):'))
         layout.addWidget(self.storage_input)
 
+        self.storage_recommended_button = QPushButton('Use recommended storage', self)
+        self.storage_recommended_button.setEnabled(False)
+        self.storage_recommended_button.clicked.connect(self.use_recommended_storage)
+        layout.addWidget(self.storage_recommended_button)
+        self.recommended_storage = None
+
+        self.storage_auto_checkbox = QCheckBox('Size storage to the disk automatically (restarts trin)', self)
+        self.storage_auto_checkbox.setChecked(self.config.storage_auto)
+        layout.addWidget(self.storage_auto_checkbox)
+
+        self.disk_headroom_mb_input = QSpinBox(self)
+        self.disk_headroom_mb_input.setRange(0, 1024 * 1024)
+        self.disk_headroom_mb_input.setValue(self.config.disk_headroom_mb)
+        layout.addWidget(QLabel('Disk space to keep free (mb):'))
+        layout.addWidget(self.disk_headroom_mb_input)
+
         self.history_checkbox = QCheckBox('History (always enabled)', self)
         self.history_checkbox.setChecked(self.config.history)
         self.history_checkbox.setEnabled(False) # disable checkbox
@@ -41,17 +64,326 @@ class ConfigWindow(QWidget):
         layout.addWidget(QLabel('HTTP Port:'))
         layout.addWidget(self.http_port_input)
 
+        self.sample_interval_input = QSpinBox(self)
+        self.sample_interval_input.setRange(1, 3600)
+        self.sample_interval_input.setValue(self.config.sample_interval)
+        layout.addWidget(QLabel('Resource sample interval (s):'))
+        layout.addWidget(self.sample_interval_input)
+
+        self.telemetry_interval_input = QSpinBox(self)
+        self.telemetry_interval_input.setRange(1, 3600)
+        self.telemetry_interval_input.setValue(self.config.telemetry_interval)
+        layout.addWidget(QLabel('Network telemetry interval (s):'))
+        layout.addWidget(self.telemetry_interval_input)
+
+        self.metrics_port_input = QSpinBox(self)
+        self.metrics_port_input.setRange(0, 65_535)
+        self.metrics_port_input.setValue(self.config.metrics_port)
+        layout.addWidget(QLabel('Metrics port (0 = disabled):'))
+        layout.addWidget(self.metrics_port_input)
+
+        self.instances_input = QSpinBox(self)
+        self.instances_input.setRange(1, 64)
+        self.instances_input.setValue(self.config.instances)
+        layout.addWidget(QLabel('Instances:'))
+        layout.addWidget(self.instances_input)
+
+        self.rpc_shim_checkbox = QCheckBox('Zero-downtime restarts (local RPC forwarder)', self)
+        self.rpc_shim_checkbox.setChecked(self.config.rpc_shim)
+        layout.addWidget(self.rpc_shim_checkbox)
+
+        self.rpc_cache_checkbox = QCheckBox('Caching RPC proxy (on HTTP port + 2000)', self)
+        self.rpc_cache_checkbox.setChecked(self.config.rpc_cache)
+        layout.addWidget(self.rpc_cache_checkbox)
+
+        self.rpc_cache_mb_input = QSpinBox(self)
+        self.rpc_cache_mb_input.setRange(1, 65536)
+        self.rpc_cache_mb_input.setValue(self.config.rpc_cache_mb)
+        layout.addWidget(QLabel('RPC cache size (mb):'))
+        layout.addWidget(self.rpc_cache_mb_input)
+
+        self.rpc_cache_ttl_input = QSpinBox(self)
+        self.rpc_cache_ttl_input.setRange(60, 30 * 24 * 3600)
+        self.rpc_cache_ttl_input.setValue(self.config.rpc_cache_ttl)
+        layout.addWidget(QLabel('RPC cache entry lifetime (s):'))
+        layout.addWidget(self.rpc_cache_ttl_input)
+
+        self.rpc_cache_spill_mb_input = QSpinBox(self)
+        self.rpc_cache_spill_mb_input.setRange(0, 1024 * 1024)
+        self.rpc_cache_spill_mb_input.setValue(self.config.rpc_cache_spill_mb)
+        layout.addWidget(QLabel('RPC cache on disk (mb, 0 = disabled):'))
+        layout.addWidget(self.rpc_cache_spill_mb_input)
+
+        self.shutdown_grace_input = QSpinBox(self)
+        self.shutdown_grace_input.setRange(1, 600)
+        self.shutdown_grace_input.setValue(self.config.shutdown_grace)
+        layout.addWidget(QLabel('Shutdown grace period (s):'))
+        layout.addWidget(self.shutdown_grace_input)
+
+        self.log_retention_mb_input = QSpinBox(self)
+        self.log_retention_mb_input.setRange(1, 1024 * 1024)
+        self.log_retention_mb_input.setValue(self.config.log_retention_mb)
+        layout.addWidget(QLabel('Rotated logs to keep (mb, compressed):'))
+        layout.addWidget(self.log_retention_mb_input)
+
+        self.log_retention_days_input = QSpinBox(self)
+        self.log_retention_days_input.setRange(0, 3650)
+        self.log_retention_days_input.setValue(self.config.log_retention_days)
+        layout.addWidget(QLabel('Delete rotated logs after (days, 0 = never):'))
+        layout.addWidget(self.log_retention_days_input)
+
+        self.resource_profile_input = QComboBox(self)
+        self.resource_profile_input.addItems(["custom"] + list(RESOURCE_PROFILES))
+        self.resource_profile_input.textActivated.connect(self.apply_resource_profile)
+        layout.addWidget(QLabel('Resource profile for trin:'))
+        layout.addWidget(self.resource_profile_input)
+
+        self.nice_input = QSpinBox(self)
+        self.nice_input.setRange(0, 19)
+        self.nice_input.setValue(self.config.nice)
+        layout.addWidget(QLabel('Nice level (0 = unchanged; lowering it again needs a restart):'))
+        layout.addWidget(self.nice_input)
+
+        self.cpu_affinity_input = QLineEdit(self)
+        self.cpu_affinity_input.setText(self.config.cpu_affinity)
+        self.cpu_affinity_input.setPlaceholderText('All CPUs, or e.g. 0-3,6 or half')
+        layout.addWidget(QLabel('CPUs:'))
+        layout.addWidget(self.cpu_affinity_input)
+
+        self.io_class_input = QComboBox(self)
+        self.io_class_input.addItems(IO_CLASSES)
+        self.io_class_input.setCurrentText(self.config.io_class)
+        layout.addWidget(QLabel('Disk I/O priority:'))
+        layout.addWidget(self.io_class_input)
+
+        self.rss_limit_mb_input = QSpinBox(self)
+        self.rss_limit_mb_input.setRange(0, 1024 * 1024)
+        self.rss_limit_mb_input.setValue(self.config.rss_limit_mb)
+        layout.addWidget(QLabel('Memory soft limit (mb, 0 = none):'))
+        layout.addWidget(self.rss_limit_mb_input)
+        self.update_resource_profile()
+        for signal in (self.nice_input.valueChanged, self.cpu_affinity_input.textEdited,
+                       self.io_class_input.currentTextChanged):
+            signal.connect(self.update_resource_profile)
+
+        self.build_profile_input = QComboBox(self)
+        self.build_profile_input.addItems(PROFILES)
+        self.build_profile_input.setCurrentText(self.config.build_profile)
+        layout.addWidget(QLabel('Build profile (debug builds are much slower):'))
+        layout.addWidget(self.build_profile_input)
+
+        self.trin_path_input = QLineEdit(self)
+        self.trin_path_input.setText(self.config.trin_path or "")
+        self.trin_path_input.setPlaceholderText('Optional, used when no build is found')
+        layout.addWidget(QLabel('trin binary:'))
+        layout.addWidget(self.trin_path_input)
+
         save_button = QPushButton('Save', self)
         save_button.clicked.connect(self.save_config)
         layout.addWidget(save_button)
 
         self.setLayout(layout)
 
+    def apply_resource_profile(self, name):
+        if name not in RESOURCE_PROFILES:
+            return
+        nice, cpu_affinity, io_class = RESOURCE_PROFILES[name]
+        self.nice_input.setValue(nice)
+        self.cpu_affinity_input.setText(cpu_affinity)
+        self.io_class_input.setCurrentText(io_class)
+        self.update_resource_profile()
+
+    def update_resource_profile(self, *args):
+        # Shows the preset the fields match, if any
+        current = (self.nice_input.value(), self.cpu_affinity_input.text().strip(), self.io_class_input.currentText())
+        name = next((name for name, values in RESOURCE_PROFILES.items() if values == current), "custom")
+        self.resource_profile_input.setCurrentText(name)
+
+    def set_recommended_storage(self, storage_mb):
+        self.recommended_storage = storage_mb
+        self.storage_recommended_button.setEnabled(storage_mb is not None)
+        label = f' ({storage_mb} mb)' if storage_mb is not None else ''
+        self.storage_recommended_button.setText(f'Use recommended storage{label}')
+
+    def use_recommended_storage(self):
+        if self.recommended_storage is not None:
+            self.storage_input.setValue(self.recommended_storage)
+
     def save_config(self):
+        try:
+            parse_cpu_list(self.cpu_affinity_input.text())
+        except ValueError as e:
+            QMessageBox.warning(self, 'Configuration', f'CPU affinity: {str(e)}')
+            self.cpu_affinity_input.setFocus()
+            return
+        # Emit a copy so the receiver can diff it against the running config
+        self.config = self.config.copy()
         self.config.storage = self.storage_input.value()
+        self.config.storage_auto = self.storage_auto_checkbox.isChecked()
+        self.config.disk_headroom_mb = self.disk_headroom_mb_input.value()
         self.config.http_port = self.http_port_input.value()
         self.config.history = self.history_checkbox.isChecked()
         self.config.state = self.state_checkbox.isChecked()
         self.config.beacon = self.beacon_checkbox.isChecked()
+        self.config.sample_interval = self.sample_interval_input.value()
+        self.config.telemetry_interval = self.telemetry_interval_input.value()
+        self.config.metrics_port = self.metrics_port_input.value()
+        self.config.instances = self.instances_input.value()
+        self.config.rpc_shim = self.rpc_shim_checkbox.isChecked()
+        self.config.rpc_cache = self.rpc_cache_checkbox.isChecked()
+        self.config.rpc_cache_mb = self.rpc_cache_mb_input.value()
+        self.config.rpc_cache_ttl = self.rpc_cache_ttl_input.value()
+        self.config.rpc_cache_spill_mb = self.rpc_cache_spill_mb_input.value()
+        self.config.shutdown_grace = self.shutdown_grace_input.value()
+        self.config.log_retention_mb = self.log_retention_mb_input.value()
+        self.config.log_retention_days = self.log_retention_days_input.value()
+        self.config.nice = self.nice_input.value()
+        self.config.cpu_affinity = self.cpu_affinity_input.text().strip()
+        self.config.io_class = self.io_class_input.currentText()
+        self.config.rss_limit_mb = self.rss_limit_mb_input.value()
+        self.config.build_profile = self.build_profile_input.currentText()
+        self.config.trin_path = self.trin_path_input.text().strip() or None
         self.config_saved.emit(self.config)
         self.hide()
+
+
+# Sparkline spans: label -> seconds
+SPANS = {"15 minutes": 15 * 60, "1 hour": 3600, "1 day": 24 * 3600, "1 week": 7 * 24 * 3600,
+         "3 months": 90 * 24 * 3600}
+
+
+class Sparkline(QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.points = []  # (time, value), NaN for gaps
+        self.span = (0, 1)
+        self.setMinimumSize(240, 36)
+
+    def set_points(self, points, start, end):
+        self.points = points
+        self.span = (start, end)
+        self.update()
+
+    def paintEvent(self, event):
+        values = [value for _, value in self.points if not math.isnan(value)]
+        if not values:
+            return
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(QPen(self.palette().text().color(), 1.5))
+        low, high = min(values), max(values)
+        low, high = (low - 1, high + 1) if high == low else (low, high)
+        start, end = self.span
+        width, height = self.width() - 2, self.height() - 2
+        line = []
+        # Gaps break the line instead of being bridged
+        for when, value in self.points + [(end, math.nan)]:
+            if math.isnan(value):
+                if len(line) > 1:
+                    painter.drawPolyline(*line)
+                elif line:
+                    painter.drawPoint(line[0])
+                line = []
+                continue
+            x = 1 + (when - start) / max(1, end - start) * width
+            y = 1 + (1 - (value - low) / (high - low)) * height
+            line.append(QPointF(x, y))
+        painter.end()
+
+
+class TelemetryWindow(QWidget):
+    # Peer counts and storage fill of each instance, from the telemetry collector
+    def __init__(self, collector, instances=1):
+        super().__init__()
+        self.collector = collector
+        self.rows = []  # (label, kind, network, value QLabel, Sparkline)
+        self.timer = QTimer(self)
+        self.timer.setInterval(2000)
+        self.timer.timeout.connect(self.refresh)
+        self.initUI()
+        self.set_instances(instances)
+
+    def initUI(self):
+        self.setWindowTitle('Portal network')
+        self.setGeometry(300, 300, 520, 360)
+
+        layout = QVBoxLayout()
+        controls = QHBoxLayout()
+
+        self.instance_input = QComboBox(self)
+        self.instance_input.currentIndexChanged.connect(self.refresh)
+        controls.addWidget(QLabel('Instance:'))
+        controls.addWidget(self.instance_input)
+
+        self.span_input = QComboBox(self)
+        self.span_input.addItems(list(SPANS))
+        self.span_input.setCurrentText('1 hour')
+        self.span_input.currentIndexChanged.connect(self.refresh)
+        controls.addWidget(QLabel('Last:'))
+        controls.addWidget(self.span_input)
+        layout.addLayout(controls)
+
+        grid = QGridLayout()
+        series = [(f'{network.capitalize()} peers', PEERS, network) for network in NETWORKS]
+        series += [('discv5 peers', PEERS, 'discv5'), ('Storage fill', STORAGE_FILL, None)]
+        for row, (label, kind, network) in enumerate(series):
+            value_label = QLabel('-', self)
+            value_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
+            value_label.setMinimumWidth(60)
+            sparkline = Sparkline(self)
+            grid.addWidget(QLabel(label + ':', self), row, 0)
+            grid.addWidget(value_label, row, 1)
+            grid.addWidget(sparkline, row, 2)
+            self.rows.append((label, kind, network, value_label, sparkline))
+        grid.setColumnStretch(2, 1)
+        layout.addLayout(grid)
+
+        self.node_label = QLabel('', self)
+        self.node_label.setWordWrap(True)
+        self.node_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        layout.addWidget(self.node_label)
+
+        self.setLayout(layout)
+
+    def set_instances(self, count):
+        current = self.instance_input.currentIndex()
+        self.instance_input.blockSignals(True)
+        self.instance_input.clear()
+        self.instance_input.addItems([str(index) for index in range(count)])
+        self.instance_input.setCurrentIndex(current if 0 <= current < count else 0)
+        self.instance_input.blockSignals(False)
+        self.refresh()
+
+    def refresh(self, *args):
+        telemetry = self.collector.instance(self.instance_input.currentIndex())
+        span = SPANS[self.span_input.currentText()]
+        end = time.time()
+        for label, kind, network, value_label, sparkline in self.rows:
+            latest = telemetry.latest(kind, network) if telemetry else None
+            if latest is None:
+                value_label.setText('-')
+            elif kind == STORAGE_FILL:
+                value_label.setText(f'{latest * 100:.1f}%')
+            else:
+                value_label.setText(f'{latest:.0f}')
+            points = telemetry.query(kind, network, span) if telemetry else []
+            sparkline.set_points(points, end - span, end)
+        if telemetry is None or telemetry.checked_at is None:
+            self.node_label.setText('No data yet')
+        elif telemetry.error:
+            self.node_label.setText(f'Not reachable: {telemetry.error}')
+        else:
+            node = telemetry.node_info or {}
+            networks = ', '.join(f'{network} {status}' for network, status in telemetry.networks.items())
+            self.node_label.setText(f"Node {node.get('nodeId', 'unknown')}\n"
+                                    f"Subnetworks: {networks or 'none'}; "
+                                    f"batch took {telemetry.batch_latency * 1000:.0f} ms")
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def closeEvent(self, event):
+        self.timer.stop()
+        super().closeEvent(event)
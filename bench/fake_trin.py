@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+import asyncio
+import os
+import random
+import signal
+import sys
+import time
+
+# Stand-in for the trin binary, for exercising DaemonManager and the tray app
+# without a trin checkout. Takes trin's command line (only --version and
+# --web3-http-address matter) and is steered through environment variables,
+# which QProcess passes through untouched:
+#   FAKE_TRIN_STARTUP_DELAY   seconds before the RPC port opens
+#   FAKE_TRIN_CRASH_ON_START  1 = panic and exit before the RPC port opens
+#   FAKE_TRIN_CRASH_AFTER     mean seconds until a random crash, 0 = never
+#   FAKE_TRIN_CRASH_SIGNAL    1 = crash with SIGABRT instead of exit code 101
+#   FAKE_TRIN_EXIT_FILE       wall-clock time of each crash is written here
+#   FAKE_TRIN_LOG_RATE        log lines per second, 0 = quiet
+#   FAKE_TRIN_LONG_LINES      every Nth line is FAKE_TRIN_LONG_LINE_BYTES long, 0 = never
+#   FAKE_TRIN_PARTIAL         1 = cut writes mid-line and mid-UTF-8 sequence
+#   FAKE_TRIN_PEERS           peers in every routing table (discv5 and portal_*RoutingTableInfo)
+#   FAKE_TRIN_SIGTERM_DELAY   seconds to take shutting down on SIGTERM, -1 = ignore it
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from rpc_load import StubServer  # noqa: E402
+
+VERSION = "trin v0.0.0-fake"
+TICK = 0.01  # log flood granularity in seconds
+
+
+def setting(name, default):
+    value = os.environ.get("FAKE_TRIN_" + name)
+    return type(default)(value) if value else default
+
+
+def write(stream, data):
+    stream.buffer.write(data)
+    stream.buffer.flush()
+
+
+def log(message, level="INFO", stream=sys.stdout):
+    stamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime())
+    write(stream, f"{stamp} {level} trin: {message}\n".encode("utf8"))
+
+
+def http_port(args):
+    for arg in args:
+        if arg.startswith("--web3-http-address="):
+            return int(arg.rsplit(":", 1)[1].rstrip("/"))
+    return 8545
+
+
+def crash():
+    exit_file = setting("EXIT_FILE", "")
+    if exit_file:
+        with open(exit_file, "w") as f:
+            f.write(repr(time.time()))
+    if setting("CRASH_SIGNAL", 0):
+        os.abort()
+    log("thread 'main' panicked at 'fake crash'", "ERROR", sys.stderr)
+    os._exit(101)
+
+
+class LogFlood:
+    # Writes rate lines/s in TICK-sized bursts; with partial writes each burst
+    # is cut at a random byte so lines (and the UTF-8 in them) straddle writes
+    def __init__(self, rate, long_every, long_bytes, partial):
+        self.rate = rate
+        self.long_every = long_every
+        self.long_bytes = long_bytes
+        self.partial = partial
+        self.count = 0
+        self.carry = b""
+
+    def line(self):
+        self.count += 1
+        stamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime())
+        message = f"{stamp} INFO portalnet::overlay: ✓ offer accepted n={self.count} peer=0x{self.count:016x}"
+        if self.long_every and self.count % self.long_every == 0:
+            message += " " + "é" * (self.long_bytes // 2)
+        return message.encode("utf8") + b"\n"
+
+    async def run(self):
+        owed = 0.0
+        while True:
+            await asyncio.sleep(TICK)
+            owed += self.rate * TICK
+            lines = int(owed)
+            owed -= lines
+            data = self.carry + b"".join(self.line() for _ in range(lines))
+            if self.partial and len(data) > 1:
+                cut = random.randrange(1, len(data))
+                data, self.carry = data[:cut], data[cut:]
+            else:
+                self.carry = b""
+            if data:
+                write(sys.stdout, data)
+
+
+async def main(args):
+    if "--version" in args or "-V" in args:
+        print(VERSION)
+        return 0
+    loop = asyncio.get_running_loop()
+    stopping = loop.create_future()
+    loop.add_signal_handler(signal.SIGTERM, lambda: stopping.done() or stopping.set_result(None))
+
+    log(f"Launching trin: {VERSION.split()[1]}")
+    await asyncio.sleep(setting("STARTUP_DELAY", 0.0))
+    if setting("CRASH_ON_START", 0):
+        crash()
+    log("discv5 listening on 0.0.0.0:9009, local enr: enr:-fake")
+    peers = setting("PEERS", 16)
+    routing_table = {"localNodeId": "0x" + "00" * 32, "buckets": [["0x%064x" % n] for n in range(peers)]}
+    results = {"web3_clientVersion": VERSION, "discv5_routingTableInfo": routing_table}
+    results.update({f"portal_{network}RoutingTableInfo": routing_table for network in ("history", "state", "beacon")})
+    server = StubServer(results=results)
+    port = http_port(args)
+    await server.start(port)
+    log(f"JSON-RPC http server listening on 127.0.0.1:{port}")
+
+    tasks = []
+    rate = setting("LOG_RATE", 0.0)
+    if rate:
+        flood = LogFlood(rate, setting("LONG_LINES", 0), setting("LONG_LINE_BYTES", 100_000), setting("PARTIAL", 0))
+        tasks.append(loop.create_task(flood.run()))
+    crash_after = setting("CRASH_AFTER", 0.0)
+    if crash_after:
+        tasks.append(loop.create_task(asyncio.sleep(random.expovariate(1 / crash_after))))
+        tasks[-1].add_done_callback(lambda task: task.cancelled() or crash())
+
+    await stopping
+    delay = setting("SIGTERM_DELAY", 0.0)
+    if delay < 0:
+        # Only SIGKILL gets rid of us now
+        await loop.create_future()
+    log("received SIGTERM, shutting down")
+    await asyncio.sleep(delay)
+    for task in tasks:
+        task.cancel()
+    await server.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main(sys.argv[1:])))
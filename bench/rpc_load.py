@@ -0,0 +1,308 @@
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import sys
+import time
+
+# JSON-RPC load generator for the node the app manages. Concurrent workers
+# share one keep-alive ConnectionPool and send single or batched calls for a
+# fixed duration; latency is reported per method. --stub runs an in-process
+# stand-in server instead, so the tool itself can be checked with no network.
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+
+from async_http import ConnectionPool, HttpError, format_response, read_request  # noqa: E402
+from log import get_app_data_dir  # noqa: E402
+from metrics import percentile  # noqa: E402
+from trin_config import CONFIG_FILE, load_config  # noqa: E402
+
+APP_NAME = "TrinApp"
+# Cheap calls every trin build answers, whatever its subnetworks
+DEFAULT_CALLS = ("web3_clientVersion", "discv5_nodeInfo", "portal_historyRoutingTableInfo")
+STUB_RESULTS = {
+    "web3_clientVersion": "trin/stub",
+    "discv5_nodeInfo": {"enr": "enr:-stub", "nodeId": "0x" + "00" * 32},
+    "portal_historyRoutingTableInfo": {"localNodeId": "0x" + "00" * 32, "buckets": []},
+    "portal_stateRoutingTableInfo": {"localNodeId": "0x" + "00" * 32, "buckets": []},
+    "portal_beaconRoutingTableInfo": {"localNodeId": "0x" + "00" * 32, "buckets": []},
+}
+
+
+def parse_call(spec):
+    # "method" or "method:<JSON params>"
+    method, _, params = spec.partition(":")
+    try:
+        params = json.loads(params) if params else []
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"params for {method} are not JSON: {params}")
+    if not isinstance(params, list):
+        raise argparse.ArgumentTypeError(f"params for {method} must be a JSON list")
+    return method, params
+
+
+class StubServer:
+    # Answers STUB_RESULTS methods after an optional delay, -32601 for anything else
+    def __init__(self, latency=0.0, results=None):
+        self.latency = latency
+        self.results = dict(STUB_RESULTS, **(results or {}))
+        self.server = None
+        self.port = None
+        self.handlers = set()
+
+    async def start(self, port=0):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    def answer(self, call):
+        if not isinstance(call, dict):
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "Invalid request"}}
+        if call.get("method") in self.results:
+            return {"jsonrpc": "2.0", "id": call.get("id"), "result": self.results[call["method"]]}
+        return {"jsonrpc": "2.0", "id": call.get("id"), "error": {"code": -32601, "message": "Method not found"}}
+
+    async def handle(self, reader, writer):
+        task = asyncio.current_task()
+        self.handlers.add(task)
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                payload = json.loads(body)
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                if isinstance(payload, list):
+                    response = [self.answer(call) for call in payload]
+                else:
+                    response = self.answer(payload)
+                writer.write(format_response(200, json.dumps(response).encode("utf8")))
+                await writer.drain()
+        except (HttpError, ValueError, ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self.handlers.discard(task)
+            writer.close()
+
+    async def close(self):
+        self.server.close()
+        for task in list(self.handlers):
+            task.cancel()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+
+
+class MethodStats:
+    def __init__(self):
+        self.latencies = []  # seconds, one per call; batch members share their batch's latency
+        self.errors = collections.Counter()  # kind -> count
+
+    def summary(self, duration):
+        values = sorted(self.latencies)
+        calls = len(values) + sum(self.errors.values())
+        summary = {
+            "calls": calls,
+            "ok": len(values),
+            "errors": dict(self.errors),
+            "throughput": len(values) / duration if duration else 0.0,
+        }
+        if values:
+            summary.update({
+                "mean_ms": sum(values) / len(values) * 1000,
+                "p50_ms": percentile(values, 0.50) * 1000,
+                "p95_ms": percentile(values, 0.95) * 1000,
+                "p99_ms": percentile(values, 0.99) * 1000,
+                "max_ms": values[-1] * 1000,
+            })
+        return summary
+
+
+class LoadGenerator:
+    def __init__(self, port, calls, concurrency, batch_size, timeout):
+        self.calls = calls
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.pool = ConnectionPool(port, max_idle=concurrency, timeout=timeout)
+        self.stats = collections.defaultdict(MethodStats)
+        self.requests = MethodStats()  # per HTTP request, whatever it carried
+        self.recording = False
+        self.next_id = 0
+
+    def make_batch(self):
+        batch = []
+        for _ in range(self.batch_size):
+            method, params = random.choice(self.calls)
+            self.next_id += 1
+            batch.append({"jsonrpc": "2.0", "id": self.next_id, "method": method, "params": params})
+        return batch
+
+    async def send(self):
+        batch = self.make_batch()
+        body = json.dumps(batch if self.batch_size > 1 else batch[0]).encode("utf8")
+        started = time.perf_counter()
+        try:
+            status, response = await self.pool.post("/", body)
+        except (OSError, HttpError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            self.record(batch, None, error=type(e).__name__)
+            return
+        elapsed = time.perf_counter() - started
+        if status != 200:
+            self.record(batch, elapsed, error=f"http_{status}")
+            return
+        try:
+            decoded = json.loads(response)
+        except ValueError:
+            self.record(batch, elapsed, error="bad_json")
+            return
+        responses = decoded if isinstance(decoded, list) else [decoded]
+        by_id = {r.get("id"): r for r in responses if isinstance(r, dict)}
+        self.record(batch, elapsed, by_id=by_id)
+
+    def record(self, batch, elapsed, error=None, by_id=None):
+        if not self.recording:
+            return
+        if error is None:
+            self.requests.latencies.append(elapsed)
+        else:
+            self.requests.errors[error] += 1
+        for call in batch:
+            stats = self.stats[call["method"]]
+            if error is not None:
+                stats.errors[error] += 1
+                continue
+            response = by_id.get(call["id"])
+            if response is None:
+                stats.errors["missing_response"] += 1
+            elif "error" in response:
+                stats.errors[f"rpc_{response['error'].get('code')}"] += 1
+            else:
+                stats.latencies.append(elapsed)
+
+    async def worker(self, deadline):
+        while time.perf_counter() < deadline:
+            await self.send()
+
+    async def run(self, duration, warmup):
+        start = time.perf_counter()
+        if warmup:
+            await asyncio.gather(*(self.worker(start + warmup) for _ in range(self.concurrency)))
+        self.recording = True
+        start = time.perf_counter()
+        await asyncio.gather(*(self.worker(start + duration) for _ in range(self.concurrency)))
+        elapsed = time.perf_counter() - start
+        self.pool.close()
+        return elapsed
+
+
+def node_config():
+    return load_config(os.path.join(get_app_data_dir(APP_NAME), CONFIG_FILE))
+
+
+def describe_config(config):
+    # Fields that change what the node can serve, for comparing runs
+    subnetworks = ["history"] + [name for name in ("state", "beacon") if getattr(config, name)]
+    return {"http_port": config.http_port, "storage_mb": config.storage, "subnetworks": subnetworks,
+            "rpc_shim": config.rpc_shim, "rpc_cache": config.rpc_cache}
+
+
+async def run_benchmark(args):
+    stub = None
+    if args.stub:
+        stub = StubServer(args.stub_latency)
+        await stub.start()
+        port = stub.port
+        target = {"stub": True, "stub_latency_s": args.stub_latency}
+    else:
+        config = node_config()
+        port = args.port or (config.proxy_port if args.via_proxy else config.http_port)
+        target = dict(describe_config(config), stub=False, via_proxy=args.via_proxy)
+    target["port"] = port
+    generator = LoadGenerator(port, args.call or [(method, []) for method in DEFAULT_CALLS],
+                              args.concurrency, args.batch_size, args.timeout)
+    try:
+        elapsed = await generator.run(args.duration, args.warmup)
+    finally:
+        if stub:
+            await stub.close()
+    return {
+        "label": args.label,
+        "timestamp": time.time(),
+        "target": target,
+        "concurrency": args.concurrency,
+        "batch_size": args.batch_size,
+        "duration_s": elapsed,
+        "connections_opened": generator.pool.opened,
+        "requests": generator.requests.summary(elapsed),
+        "methods": {method: stats.summary(elapsed) for method, stats in sorted(generator.stats.items())},
+    }
+
+
+def print_results(results, baseline=None):
+    target = results["target"]
+    where = "stub" if target["stub"] else f"127.0.0.1:{target['port']}"
+    print(f"{where}: concurrency {results['concurrency']}, batch {results['batch_size']}, "
+          f"{results['duration_s']:.1f} s, {results['connections_opened']} connections")
+    rows = [("(requests)", results["requests"])] + list(results["methods"].items())
+    print(f"  {'method':<34} {'calls/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for name, stats in rows:
+        errors = sum(stats["errors"].values())
+        if "p50_ms" in stats:
+            print(f"  {name:<34} {stats['throughput']:9.1f} {stats['p50_ms']:8.2f} {stats['p95_ms']:8.2f} "
+                  f"{stats['p99_ms']:8.2f} {errors:7d}")
+        else:
+            print(f"  {name:<34} {stats['throughput']:9.1f} {'-':>8} {'-':>8} {'-':>8} {errors:7d}")
+        old = None
+        if baseline:
+            old = baseline["requests"] if name == "(requests)" else baseline["methods"].get(name)
+        if old and "p50_ms" in stats and "p50_ms" in old:
+            print(f"  {'  vs baseline':<34} {change(old['throughput'], stats['throughput']):>9} "
+                  f"{change(old['p50_ms'], stats['p50_ms']):>8} {change(old['p95_ms'], stats['p95_ms']):>8} "
+                  f"{change(old['p99_ms'], stats['p99_ms']):>8}")
+
+
+def change(old, new):
+    if not old:
+        return "-"
+    return f"{(new - old) / old * 100:+.0f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure JSON-RPC throughput and latency of the managed trin node")
+    parser.add_argument("--port", type=int, help="target port (default: http_port from the app's config)")
+    parser.add_argument("--via-proxy", action="store_true", help="target the caching RPC proxy's port")
+    parser.add_argument("--stub", action="store_true", help="run against a local stub server instead")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="seconds the stub waits per request")
+    parser.add_argument("--call", action="append", type=parse_call, metavar="METHOD[:PARAMS]",
+                        help="call to include in the mix, params as a JSON list; repeatable")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight")
+    parser.add_argument("--batch-size", type=int, default=1, help="calls per HTTP request")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=1.0, help="unmeasured seconds before that")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--label", help="free-form tag stored with the results")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="results JSON from an earlier run to compare against")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+    if args.concurrency < 1 or args.batch_size < 1:
+        parser.error("--concurrency and --batch-size must be at least 1")
+
+    results = asyncio.run(run_benchmark(args))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results, baseline)
+    return 0 if results["requests"]["ok"] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
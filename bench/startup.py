@@ -0,0 +1,129 @@
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Cold-start benchmark for the menubar app: an import-time breakdown of
+# app/main.py plus time until the tray icon is shown, each run in a fresh
+# interpreter with Qt's offscreen platform and a throwaway HOME.
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+
+# Runs inside the child: build the app, let deferred startup finish, report, quit
+CHILD = """
+import json, sys, time
+from PyQt5.QtCore import QTimer
+import main
+app = main.MenubarApp()
+def report():
+    # Everything relative to interpreter start, not to main's own import
+    offset = main.STARTED_AT - start
+    times = {key: seconds + offset for key, seconds in app.startup_times.items()}
+    times["imports"] = offset
+    print("STARTUP " + json.dumps(times), flush=True)
+    app.quit()
+QTimer.singleShot(0, lambda: QTimer.singleShot(0, report))
+app.app.exec_()
+"""
+
+PHASES = (("imports", "imports done"), ("tray_visible", "tray visible"),
+          ("ready", "startup finished"), ("process_wall", "process wall time"))
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def child_env(home):
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen", HOME=home, APPDATA=home)
+    env.pop("PYTHONSTARTUP", None)
+    return env
+
+
+def time_to_tray(home):
+    code = "import time; start = time.perf_counter()\n" + CHILD
+    begin = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], cwd=APP_DIR, env=child_env(home),
+                            capture_output=True, text=True, timeout=60)
+    wall = time.perf_counter() - begin
+    for line in result.stdout.splitlines():
+        if line.startswith("STARTUP "):
+            times = json.loads(line[len("STARTUP "):])
+            times["process_wall"] = wall
+            return times
+    raise RuntimeError(f"App did not report startup times:\n{result.stderr[-2000:]}")
+
+
+def import_breakdown(home, top):
+    # Top-level imports of main.py by cumulative time, in seconds
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=APP_DIR,
+                            env=child_env(home), capture_output=True, text=True, timeout=60)
+    # -X importtime lists a module's imports before the module itself
+    modules = []
+    children = []
+    total = 0.0
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        cumulative = int(match.group(2)) / 1e6
+        depth = len(match.group(3)) // 2
+        name = match.group(4)
+        if depth == 1:
+            children.append((name, cumulative))
+        elif depth == 0:
+            if name == "main":
+                total = cumulative
+                modules = children
+            children = []
+    modules.sort(key=lambda item: item[1], reverse=True)
+    return total, modules[:top]
+
+
+def summarize(values):
+    return {"median": statistics.median(values), "min": min(values), "max": max(values)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure menubar app cold start")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="imports to list in the breakdown")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--max-tray-ms", type=float, help="fail if median time-to-tray exceeds this")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        # First run warms the page cache and .pyc files; not counted
+        time_to_tray(home)
+        runs = [time_to_tray(home) for _ in range(args.runs)]
+        import_total, imports = import_breakdown(home, args.top)
+
+    results = {
+        "runs": args.runs,
+        "import_main_s": import_total,
+        "imports": [{"module": name, "cumulative_s": seconds} for name, seconds in imports],
+        "startup_s": {key: summarize([run[key] for run in runs]) for key, label in PHASES},
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"import main: {import_total * 1000:.1f} ms")
+        for name, seconds in imports:
+            print(f"  {name:<30} {seconds * 1000:8.1f} ms")
+        print(f"since interpreter start, over {args.runs} runs (median / min / max):")
+        for key, label in PHASES:
+            stats = results["startup_s"][key]
+            print(f"  {label:<20} {stats['median'] * 1000:7.1f} / {stats['min'] * 1000:7.1f} / "
+                  f"{stats['max'] * 1000:7.1f} ms")
+
+    tray_ms = results["startup_s"]["tray_visible"]["median"] * 1000
+    if args.max_tray_ms is not None and tray_ms > args.max_tray_ms:
+        print(f"time-to-tray regression: median {tray_ms:.1f} ms > {args.max_tray_ms:.1f} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,273 @@
+import argparse
+import json
+import logging
+import os
+import socket
+import sys
+import tempfile
+import time
+
+# Stress benchmark for DaemonManager against bench/fake_trin.py: per scenario,
+# log-ingestion throughput, exit-detection latency, restart latency and how
+# long the Qt event loop stalls, all in one process with Qt's offscreen platform.
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(BENCH_DIR, "..", "app")
+FAKE_TRIN = os.path.join(BENCH_DIR, "fake_trin.py")
+sys.path.insert(0, APP_DIR)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QElapsedTimer, QEventLoop, QTimer  # noqa: E402
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+from binary import BinaryResolver  # noqa: E402
+from daemon import DaemonManager  # noqa: E402
+from log import BatchRotatingFileHandler  # noqa: E402
+from metrics import percentile  # noqa: E402
+from readiness import RPC_READY  # noqa: E402
+from trin_config import TrinConfig  # noqa: E402
+
+# name -> FAKE_TRIN_* settings
+SCENARIOS = {
+    "quiet": {},
+    "slow-start": {"STARTUP_DELAY": "3"},
+    "log-flood": {"LOG_RATE": "20000", "LONG_LINES": "100", "LONG_LINE_BYTES": "200000", "PARTIAL": "1"},
+    "random-crash": {"CRASH_AFTER": "2", "LOG_RATE": "500"},
+    "crash-on-start": {"CRASH_ON_START": "1"},
+}
+STALL_INTERVAL_MS = 5
+STALL_THRESHOLD = 0.05  # event-loop delays longer than this count as stalls
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def summarize(values, scale=1000):
+    # Milliseconds by default
+    values = sorted(values)
+    if not values:
+        return None
+    return {"count": len(values), "p50": percentile(values, 0.50) * scale,
+            "p95": percentile(values, 0.95) * scale, "max": values[-1] * scale}
+
+
+class StallProbe:
+    # A short repeating timer; anything it fires late by is time the event
+    # loop spent busy elsewhere
+    def __init__(self, interval_ms=STALL_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.timer = QTimer()
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.tick)
+        self.clock = QElapsedTimer()
+        self.last = None
+        self.delays = []
+
+    def start(self):
+        self.clock.start()
+        self.last = 0.0
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def tick(self):
+        now = self.clock.nsecsElapsed() / 1e9
+        self.delays.append(max(0.0, now - self.last - self.interval))
+        self.last = now
+
+    def results(self):
+        stalls = [delay for delay in self.delays if delay > STALL_THRESHOLD]
+        return {"delay_ms": summarize(self.delays), "stalls": len(stalls), "stalled_s": sum(stalls)}
+
+
+class ScenarioRun:
+    def __init__(self, name, settings, work_dir, duration):
+        self.name = name
+        self.duration = duration
+        self.exit_file = os.path.join(work_dir, f"{name}.exit")
+        self.env = {"FAKE_TRIN_" + key: value for key, value in settings.items()}
+        self.env["FAKE_TRIN_EXIT_FILE"] = self.exit_file
+        self.app_logger = logging.getLogger(f"bench.{name}")
+        self.app_logger.propagate = False
+        self.app_logger.addHandler(logging.FileHandler(os.path.join(work_dir, f"{name}.log")))
+        self.app_logger.setLevel(logging.INFO)
+        daemon_logger = logging.getLogger(f"bench.{name}.daemon")
+        daemon_logger.propagate = False
+        handler = BatchRotatingFileHandler(os.path.join(work_dir, f"{name}_daemon.log"))
+        handler.setFormatter(logging.Formatter('%(asctime)s - DAEMON - %(levelname)s - %(message)s'))
+        daemon_logger.addHandler(handler)
+        daemon_logger.setLevel(logging.INFO)
+        self.manager = DaemonManager(self.app_logger, daemon_logger,
+                                     binary_resolver=BinaryResolver(source_dirs=[]))
+        # Keep restarting quickly for the whole run instead of tripping the breaker
+        policy = self.manager.restart_policy
+        policy.base_delay, policy.max_delay, policy.jitter, policy.max_restarts = 0.05, 0.5, 0.0, 1_000_000
+        self.config = TrinConfig()
+        self.config.http_port = free_port()
+        self.config.trin_path = FAKE_TRIN
+        self.config.shutdown_grace = 5
+        self.starts = []  # monotonic times of daemon_started
+        self.exit_latencies = []  # crash -> daemon_exited
+        self.exited_at = None
+        self.restart_latencies = []  # daemon_exited -> next daemon_started
+        self.restart_overheads = []  # the same minus the scheduled backoff
+        self.ready_latencies = []  # daemon_exited -> rpc-ready of the next run
+        self.time_to_ready = []  # each start -> rpc-ready
+        self.scheduled_delay = 0.0
+        self.start_failures = 0
+        self.stop_time = None
+        self.manager.daemon_started.connect(self.on_started)
+        self.manager.daemon_exited.connect(self.on_exited)
+        self.manager.restart_scheduled.connect(self.on_restart_scheduled)
+        self.manager.readiness_changed.connect(self.on_readiness)
+        self.manager.start_failed.connect(self.on_start_failed)
+
+    def on_started(self, pid):
+        now = time.monotonic()
+        self.starts.append(now)
+        if self.exited_at is not None:
+            self.restart_latencies.append(now - self.exited_at)
+            self.restart_overheads.append(now - self.exited_at - self.scheduled_delay)
+
+    def on_exited(self, exit_code, signal_number, uptime):
+        self.exited_at = time.monotonic()
+        try:
+            with open(self.exit_file) as f:
+                crashed_at = float(f.read())
+            os.unlink(self.exit_file)
+        except (OSError, ValueError):
+            return
+        self.exit_latencies.append(time.time() - crashed_at)
+
+    def on_restart_scheduled(self, delay):
+        self.scheduled_delay = delay
+
+    def on_readiness(self, phase, elapsed):
+        if phase != RPC_READY:
+            return
+        self.time_to_ready.append(elapsed)
+        if self.exited_at is not None:
+            self.ready_latencies.append(time.monotonic() - self.exited_at)
+
+    def on_start_failed(self, message):
+        self.start_failures += 1
+
+    def run(self):
+        env = dict(os.environ, **self.env)
+        saved = os.environ.copy()
+        # QProcess inherits the environment at start, restarts included
+        os.environ.update(env)
+        probe = StallProbe()
+        try:
+            probe.start()
+            started = time.monotonic()
+            self.manager.start_daemon(self.config, wait=False)
+            wait(self.duration)
+            elapsed = time.monotonic() - started
+            pipeline = self.manager.log_pipeline.stats()
+            stop_started = time.monotonic()
+            if self.manager.stop_daemon():
+                loop = QEventLoop()
+                self.manager.daemon_stopped.connect(loop.quit)
+                QTimer.singleShot(int((self.config.shutdown_grace + 5) * 1000), loop.quit)
+                loop.exec_()
+                self.stop_time = time.monotonic() - stop_started
+            probe.stop()
+        finally:
+            os.environ.clear()
+            os.environ.update(saved)
+        self.manager.close()
+        return {
+            "settings": self.env,
+            "duration_s": elapsed,
+            "starts": len(self.starts),
+            "exits": self.manager.exit_count,
+            "start_failures": self.start_failures,
+            "log": {
+                "lines": pipeline["lines_total"],
+                "bytes": pipeline["bytes_total"],
+                "lines_per_s": pipeline["lines_total"] / elapsed,
+                "mb_per_s": pipeline["bytes_total"] / elapsed / 1e6,
+                "dropped_lines": pipeline["dropped_lines"],
+            },
+            "exit_detection_ms": summarize(self.exit_latencies),
+            "restart_ms": summarize(self.restart_latencies),
+            "restart_overhead_ms": summarize(self.restart_overheads),
+            "exit_to_ready_ms": summarize(self.ready_latencies),
+            "time_to_ready_ms": summarize(self.time_to_ready),
+            "stop_ms": self.stop_time * 1000 if self.stop_time is not None else None,
+            "event_loop": probe.results(),
+        }
+
+
+def wait(seconds):
+    loop = QEventLoop()
+    QTimer.singleShot(int(seconds * 1000), loop.quit)
+    loop.exec_()
+
+
+def format_ms(stats):
+    if not stats:
+        return "-"
+    return f"{stats['p50']:.1f} / {stats['p95']:.1f} / {stats['max']:.1f} ms (n={stats['count']})"
+
+
+def print_results(results):
+    for name, result in results["scenarios"].items():
+        log = result["log"]
+        loop = result["event_loop"]
+        print(f"{name}: {result['duration_s']:.1f} s, {result['starts']} starts, {result['exits']} exits, "
+              f"{result['start_failures']} start failures")
+        print(f"  log ingestion      {log['lines_per_s']:.0f} lines/s, {log['mb_per_s']:.2f} MB/s, "
+              f"{log['dropped_lines']} dropped")
+        print(f"  exit detection     {format_ms(result['exit_detection_ms'])}")
+        print(f"  restart            {format_ms(result['restart_ms'])}")
+        print(f"  restart overhead   {format_ms(result['restart_overhead_ms'])}")
+        print(f"  exit to rpc-ready  {format_ms(result['exit_to_ready_ms'])}")
+        print(f"  time to rpc-ready  {format_ms(result['time_to_ready_ms'])}")
+        print(f"  event-loop delay   {format_ms(loop['delay_ms'])}, {loop['stalls']} stalls "
+              f"> {STALL_THRESHOLD * 1000:.0f} ms totalling {loop['stalled_s'] * 1000:.0f} ms")
+        if result["stop_ms"] is not None:
+            print(f"  stop               {result['stop_ms']:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress DaemonManager against a fake trin")
+    parser.add_argument("scenarios", nargs="*", metavar="SCENARIO",
+                        help=f"scenarios to run: {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--max-stall-ms", type=float, help="fail if any event-loop stall exceeds this")
+    args = parser.parse_args()
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    app = QApplication(sys.argv[:1])
+    results = {"timestamp": time.time(), "scenarios": {}}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name in args.scenarios or SCENARIOS:
+            results["scenarios"][name] = ScenarioRun(name, SCENARIOS[name], work_dir, args.duration).run()
+            app.processEvents()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+
+    if args.max_stall_ms is not None:
+        worst = max(result["event_loop"]["delay_ms"]["max"] for result in results["scenarios"].values())
+        if worst > args.max_stall_ms:
+            print(f"event-loop stall regression: {worst:.1f} ms > {args.max_stall_ms:.1f} ms", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,7 @@
 import sys
 import os
+import time
+import functools
 from web3 import Web3
 import psutil
 import subprocess
@@ -7,6 +9,7 @@ from PyQt5.QtWidgets import QApplication, QSystemTrayIcon, QMenu, QWidget, QVBox
 from PyQt5.QtGui import QIcon
 from PyQt5.QtCore import Qt, pyqtSignal, QTimer, QStandardPaths
 from trin_config import TrinConfig
+from binary import BinaryResolver
 import atexit
 import signal
 import logging
@@ -69,6 +72,8 @@ class ConfigWindow(QWidget):
         self.config_saved.emit(self.config)
         self.hide()
 
+SHUTDOWN_GRACE = 10  # seconds between SIGTERM and SIGKILL
+
 # Set up logging
 # logging.basicConfig(filename='menubar_app.log', level=logging.ERROR,
                     # format='%(asctime)s - %(levelname)s - %(message)s')
@@ -77,6 +82,7 @@ class DaemonManager:
     def __init__(self, logger):
         self.daemon_process = None
         self.logger = logger
+        self.binary_resolver = BinaryResolver()
 
     def start_daemon(self, config):
         if self.daemon_process and self.daemon_process.poll() is None:
@@ -85,7 +91,8 @@ class DaemonManager:
 
         try:
             trin_config = config.get_trin_config()
-            cmd = ["../trin/target/debug/trin"] + trin_config
+            binary = self.binary_resolver.resolve(config)
+            cmd = [binary.path] + trin_config
             self.daemon_process = subprocess.Popen(
                 cmd,
                 stdout=subprocess.PIPE,
@@ -97,21 +104,71 @@ class DaemonManager:
             self.logger.error(f"Failed to start daemon: {str(e)}")
             raise
 
-    def stop_daemon(self):
-        if self.daemon_process:
+    def stop_daemon(self, grace=SHUTDOWN_GRACE, wait=False, on_stopped=None):
+        # SIGTERM now, SIGKILL for whatever is left of the tree after the grace
+        # period. Only blocks when wait is set, which the atexit and fatal-error
+        # paths need: once the event loop is gone no timer fires. Otherwise
+        # on_stopped runs on the event loop once trin has been reaped.
+        popen = self.daemon_process
+        self.daemon_process = None
+        if popen is None:
+            if on_stopped:
+                on_stopped()
+            return
+        try:
+            process = psutil.Process(popen.pid)
+            tree = [process] + process.children(recursive=True)
+            process.terminate()
+        except psutil.NoSuchProcess:
+            popen.poll()  # reap
+            self.logger.info("Daemon was not running")
+            if on_stopped:
+                on_stopped()
+            return
+        except Exception as e:
+            self.logger.error(f"Failed to stop daemon: {str(e)}")
+            if on_stopped:
+                on_stopped()
+            return
+        if wait:
+            gone, alive = psutil.wait_procs(tree, timeout=grace)
+            self.kill_tree(popen, alive)
+            popen.wait()
+            self.logger.info("Daemon stopped")
+            return
+        self.logger.info("Daemon stopping")
+        self.watch_exit(popen, tree, time.monotonic() + grace, on_stopped)
+
+    def watch_exit(self, popen, tree, deadline, on_stopped, killed=False):
+        # Polled from the event loop until trin is reaped
+        if popen.poll() is None:
+            if not killed and time.monotonic() >= deadline:
+                self.kill_tree(popen, tree)
+                killed = True
+            QTimer.singleShot(100, functools.partial(self.watch_exit, popen, tree, deadline, on_stopped, killed))
+            return
+        # Descendants that outlived trin get SIGTERM now and SIGKILL at the deadline
+        for process in tree[1:]:
+            try:
+                if process.is_running():
+                    process.terminate()
+            except psutil.NoSuchProcess:
+                pass
+        if not killed:
+            QTimer.singleShot(max(0, int((deadline - time.monotonic()) * 1000)),
+                              functools.partial(self.kill_tree, popen, tree[1:]))
+        self.logger.info("Daemon stopped")
+        if on_stopped:
+            on_stopped()
+
+    def kill_tree(self, popen, processes):
+        for process in processes:
             try:
-                process = psutil.Process(self.daemon_process.pid)
-                process.terminate()
-                process.wait(timeout=10)
                 if process.is_running():
                     process.kill()
-                self.logger.info("Daemon stopped")
             except psutil.NoSuchProcess:
-                self.logger.info("Daemon was not running")
-            except Exception as e:
-                self.logger.error(f"Failed to stop daemon: {str(e)}")
-            finally:
-                self.daemon_process = None
+                pass
+        popen.poll()  # reap
 
     def is_daemon_running(self):
         print("Checking daemon status")
@@ -122,7 +179,6 @@ class DaemonManager:
                 if process.status() == psutil.STATUS_ZOMBIE:
                     return False
             except psutil.NoSuchProcess:
-                self.start_daemon()
                 return False
         return True
     
@@ -146,6 +202,7 @@ class MenubarApp:
         self.config = TrinConfig()
         self.version = "0.1.0"
         self.config_window = None
+        self.quitting = False
         
         # Set up error handling
         sys.excepthook = self.handle_exception
@@ -256,16 +313,29 @@ class MenubarApp:
         sys.exit(1)
 
     def cleanup(self):
+        if getattr(self, "cleaned_up", False):
+            return
+        self.cleaned_up = True
         logging.info("Performing cleanup")
-        self.daemon_manager.stop_daemon()
+        # Runs right before the process exits, so wait for the kill instead of scheduling it
+        self.daemon_manager.stop_daemon(wait=True)
 
     def sigterm_handler(self, signum, frame):
         logging.info("Received SIGTERM. Exiting.")
-        self.cleanup()
-        sys.exit(0)
+        QTimer.singleShot(0, self.quit)
 
     def quit(self):
-        self.cleanup()
+        # Stops trin without blocking the event loop and exits once it is gone,
+        # or when the backstop runs out if it never reports back
+        if self.quitting:
+            return
+        self.quitting = True
+        self.cleaned_up = True  # nothing left for the atexit cleanup to stop
+        logging.info("Performing cleanup")
+        QTimer.singleShot((SHUTDOWN_GRACE + 2) * 1000, self.finish_quit)
+        self.daemon_manager.stop_daemon(on_stopped=self.finish_quit)
+
+    def finish_quit(self):
         self.tray.hide()
         self.app.quit()
 